@@ -1,114 +1,168 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import csv
-import time
-import re
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import logging
+import threading
 from typing import List, Dict, Optional
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('erzrf_advanced_parser.log'),
-        logging.StreamHandler()
-    ]
-)
+from erzrf_browser import BrowserPool, RenderDecisions
+from erzrf_api import rating_page_url
+from erzrf_cache import ResponseCache
+from erzrf_html import LinkIndex, make_soup, resolve_backend
+from erzrf_http import create_transport
+from erzrf_logging import item_fields, setup_logging
+from erzrf_rate_limit import RateLimiter
+from erzrf_regions import REGION_RESOLVER
+from erzrf_urls import CORPORATE, SOCIAL, classify_url
+
 logger = logging.getLogger(__name__)
 
+# Область содержимого страницы - контейнер маршрутов Angular. Шапка и подвал
+# сайта находятся вне его, есть на любой странице и содержат внешние ссылки
+# (t.me, vk.com, profi.erzrf.ru), поэтому и условие готовности профиля, и
+# поиск сайта и соцсетей компании ограничены этой областью
+CONTENT_SELECTOR = '.router'
+
+# Условия готовности страниц: ссылки на профили в строках рейтинга и внешние
+# ссылки компании (не erzrf.ru) в области содержимого профиля.
+# В браузере их ждет WebDriverWait, в гибридном режиме по ним проверяется HTML из HTTP-ответа.
+# По RATING_READY_SELECTOR же находятся ссылки на профили в строках рейтинга
+RATING_READY_SELECTOR = 'a[href*="/zastroyschiki/brand/"]'
+PROFILE_READY_SELECTOR = f'{CONTENT_SELECTOR} a[href^="http"]:not([href*="erzrf.ru"])'
+
+FETCH_MODES = ('http', 'selenium', 'hybrid')
+
 class AdvancedERZRFParser:
-    def __init__(self, use_selenium: bool = False):
-        self.use_selenium = use_selenium
+    def __init__(self, use_selenium: bool = False, transport: str = 'requests', limit_per_host: int = 10,
+                 cache: Optional[ResponseCache] = None, html_backend: str = 'html.parser',
+                 rate_limiter: Optional[RateLimiter] = None, browsers: int = 1, recycle_after: int = 50,
+                 fetch_mode: Optional[str] = None, decisions_path: str = 'erzrf_render_decisions.json'):
+        # fetch_mode: http - только HTTP, selenium - только браузер,
+        # hybrid - HTTP, а браузер только для страниц без ожидаемого содержимого
+        self.fetch_mode = fetch_mode or ('selenium' if use_selenium else 'http')
+        if self.fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Неизвестный режим загрузки: {self.fetch_mode}")
+        self.use_selenium = self.fetch_mode == 'selenium'
+        self.browsers = max(1, browsers)
+        self.recycle_after = recycle_after
+        self.browser_pool: Optional[BrowserPool] = None
+        # Адаптивный лимит запросов вместо фиксированной паузы после каждого профиля
+        self.rate_limiter = rate_limiter or RateLimiter(1 / 1.5, max_rate=5.0)
+        self.html_backend = resolve_backend(html_backend)
+        self.transport_kind = transport
+        self.limit_per_host = limit_per_host
+        self.cache = cache
         self.base_url = 'https://erzrf.ru'
         self.companies_data = []
+        self.render_decisions = RenderDecisions(decisions_path) if self.fetch_mode == 'hybrid' else None
+        self._browser_lock = threading.Lock()
         
-        if use_selenium:
+        if self.use_selenium:
             self.setup_selenium()
         else:
             self.setup_requests()
 
     def setup_requests(self):
-        """Настройка requests сессии"""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        """Настройка HTTP-транспорта"""
+        self.transport = create_transport(
+            self.transport_kind,
+            timeout=15,
+            limit_per_host=self.limit_per_host,
+            rate_limiter=self.rate_limiter,
+            cache=self.cache,
+        )
 
-    def setup_selenium(self):
-        """Настройка Selenium WebDriver"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-        
+    def setup_selenium(self) -> bool:
+        """Настройка пула браузеров Selenium; при ошибке - откат на HTTP"""
         try:
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.wait = WebDriverWait(self.driver, 10)
+            self.browser_pool = BrowserPool(
+                size=self.browsers,
+                recycle_after=self.recycle_after,
+                rate_limiter=self.rate_limiter,
+            )
+            self.browser_pool.start()
+            return True
         except Exception as e:
             logger.error(f"Ошибка инициализации WebDriver: {e}")
-            self.use_selenium = False
-            self.setup_requests()
+            if self.browser_pool is not None:
+                self.browser_pool.close()
+                self.browser_pool = None
+            if self.use_selenium:
+                self.use_selenium = False
+                self.setup_requests()
+            # Дальше только HTTP, без повторных попыток запустить браузер
+            self.fetch_mode = 'http'
+            return False
 
     def get_page_requests(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
-        """Получение страницы через requests"""
-        for attempt in range(retries):
-            try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                return BeautifulSoup(response.text, 'html.parser')
-            except Exception as e:
-                logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {e}")
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    logger.error(f"Не удалось получить страницу {url}")
-                    return None
+        """Получение страницы через HTTP-транспорт"""
+        html = self.transport.fetch(url, retries)
+        if html is None:
+            return None
+        return make_soup(html, self.html_backend)
 
-    def get_page_selenium(self, url: str) -> Optional[BeautifulSoup]:
-        """Получение страницы через Selenium"""
-        try:
-            self.driver.get(url)
-            time.sleep(3)  # Ждем загрузки динамического контента
-            html = self.driver.page_source
-            return BeautifulSoup(html, 'html.parser')
-        except Exception as e:
-            logger.error(f"Ошибка Selenium для {url}: {e}")
+    async def get_page_requests_async(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
+        """Асинхронное получение страницы через HTTP-транспорт"""
+        html = await self.transport.get_page(url, retries)
+        if html is None:
+            return None
+        return make_soup(html, self.html_backend)
+
+    def get_page_selenium(self, url: str, ready_selector: Optional[str] = None) -> Optional[BeautifulSoup]:
+        """Получение страницы через браузер из пула"""
+        html = self.browser_pool.fetch(url, ready_selector)
+        if html is None:
             return None
+        return make_soup(html, self.html_backend)
 
-    def get_page(self, url: str) -> Optional[BeautifulSoup]:
+    def get_page_hybrid(self, url: str, ready_selector: Optional[str] = None) -> Optional[BeautifulSoup]:
+        """HTTP-загрузка с переходом в браузер, если в HTML нет ожидаемого содержимого"""
+        decisions = self.render_decisions
+        if decisions.get(url) != RenderDecisions.BROWSER:
+            soup = self.get_page_requests(url)
+            if soup is None:
+                return None
+            if ready_selector is None or soup.select_one(ready_selector) is not None:
+                decisions.set(url, RenderDecisions.HTTP)
+                return soup
+            logger.info(f"В HTTP-ответе нет содержимого, страница загружается в браузере: {url}")
+        else:
+            soup = None
+        
+        with self._browser_lock:
+            if self.browser_pool is None and self.fetch_mode == 'hybrid':
+                self.setup_selenium()
+        if self.browser_pool is None:
+            # Браузер недоступен - лучше неполная страница, чем никакой
+            return soup if soup is not None else self.get_page_requests(url)
+        
+        browser_soup = self.get_page_selenium(url, ready_selector)
+        if browser_soup is not None:
+            decisions.set(url, RenderDecisions.BROWSER)
+            return browser_soup
+        return soup
+
+    def get_page(self, url: str, ready_selector: Optional[str] = None) -> Optional[BeautifulSoup]:
         """Универсальный метод получения страницы"""
         if self.use_selenium:
-            return self.get_page_selenium(url)
-        else:
-            return self.get_page_requests(url)
+            return self.get_page_selenium(url, ready_selector)
+        if self.render_decisions is not None:
+            return self.get_page_hybrid(url, ready_selector)
+        return self.get_page_requests(url)
 
-    def parse_companies_list(self, limit: int = 250) -> List[Dict]:
+    def parse_companies_list(self, limit: int = 250, params: Optional[Dict] = None) -> List[Dict]:
         """Парсинг списка компаний с основной страницы"""
         logger.info("Начинаем парсинг списка компаний...")
         
-        # Формируем URL с нужными параметрами
-        url = f"{self.base_url}/top-zastroyshchikov/rf?regionKey=0&topType=0&date=250801"
+        # URL рейтинга; по умолчанию regionKey=0&topType=0&date=250801
+        url = rating_page_url(self.base_url, params)
         
-        soup = self.get_page(url)
+        soup = self.get_page(url, RATING_READY_SELECTOR)
         if not soup:
             logger.error("Не удалось получить основную страницу")
             return []
@@ -128,7 +182,7 @@ class AdvancedERZRFParser:
                 
             try:
                 # Ищем ссылку на профиль застройщика
-                company_link = row.find('a', href=lambda x: x and '/zastroyshchik/' in x)
+                company_link = row.select_one(RATING_READY_SELECTOR)
                 if not company_link:
                     continue
                 
@@ -152,7 +206,8 @@ class AdvancedERZRFParser:
                 }
                 
                 companies.append(company_data)
-                logger.info(f"#{rank}: {company_name} ({region})")
+                logger.info("#%d: %s (%s)", rank, company_name, region,
+                            extra=item_fields('list', url=profile_url, rank=rank, company=company_name))
                 rank += 1
                 
             except Exception as e:
@@ -163,42 +218,32 @@ class AdvancedERZRFParser:
         return companies
 
     def extract_region_from_text(self, text: str) -> str:
-        """Извлечение региона из текста"""
-        # Паттерны для различных форматов регионов
-        region_patterns = [
-            r'г\.([А-Я][а-я\-\s]+)',  # г.Москва, г.Санкт-Петербург
-            r'([А-Я][а-я\-\s]+ область)',  # Московская область
-            r'([А-Я][а-я\-\s]+ край)',  # Краснодарский край
-            r'(Республика [А-Я][а-я\-\s]+)',  # Республика Татарстан
-            r'([А-Я][а-я\-\s]+ автономный округ)',  # ХМАО
-            r'([А-Я][а-я\-\s]+ Республика)',  # Чувашская Республика
-        ]
-        
-        for pattern in region_patterns:
-            match = re.search(pattern, text)
-            if match:
-                region = match.group(1) if 'г\.' in pattern else match.group(0)
-                return region.strip()
-        
-        return "Не указан"
+        """Извлечение региона из текста (каноническое название субъекта РФ)"""
+        return REGION_RESOLVER.resolve_name(text)
 
     def parse_company_profile(self, company: Dict) -> Dict:
         """Парсинг профиля компании для получения сайта и соцсетей"""
-        logger.info(f"Парсинг профиля: {company['name']}")
+        logger.info("Парсинг профиля: %s", company['name'],
+                    extra=item_fields('profile', url=company['profile_url'], rank=company['rank'],
+                                      company=company['name']))
         
-        soup = self.get_page(company['profile_url'])
+        soup = self.get_page(company['profile_url'], PROFILE_READY_SELECTOR)
         if not soup:
             logger.warning(f"Не удалось загрузить профиль {company['name']}")
             return company
         
         try:
+            # Ссылки области содержимого разбираются один раз для всех экстракторов;
+            # если области нет (другая верстка) - ссылки всей страницы
+            links = LinkIndex.from_soup(soup.select_one(CONTENT_SELECTOR) or soup)
+            
             # Поиск официального сайта
-            website = self.find_company_website(soup)
+            website = self.find_company_website(links)
             if website:
                 company['website'] = website
             
             # Поиск социальных сетей
-            social_networks = self.find_social_networks(soup)
+            social_networks = self.find_social_networks(links)
             if social_networks:
                 company['social_networks'] = '; '.join(social_networks)
             
@@ -211,47 +256,32 @@ class AdvancedERZRFParser:
         except Exception as e:
             logger.error(f"Ошибка при парсинге профиля {company['name']}: {e}")
         
-        # Задержка между запросами
-        time.sleep(1.5)
         return company
 
-    def find_company_website(self, soup: BeautifulSoup) -> Optional[str]:
+    def find_company_website(self, links: LinkIndex) -> Optional[str]:
         """Поиск официального сайта компании"""
         # Ищем ссылки с текстом "сайт", "официальный сайт" и т.д.
         website_indicators = ['сайт', 'официальный', 'www.', 'http']
+        corporate_links = links.by_kind(CORPORATE)
         
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link.get('href', '')
-            text = link.get_text(strip=True).lower()
-            
-            # Проверяем по тексту ссылки
+        # Проверяем по тексту ссылки
+        for link in corporate_links:
+            text = link.text.lower()
             if any(indicator in text for indicator in website_indicators):
-                if self.is_valid_website_url(href):
-                    return href
-            
-            # Проверяем по URL
-            if self.is_valid_website_url(href) and not self.is_social_network(href):
-                return href
+                return link.href
         
-        return None
+        # Иначе - первый внешний сайт на странице
+        return corporate_links[0].href if corporate_links else None
 
-    def find_social_networks(self, soup: BeautifulSoup) -> List[str]:
+    def find_social_networks(self, links: LinkIndex) -> List[str]:
         """Поиск ссылок на социальные сети"""
         social_networks = []
-        social_domains = [
-            'vk.com', 'instagram.com', 'facebook.com', 't.me',
-            'youtube.com', 'ok.ru', 'twitter.com', 'linkedin.com'
-        ]
+        seen = set()
         
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link.get('href', '')
-            
-            for domain in social_domains:
-                if domain in href.lower() and href not in social_networks:
-                    social_networks.append(href)
-                    break
+        for link in links.by_kind(SOCIAL):
+            if link.href not in seen:
+                seen.add(link.href)
+                social_networks.append(link.href)
         
         return social_networks
 
@@ -274,28 +304,12 @@ class AdvancedERZRFParser:
         return None
 
     def is_valid_website_url(self, url: str) -> bool:
-        """Проверка валидности URL сайта"""
-        if not url or not url.startswith(('http://', 'https://')):
-            return False
-        
-        # Исключаем внутренние ссылки сайта
-        if 'erzrf.ru' in url:
-            return False
-        
-        # Исключаем файлы и якоря
-        if url.endswith(('.pdf', '.doc', '.docx', '.jpg', '.png')) or '#' in url:
-            return False
-        
-        return True
+        """Проверка, может ли URL быть сайтом компании (внешний сайт, не соцсеть и не файл)"""
+        return bool(url) and classify_url(url).kind == CORPORATE
 
     def is_social_network(self, url: str) -> bool:
         """Проверка, является ли URL социальной сетью"""
-        social_domains = [
-            'vk.com', 'instagram.com', 'facebook.com', 't.me',
-            'youtube.com', 'ok.ru', 'twitter.com', 'linkedin.com'
-        ]
-        
-        return any(domain in url.lower() for domain in social_domains)
+        return bool(url) and classify_url(url).kind == SOCIAL
 
     def save_to_csv(self, filename: str = 'top_250_zastroyshchiki_advanced.csv'):
         """Сохранение данных в CSV"""
@@ -321,6 +335,30 @@ class AdvancedERZRFParser:
         
         logger.info(f"Данные сохранены в {filename}")
 
+    def parse_profiles(self):
+        """Загрузка профилей; в режиме Selenium - параллельно всеми браузерами пула"""
+        workers = self.browsers if self.fetch_mode in ('selenium', 'hybrid') else 1
+        total = len(self.companies_data)
+        done = 0
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.parse_company_profile, company): i
+                for i, company in enumerate(self.companies_data)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                self.companies_data[i] = future.result()
+                done += 1
+                logger.info("Обработано %d/%d: %s", done, total, self.companies_data[i]['name'],
+                            extra=item_fields('write', rank=self.companies_data[i]['rank'],
+                                              company=self.companies_data[i]['name']))
+                
+                # Промежуточное сохранение каждые 50 компаний
+                if done % 50 == 0:
+                    self.save_to_csv(f'partial_results_{done}.csv')
+                    logger.info(f"Промежуточное сохранение: обработано {done} компаний")
+
     def run(self, limit: int = 250):
         """Запуск парсера"""
         logger.info(f"Запуск расширенного парсера для топ-{limit} застройщиков")
@@ -339,14 +377,7 @@ class AdvancedERZRFParser:
             # Парсим детальную информацию
             logger.info("Начинаем парсинг детальной информации...")
             
-            for i, company in enumerate(self.companies_data):
-                logger.info(f"Обрабатываем {i+1}/{len(self.companies_data)}: {company['name']}")
-                self.companies_data[i] = self.parse_company_profile(company)
-                
-                # Промежуточное сохранение каждые 50 компаний
-                if (i + 1) % 50 == 0:
-                    self.save_to_csv(f'partial_results_{i+1}.csv')
-                    logger.info(f"Промежуточное сохранение: обработано {i+1} компаний")
+            self.parse_profiles()
             
             # Финальное сохранение
             self.save_to_csv()
@@ -358,14 +389,22 @@ class AdvancedERZRFParser:
                 self.save_to_csv('error_backup.csv')
         
         finally:
-            if self.use_selenium and hasattr(self, 'driver'):
-                self.driver.quit()
+            if self.browser_pool is not None:
+                self.browser_pool.close()
+            if self.render_decisions is not None:
+                self.render_decisions.save()
+            if hasattr(self, 'transport'):
+                self.transport.close()
 
 def main():
     # Можно выбрать использовать Selenium или нет
-    use_selenium = False  # Измените на True, если нужен Selenium
+    # http - только requests, selenium - только браузер,
+    # hybrid - браузер только для страниц, которым не хватает HTTP-ответа
+    fetch_mode = 'hybrid'
+    browsers = 4  # Количество браузеров в пуле Selenium
     
-    parser = AdvancedERZRFParser(use_selenium=use_selenium)
+    setup_logging('erzrf_advanced_parser.log')
+    parser = AdvancedERZRFParser(fetch_mode=fetch_mode, browsers=browsers)
     
     try:
         parser.run(limit=250)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Сквозной бенчмарк парсеров на локальной замене erzrf.ru.
+
+Запуск: python benchmarks/bench_crawl.py [--companies 100] [--latency 0.02]
+        [--error-rate 0.05] [--parsers final basic advanced] [--json result.json]
+
+Каждый парсер запускается в отдельном процессе (во временном каталоге,
+чтобы не трогать рабочие CSV и журнал), поэтому процессорное время и
+пиковый RSS относятся только к нему, а не к серверу и другим прогонам.
+Сеть не нужна: сервер из mock_erzrf.py слушает 127.0.0.1.
+
+Метрики: страниц в секунду (успешные загрузки / время прогона), p50/p95
+времени загрузки страницы на стороне парсера, процессорное время и пиковый
+RSS процесса парсера.
+
+Прогон считается неудачным (код выхода 1), если парсер собрал меньше
+компаний, чем должен: пустой результат означает, что разметка заглушки и
+парсера разошлись, и страницы в секунду ничего не измеряют. Базовый и
+расширенный парсеры читают только первую страницу рейтинга (20 строк).
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from erzrf_html import HTML_BACKENDS  # noqa: E402
+from mock_erzrf import RATING_PAGE_SIZE, MockERZRFServer  # noqa: E402
+
+PARSERS = ('final', 'basic', 'advanced')
+# Парсеры без перехода по страницам рейтинга
+SINGLE_PAGE_PARSERS = ('basic', 'advanced')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def expected_companies(name: str, companies: int) -> int:
+    return min(companies, RATING_PAGE_SIZE) if name in SINGLE_PAGE_PARSERS else companies
+
+
+def failed_runs(rows: List[Dict], companies: int) -> List[str]:
+    """Парсеры, собравшие меньше компаний, чем есть в рейтинге (с учетом SINGLE_PAGE_PARSERS)"""
+    return [
+        row['parser'] for row in rows
+        if 'skipped' not in row and row['companies'] < expected_companies(row['parser'], companies)
+    ]
+
+
+def create_parser(name: str, options: Dict):
+    """Экземпляр парсера с быстрым фиксированным лимитом и выбранным транспортом"""
+    from erzrf_rate_limit import RateLimiter
+
+    rate_limiter = RateLimiter(options['rps'], burst=options['workers'], max_rate=options['rps'])
+    common = dict(
+        transport=options['transport'],
+        html_backend=options['html_parser'],
+        rate_limiter=rate_limiter,
+    )
+    if name == 'final':
+        from erzrf_final_parser import ERZRFFinalParser
+        return ERZRFFinalParser(max_workers=options['workers'], source=options['source'],
+                                parse_processes=options['parse_processes'], pipeline=options['pipeline'],
+                                **common)
+    if name == 'basic':
+        from erzrf_parser import ERZRFParser
+        return ERZRFParser(**common)
+    if name == 'advanced':
+        from advanced_erzrf_parser import AdvancedERZRFParser
+        return AdvancedERZRFParser(use_selenium=False, **common)
+    raise ValueError(f"Неизвестный парсер: {name}")
+
+
+def run_parser(name: str, base_url: str, options: Dict, results):
+    """Прогон одного парсера в дочернем процессе; результат кладется в очередь"""
+    os.chdir(tempfile.mkdtemp(prefix=f'bench-{name}-'))
+    if options['verbose']:
+        from erzrf_logging import setup_logging
+        setup_logging()
+    else:
+        logging.disable(logging.INFO)
+
+    try:
+        parser = create_parser(name, options)
+    except ImportError as e:
+        results.put({'parser': name, 'skipped': str(e)})
+        return
+    parser.base_url = base_url
+
+    latencies = []
+    failures = [0]
+    fetch = parser.transport.fetch
+
+    def timed_fetch(url, retries=3):
+        start = time.perf_counter()
+        html = fetch(url, retries)
+        latencies.append(time.perf_counter() - start)
+        if html is None:
+            failures[0] += 1
+        return html
+
+    parser.transport.fetch = timed_fetch
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if name == 'final':
+        parser.run(limit=options['companies'], parse_details=True, output='result.csv')
+    else:
+        parser.run(limit=options['companies'])
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    pages = len(latencies) - failures[0]
+    results.put({
+        'parser': name,
+        'companies': len(parser.companies_data),
+        'pages': pages,
+        'failed': failures[0],
+        'seconds': wall,
+        'pages_per_second': pages / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'cpu_seconds': cpu,
+        # На Linux ru_maxrss в килобайтах, на macOS - в байтах
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (
+            1024 * 1024 if sys.platform == 'darwin' else 1024),
+    })
+
+
+def bench(name: str, base_url: str, options: Dict) -> Dict:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_parser, args=(name, base_url, options, results))
+    process.start()
+    try:
+        result = results.get(timeout=options['timeout'])
+    except Exception:
+        result = {'parser': name, 'skipped': 'нет результата (таймаут или падение процесса)'}
+    process.join(5)
+    if process.is_alive():
+        process.terminate()
+    return result
+
+
+def print_report(rows: List[Dict]):
+    print(f"{'парсер':<10} {'компаний':>8} {'страниц':>8} {'ошибок':>7} {'стр/с':>8} "
+          f"{'p50, мс':>8} {'p95, мс':>8} {'CPU, с':>7} {'RSS, МБ':>8}")
+    for row in rows:
+        if 'skipped' in row:
+            print(f"{row['parser']:<10} пропущен: {row['skipped']}")
+            continue
+        print(f"{row['parser']:<10} {row['companies']:>8} {row['pages']:>8} {row['failed']:>7} "
+              f"{row['pages_per_second']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['cpu_seconds']:>7.2f} {row['peak_rss_mb']:>8.1f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Сквозной бенчмарк парсеров на локальном сервере')
+    arg_parser.add_argument('--parsers', nargs='+', choices=PARSERS, default=list(PARSERS))
+    arg_parser.add_argument('--companies', type=int, default=100, help='Строк в рейтинге и лимит парсеров')
+    arg_parser.add_argument('--latency', type=float, default=0.02, help='Базовая задержка ответа сервера, с')
+    arg_parser.add_argument('--jitter', type=float, default=0.01, help='Случайная добавка к задержке, с')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+    arg_parser.add_argument('--retry-after', type=int, default=None,
+                            help='Значение Retry-After в ответах 503 (по умолчанию без заголовка)')
+    arg_parser.add_argument('--rps', type=float, default=1000.0, help='Лимит запросов в секунду для парсеров')
+    arg_parser.add_argument('--workers', type=int, default=8, help='Потоки финального парсера')
+    arg_parser.add_argument('--transport', choices=['requests', 'aiohttp'], default='requests')
+    arg_parser.add_argument('--html-parser', choices=HTML_BACKENDS, default=None,
+                            help='Бэкенд разбора HTML (по умолчанию самый быстрый из установленных)')
+    arg_parser.add_argument('--source', choices=['html', 'api'], default='html',
+                            help='Источник рейтинга для финального парсера')
+    arg_parser.add_argument('--parse-processes', type=int, default=0,
+                            help='Процессы разбора профилей финального парсера (CPU процессов не учитывается)')
+    arg_parser.add_argument('--pipeline', action='store_true',
+                            help='Финальный парсер обрабатывает профили потоковым конвейером')
+    arg_parser.add_argument('--timeout', type=float, default=600, help='Максимальное время прогона парсера, с')
+    arg_parser.add_argument('--json', help='Сохранить результаты в JSON (для сравнения в CI)')
+    arg_parser.add_argument('--verbose', action='store_true', help='Не отключать INFO-логи парсеров')
+    args = arg_parser.parse_args()
+
+    options = vars(args)
+    server = MockERZRFServer(args.companies, args.latency, args.jitter, args.error_rate,
+                             retry_after=args.retry_after)
+    rows = []
+    with server:
+        for name in args.parsers:
+            rows.append(bench(name, server.base_url, options))
+
+    print(f"Сервер: {server.requests} запросов, {server.errors} ответов 503")
+    print_report(rows)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'results': rows}, f, ensure_ascii=False, indent=2)
+
+    failed = failed_runs(rows, args.companies)
+    for name in failed:
+        row = next(row for row in rows if row['parser'] == name)
+        print(f"Ошибка: {name} собрал {row['companies']} компаний из "
+              f"{expected_companies(name, args.companies)}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
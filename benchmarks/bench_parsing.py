@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Сравнение скорости разбора сохраненной страницы рейтинга.
+
+Запуск: python benchmarks/bench_parsing.py [--repeat 20]
+
+Базовая линия повторяет прежнюю схему: дерево html.parser и отдельный
+soup.find_all('a') в каждом экстракторе. Остальные варианты разбирают
+страницу один раз и строят общий индекс ссылок на выбранном бэкенде.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from erzrf_html import HTML_BACKENDS, ParsedPage, resolve_backend
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'erzrf_page_structure.html')
+
+
+def baseline(html: str):
+    """Прежняя схема: три прохода find_all по дереву html.parser и get_text"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for _ in range(3):
+        for link in soup.find_all('a', href=True):
+            link.get('href', '')
+            link.get_text(strip=True)
+    soup.get_text()
+
+
+def link_index(html: str, backend: str):
+    """Один разбор, общий индекс ссылок и текст страницы"""
+    page = ParsedPage(html, backend)
+    links = page.links
+    for _ in range(3):
+        for link in links:
+            link.href
+    page.text
+
+
+def measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк разбора HTML')
+    arg_parser.add_argument('--repeat', type=int, default=10)
+    args = arg_parser.parse_args()
+
+    with open(FIXTURE, encoding='utf-8') as f:
+        html = f.read()
+
+    base = measure(lambda: baseline(html), args.repeat)
+    print(f"{'html.parser, 3 x find_all':<32} {base * 1000:8.1f} мс")
+
+    for backend in HTML_BACKENDS:
+        if resolve_backend(backend) != backend:
+            print(f"{backend + ', индекс ссылок':<32} {'нет библиотеки':>11}")
+            continue
+        elapsed = measure(lambda: link_index(html, backend), args.repeat)
+        print(f"{backend + ', индекс ссылок':<32} {elapsed * 1000:8.1f} мс  x{base / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
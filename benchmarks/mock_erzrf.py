@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Локальная замена erzrf.ru для бенчмарков.
+
+Страница рейтинга строится из сохраненной страницы erzrf_page_structure.html:
+шапка и подвал остаются как есть, а список застройщиков дополняется до
+нужного числа строк копиями первой строки и разбивается на страницы по
+20 строк, как на сайте. Профили застройщиков
+генерируются в оболочке страниц сайта: шапка, область содержимого
+div.router и подвал со ссылками на соцсети самого erzrf.ru. Задержка ответа и доля ошибок задаются параметрами.
+
+Запуск отдельно: python benchmarks/mock_erzrf.py --port 8800 --companies 250
+"""
+
+import argparse
+import copy
+import http.server
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from bs4 import BeautifulSoup
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'erzrf_page_structure.html')
+
+RATING_PATH = '/top-zastroyshchikov/rf'
+PROFILE_PREFIX = '/zastroyschiki/brand/'
+API_PATH = '/api/top-developers'
+API_PAGE_SIZE = 20
+RATING_PAGE_SIZE = 20
+
+REGIONS = [
+    'г.Москва', 'Московская область', 'г.Санкт-Петербург', 'Краснодарский край',
+    'Свердловская область', 'Республика Татарстан', 'Новосибирская область',
+    'Ленинградская область', 'Тюменская область', 'Ростовская область',
+]
+
+PROFILE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head><meta charset="utf-8"><title>{name} - ЕРЗ.РФ</title></head>
+<body>
+<app-root>
+<header class="header-container">
+  <nav>
+    <a href="/">Главная</a>
+    <a href="/top-zastroyshchikov/rf?regionKey=0&amp;topType=0&amp;date=250801">Топ застройщиков</a>
+    <a href="/novostroyki">Новостройки</a>
+    <a href="/zastroyschiki">Застройщики</a>
+    <a href="/analytics">Аналитика</a>
+    <a href="https://profi.erzrf.ru/info/">ЕРЗ.РФ PROFI</a>
+  </nav>
+</header>
+<div class="router">
+  <h1>{name}</h1>
+  <div class="developer-info">
+    <p>Регион: {region}</p>
+    <p>Строится, м²: {area}</p>
+    <p>Официальный сайт: <a href="{website}">{website}</a></p>
+  </div>
+  <div class="developer-social">
+    <a href="https://vk.com/{slug}">ВКонтакте</a>
+    <a href="https://t.me/{slug}">Telegram</a>
+    <a href="https://www.youtube.com/@{slug}">YouTube</a>
+  </div>
+  <ul class="developer-projects">
+{projects}
+  </ul>
+</div>
+<app-footer class="container footer--main">
+  <a href="/about">О проекте</a>
+  <a href="/contacts">Контакты</a>
+  <a href="https://vk.com/erzrf_ru">ЕРЗ.РФ ВКонтакте</a>
+  <a href="https://t.me/+kf4d9SlCRpRiMGQy">ЕРЗ.РФ в Telegram</a>
+</app-footer>
+</app-root>
+</body>
+</html>
+"""
+
+
+def company_slug(rank: int) -> str:
+    return f"zastroyshchik-{rank}-{1000000 + rank}001"
+
+
+def build_rating_page(companies: int, fixture: str = FIXTURE, page: int = 1,
+                      page_size: Optional[int] = RATING_PAGE_SIZE) -> str:
+    """Страница рейтинга номер page в разметке сохраненной страницы.
+
+    На странице page_size строк (как на сайте, 20), подсказка "1 - 20 из N"
+    и ссылки навигации соответствуют номеру страницы. При page_size=None
+    все строки выводятся на одной странице.
+    """
+    with open(fixture, encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+
+    rows_list = soup.select_one('ul.developers__list--top')
+    rows = rows_list.find_all('li', recursive=False)
+    template = rows[0]
+    for row in rows:
+        row.extract()
+
+    page_size = page_size or max(companies, 1)
+    last_page = max(1, math.ceil(companies / page_size))
+    first = (page - 1) * page_size + 1
+    last = min(companies, page * page_size)
+    for rank in range(first, last + 1):
+        row = copy.copy(template)
+        slug = company_slug(rank)
+        cell = row.select_one('.developer-td-1')
+        cell.contents[0].replace_with(f"\n{rank}\n")
+        link = row.select_one('.developer-td-3 a')
+        link['href'] = (f"{PROFILE_PREFIX}{slug}?region=vse-regiony&regionKey=0"
+                        f"&organizationId={1000000 + rank}001")
+        link.string = f"Застройщик {rank}"
+        link.next_sibling.replace_with(f"\n, {REGIONS[rank % len(REGIONS)]}\n")
+        rows_list.append(row)
+
+    hint = soup.select_one('.pagination__hint')
+    if hint is not None:
+        hint.string = f" {first} - {last} из {companies} застройщиков "
+    targets = {'««': 1, '«': max(1, page - 1), '»': min(last_page, page + 1), '»»': last_page}
+    number = 0
+    for link in soup.select('.pagination a.page-link'):
+        text = link.get_text(strip=True)
+        if text.isdigit():
+            number += 1
+            if number > last_page:
+                link.find_parent('li').decompose()
+                continue
+            target = number
+            link.string = f" {number} "
+        else:
+            target = targets.get(text, 1)
+        link['href'] = f"{RATING_PATH}?regionKey=0&topType=0&date=250801" + (f"&page={target}" if target > 1 else '')
+
+    return str(soup)
+
+
+def company_row(rank: int) -> dict:
+    slug = company_slug(rank)
+    return {
+        'place': rank,
+        'name': f"Застройщик {rank}",
+        'regionName': REGIONS[rank % len(REGIONS)],
+        'url': f"{PROFILE_PREFIX}{slug}?region=vse-regiony&regionKey=0&organizationId={1000000 + rank}001",
+    }
+
+
+def build_api_page(companies: int, page: int) -> str:
+    """Страница JSON API рейтинга по API_PAGE_SIZE записей"""
+    first = (page - 1) * API_PAGE_SIZE + 1
+    last = min(companies, first + API_PAGE_SIZE - 1)
+    return json.dumps({
+        'total': companies,
+        'page': page,
+        'items': [company_row(rank) for rank in range(first, last + 1)],
+    }, ensure_ascii=False)
+
+
+def build_profile_page(slug: str) -> str:
+    match = re.match(r'zastroyshchik-(\d+)-', slug)
+    rank = int(match.group(1)) if match else 0
+    projects = '\n'.join(
+        f'    <li><a href="/novostroyki/zhk-{slug}-{i}">ЖК {i}</a></li>' for i in range(1, 16)
+    )
+    return PROFILE_TEMPLATE.format(
+        name=f"Застройщик {rank}",
+        region=REGIONS[rank % len(REGIONS)],
+        area=f"{(rank * 7919) % 1000000:,}".replace(',', ' '),
+        website=f"https://www.stroy-{rank}.ru/",
+        slug=slug,
+        projects=projects,
+    )
+
+
+class MockERZRFServer:
+    """HTTP-сервер в фоновом потоке, отвечающий как erzrf.ru.
+
+    latency - базовая задержка ответа в секундах, к ней добавляется
+    равномерная случайная добавка до jitter секунд. С вероятностью
+    error_rate вместо страницы возвращается 503 с Retry-After: retry_after.
+    Рейтинг разбит на страницы по page_size строк (параметр page), как на
+    сайте; page_size=None - все строки на одной странице. При api=True
+    сервер отдает и JSON API рейтинга (API_PATH), адрес которого
+    упоминается в JS-бандле страницы, как на настоящем сайте.
+    """
+
+    def __init__(self, companies: int = 100, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, retry_after: Optional[int] = None,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0, fixture: str = FIXTURE,
+                 api: bool = True, page_size: Optional[int] = RATING_PAGE_SIZE):
+        self.companies = companies
+        self.fixture = fixture
+        self.page_size = page_size
+        self.api = api
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        # Страницы рейтинга строятся при первом запросе
+        self._rating_pages = {}
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def rating_page(self, page: int) -> bytes:
+        with self._lock:
+            body = self._rating_pages.get(page)
+        if body is None:
+            body = build_rating_page(self.companies, self.fixture, page, self.page_size).encode('utf-8')
+            with self._lock:
+                self._rating_pages[page] = body
+        return body
+
+    def _decide(self):
+        """Задержка и признак ошибки для очередного запроса"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                delay, failed = server._decide()
+                if delay:
+                    time.sleep(delay)
+
+                parsed = urlparse(self.path)
+                path = parsed.path
+                if failed:
+                    self._send(503, b'Service Unavailable', retry_after=server.retry_after)
+                elif server.api and path == API_PATH:
+                    page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+                    self._send(200, build_api_page(server.companies, page).encode('utf-8'),
+                               content_type='application/json; charset=utf-8')
+                elif server.api and re.match(r'/main-es\d+\.\w+\.js$', path):
+                    bundle = f'var e={{ratingUrl:"{API_PATH}",staticUrl:"/assets/"}};'
+                    self._send(200, bundle.encode('utf-8'), content_type='application/javascript')
+                elif path == RATING_PATH:
+                    page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+                    self._send(200, server.rating_page(page))
+                elif path.startswith(PROFILE_PREFIX):
+                    slug = path[len(PROFILE_PREFIX):].strip('/')
+                    self._send(200, build_profile_page(slug).encode('utf-8'))
+                else:
+                    self._send(404, b'Not Found')
+
+            def _send(self, status: int, body: bytes, retry_after: Optional[int] = None,
+                      content_type: str = 'text/html; charset=utf-8'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if retry_after is not None:
+                    self.send_header('Retry-After', str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'MockERZRFServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-erzrf', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Локальная замена erzrf.ru')
+    arg_parser.add_argument('--port', type=int, default=8800)
+    arg_parser.add_argument('--companies', type=int, default=250)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='Базовая задержка ответа, с')
+    arg_parser.add_argument('--jitter', type=float, default=0.02, help='Случайная добавка к задержке, с')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+    args = arg_parser.parse_args()
+
+    server = MockERZRFServer(args.companies, args.latency, args.jitter, args.error_rate, port=args.port)
+    print(f"Сервер запущен: {server.base_url}{RATING_PATH}?regionKey=0&topType=0&date=250801")
+    with server:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
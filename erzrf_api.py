@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import re
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlencode, urljoin
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATING_PARAMS = {'regionKey': 0, 'topType': 0, 'date': '250801'}
+RATING_PATH = '/top-zastroyshchikov/rf'
+
+
+def rating_params(params: Optional[Dict] = None) -> Dict:
+    """Параметры рейтинга (regionKey, topType, date) с подстановкой значений по умолчанию"""
+    return dict(DEFAULT_RATING_PARAMS, **(params or {}))
+
+
+def rating_page_url(base_url: str, params: Optional[Dict] = None) -> str:
+    """Адрес HTML-страницы рейтинга с заданными параметрами"""
+    return f"{base_url}{RATING_PATH}?{urlencode(rating_params(params))}"
+
+# Строковые литералы в JS-бандлах, похожие на адреса API рейтинга
+_API_LITERAL = re.compile(r'''["'`](/?(?:[\w.-]+/)*api/[\w./{}$-]*)["'`]''', re.IGNORECASE)
+_RATING_HINTS = ('top', 'rating', 'developer', 'zastroy')
+
+# Возможные имена полей записи рейтинга в JSON-ответе
+NAME_KEYS = ('name', 'brandName', 'developerName', 'title', 'shortName')
+REGION_KEYS = ('regionName', 'region', 'cityName', 'city', 'location')
+URL_KEYS = ('url', 'link', 'href', 'brandUrl', 'profileUrl')
+ID_KEYS = ('organizationId', 'brandId', 'developerId', 'id')
+PLACE_KEYS = ('place', 'rank', 'position', 'number')
+TOTAL_KEYS = ('total', 'totalCount', 'count', 'totalItems')
+
+
+def _first(record: Dict, keys) -> Optional[object]:
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def find_records(payload) -> List[Dict]:
+    """Самый длинный список объектов с названием компании в JSON-ответе"""
+    best: List[Dict] = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            if node and all(isinstance(item, dict) for item in node):
+                if len(node) > len(best) and any(_first(item, NAME_KEYS) for item in node):
+                    best = node
+            stack.extend(node)
+    return best
+
+
+def find_total(payload) -> Optional[int]:
+    if isinstance(payload, dict):
+        value = _first(payload, TOTAL_KEYS)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def discover_endpoints(html: str, page_url: str, fetch: Callable[[str], Optional[str]]) -> List[str]:
+    """Поиск адресов JSON API, из которых виджет рейтинга загружает данные.
+
+    Проверяются встроенное состояние Angular (TransferState: ключи - адреса
+    запросов) и строковые литералы в подключенных JS-бандлах. Возвращаются
+    абсолютные адреса без параметров запроса, в порядке обнаружения.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    base = soup.find('base', href=True)
+    if base is not None:
+        page_url = urljoin(page_url, base['href'])
+    candidates: List[str] = []
+
+    def add(path: str):
+        url = urljoin(page_url, path.split('?')[0].split('${')[0])
+        if url not in candidates:
+            candidates.append(url)
+
+    for script in soup.find_all('script', type='application/json'):
+        try:
+            state = json.loads(script.string or '')
+        except ValueError:
+            continue
+        if isinstance(state, dict):
+            for key in state:
+                if isinstance(key, str) and 'topType' in key:
+                    add(key)
+
+    for script in soup.find_all('script', src=True):
+        src = script['src']
+        # es5- и es2015-сборки содержат одни и те же адреса, достаточно одной
+        if candidates or not re.search(r'(^|/)main[-.]', src):
+            continue
+        bundle = fetch(urljoin(page_url, src))
+        if not bundle:
+            continue
+        for match in _API_LITERAL.finditer(bundle):
+            path = match.group(1)
+            if any(hint in path.lower() for hint in _RATING_HINTS):
+                add(path)
+
+    if candidates:
+        logger.info(f"Найдены адреса API рейтинга: {', '.join(candidates)}")
+    return candidates
+
+
+class RatingApiClient:
+    """Постраничная загрузка рейтинга из JSON API.
+
+    Адрес API задается явно (endpoint) или находится на странице рейтинга
+    через discover_endpoints. Страницы запрашиваются с параметрами
+    regionKey, topType, date и page, пока не наберется limit записей, не
+    кончатся новые записи или не будет достигнуто значение total из ответа.
+    """
+
+    def __init__(self, fetch: Callable[[str], Optional[str]], base_url: str,
+                 endpoint: Optional[str] = None, params: Optional[Dict] = None, page_param: str = 'page'):
+        self.fetch = fetch
+        self.base_url = base_url
+        self.endpoint = endpoint
+        self.params = rating_params(params)
+        self.page_param = page_param
+        self._first_page = None
+
+    def page_url(self, endpoint: str, page: int) -> str:
+        return f"{endpoint}?{urlencode(dict(self.params, **{self.page_param: page}))}"
+
+    def _load(self, url: str):
+        body = self.fetch(url)
+        if body is None:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            logger.debug(f"Ответ {url} не является JSON")
+            return None
+
+    def resolve_endpoint(self, rating_html: Optional[str], rating_url: str) -> Optional[str]:
+        """Первый адрес-кандидат, который отвечает JSON с записями рейтинга"""
+        if self.endpoint:
+            return self.endpoint
+        if not rating_html:
+            return None
+        for candidate in discover_endpoints(rating_html, rating_url, self.fetch):
+            payload = self._load(self.page_url(candidate, 1))
+            if find_records(payload):
+                # Первая страница уже загружена, повторно ее не запрашиваем
+                self._first_page = payload
+                self.endpoint = candidate
+                logger.info(f"Используется API рейтинга: {candidate}")
+                return candidate
+        return None
+
+    def iter_records(self, limit: int) -> Iterator[Dict]:
+        seen = set()
+        page = 1
+        while len(seen) < limit:
+            if page == 1 and self._first_page is not None:
+                payload = self._first_page
+            else:
+                payload = self._load(self.page_url(self.endpoint, page))
+            records = find_records(payload)
+            new = 0
+            for record in records:
+                key = json.dumps(record, sort_keys=True, ensure_ascii=False)
+                if key in seen:
+                    continue
+                seen.add(key)
+                new += 1
+                yield record
+                if len(seen) >= limit:
+                    return
+            total = find_total(payload)
+            # API, не поддерживающий постраничность, возвращает ту же страницу
+            if not new or (total is not None and len(seen) >= total):
+                return
+            page += 1
+
+    def company_from_record(self, record: Dict) -> Optional[Dict]:
+        """Название, текст региона, адрес профиля и место из записи API; None, если названия
+        или адреса нет. Место - None, если в записи его нет или оно не число"""
+        name = _first(record, NAME_KEYS)
+        if not name:
+            return None
+        url = _first(record, URL_KEYS)
+        if url is None:
+            org_id = _first(record, ID_KEYS)
+            if org_id is None:
+                return None
+            url = (f"/zastroyschiki/brand/{org_id}?region=vse-regiony"
+                   f"&regionKey={self.params['regionKey']}&organizationId={org_id}")
+        region = _first(record, REGION_KEYS) or ''
+        if isinstance(region, dict):
+            region = _first(region, NAME_KEYS) or ''
+        place = _first(record, PLACE_KEYS)
+        try:
+            place = int(place) if place is not None else None
+        except (TypeError, ValueError):
+            place = None
+        return {
+            'name': str(name).strip(),
+            'region_text': str(region),
+            'profile_url': urljoin(self.base_url, str(url)),
+            'place': place,
+        }
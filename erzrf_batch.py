@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from erzrf_regions import REGION_RESOLVER
+from erzrf_rows import RatingTable
+from erzrf_sinks import BATCH_COLUMNS, open_sink
+
+logger = logging.getLogger(__name__)
+
+
+class RatingKey(NamedTuple):
+    region_key: int
+    top_type: int
+    date: str
+
+    def params(self) -> Dict:
+        return {'regionKey': self.region_key, 'topType': self.top_type, 'date': self.date}
+
+
+def canonical_profile_url(url: str) -> str:
+    """Адрес профиля без параметров запроса.
+
+    Ссылки на одного застройщика из разных рейтингов отличаются только
+    параметрами (regionKey, region), поэтому ключом профиля служит путь.
+    """
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/')}"
+
+
+class BatchCrawler:
+    """Пакетный обход рейтингов: регионы x типы рейтинга x даты.
+
+    Каждая страница рейтинга загружается один раз. Профиль застройщика,
+    встречающийся в нескольких рейтингах, загружается один раз за пакет, и
+    его данные подставляются во все строки. Результат - одна сводная
+    таблица с параметрами рейтинга в первых колонках (BATCH_COLUMNS).
+    Загрузка страниц и профилей идет через парсер (ERZRFFinalParser) и
+    использует его потоки, лимитер и кэш.
+    """
+
+    def __init__(self, parser, regions: List[int], top_types: List[int], dates: List[str], limit: int = 250):
+        self.parser = parser
+        self.regions = regions
+        self.top_types = top_types
+        self.dates = dates
+        self.limit = limit
+
+    def matrix(self) -> List[RatingKey]:
+        return [RatingKey(*cell) for cell in itertools.product(self.regions, self.top_types, self.dates)]
+
+    def crawl_ratings(self) -> Dict[RatingKey, List[Dict]]:
+        """Загрузка всех страниц рейтинга матрицы"""
+        keys = self.matrix()
+        logger.info(f"Пакетный обход: {len(keys)} рейтингов")
+        with ThreadPoolExecutor(max_workers=self.parser.max_workers) as executor:
+            results = executor.map(lambda key: self.parser.parse_main_page(self.limit, key.params()), keys)
+            rankings = dict(zip(keys, results))
+
+        for key, companies in rankings.items():
+            if not companies:
+                logger.warning(f"Рейтинг {key.params()} пуст или не загрузился")
+        return rankings
+
+    def crawl_profiles(self, rankings: Dict[RatingKey, List[Dict]]) -> Dict[str, Dict]:
+        """Загрузка каждого уникального профиля один раз: канонический адрес -> данные профиля"""
+        unique: Dict[str, Dict] = {}
+        rows = 0
+        for companies in rankings.values():
+            for company in companies:
+                rows += 1
+                unique.setdefault(canonical_profile_url(company['profile_url']), company)
+
+        logger.info(f"Строк в рейтингах: {rows}, уникальных профилей: {len(unique)}")
+        self.parser.learn_template(list(unique.values()))
+        with ThreadPoolExecutor(max_workers=self.parser.max_workers) as executor:
+            results = executor.map(lambda company: self.parser.parse_company_profile(dict(company)),
+                                   unique.values())
+            return dict(zip(unique.keys(), results))
+
+    def merge(self, key: RatingKey, company: Dict, profiles: Dict[str, Dict]) -> Dict:
+        """Строка сводной таблицы: позиция из рейтинга, сайт и соцсети из профиля"""
+        row = dict(company, **key.params())
+        profile = profiles.get(canonical_profile_url(company['profile_url']))
+        if profile:
+            row['website'] = profile['website']
+            row['social_networks'] = profile['social_networks']
+            if row['region'] == "Не указан" and profile['region'] != "Не указан":
+                row['region'] = profile['region']
+                row['region_id'] = REGION_RESOLVER.region_id(profile['region'])
+        return row
+
+    def table(self, rankings: Dict[RatingKey, List[Dict]]) -> RatingTable:
+        """Колоночная таблица метрик всех рейтингов пакета с параметрами рейтинга в словарных колонках"""
+        return RatingTable.concat([
+            RatingTable.from_companies(rankings[key], date=key.date, region_key=key.region_key,
+                                       top_type=key.top_type)
+            for key in self.matrix()
+        ])
+
+    def run(self, output: str = 'erzrf_batch.csv', parse_details: bool = True,
+            table_path: Optional[str] = None, history=None):
+        """history - историческое хранилище (erzrf_history.RatingHistory), в которое
+        добавляются строки всех рейтингов пакета"""
+        rankings = self.crawl_ratings()
+        if table_path:
+            self.table(rankings).save(table_path)
+        if history is not None:
+            for key in self.matrix():
+                if rankings[key]:
+                    history.ingest(rankings[key], key.date, key.region_key, key.top_type)
+        profiles = self.crawl_profiles(rankings) if parse_details else {}
+
+        with open_sink(output, ordered=False, columns=BATCH_COLUMNS) as sink:
+            for key in self.matrix():
+                for company in rankings[key]:
+                    sink.write(self.merge(key, company, profiles))
+        logger.info(f"Пакетный обход завершен: {len(rankings)} рейтингов, {len(profiles)} профилей")
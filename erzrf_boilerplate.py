@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+from collections import Counter
+from typing import FrozenSet, List, Optional, Tuple
+
+from erzrf_html import LinkIndex, ParsedPage, classify_link
+
+logger = logging.getLogger(__name__)
+
+# Глубина пути блока от <body>, по которой блоки сравниваются между страницами
+BLOCK_DEPTH = 4
+
+
+def normalize_href(href: str) -> str:
+    return href.strip().lower().rstrip('/')
+
+
+def _common_prefix(paths: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+    prefix = paths[0] if paths else ()
+    for path in paths[1:]:
+        size = 0
+        while size < min(len(prefix), len(path)) and prefix[size] == path[size]:
+            size += 1
+        prefix = prefix[:size]
+    return prefix
+
+
+class ProfileTemplate:
+    """Шаблон страниц профилей: общие для всех профилей ссылки и блоки.
+
+    Строится по нескольким загруженным профилям (learn). Ссылка считается
+    частью шаблона сайта (меню, шапка, подвал, соцсети самого erzrf.ru),
+    если она есть на доле страниц не меньше share, а блок - если на такой
+    доле страниц в нем одинаковый набор ссылок. Область данных компании -
+    общий предок блоков, содержимое которых от страницы к странице разное.
+    Извлечение идет только из этой области, а ссылки и блоки шаблона
+    отбрасываются.
+    """
+
+    def __init__(self, boilerplate_hrefs: FrozenSet[str], boilerplate_blocks: FrozenSet[Tuple[str, ...]],
+                 content_path: Tuple[str, ...], pages: int):
+        self.boilerplate_hrefs = boilerplate_hrefs
+        self.boilerplate_blocks = boilerplate_blocks
+        self.content_path = content_path
+        self.pages = pages
+
+    @property
+    def content_selector(self) -> Optional[str]:
+        """Область данных в виде CSS-селектора (для лога); None - вся страница"""
+        if not self.content_path:
+            return None
+        return ' > '.join(('body',) + self.content_path)
+
+    @classmethod
+    def learn(cls, pages: List[ParsedPage], share: float = 0.6,
+              depth: int = BLOCK_DEPTH) -> Optional['ProfileTemplate']:
+        """Шаблон по страницам профилей разных компаний; None, если страниц меньше двух"""
+        if len(pages) < 2:
+            return None
+        min_pages = max(2, math.ceil(share * len(pages)))
+        href_pages = Counter()
+        block_pages = Counter()
+        block_contents = Counter()
+        page_links = []
+        for page in pages:
+            blocks = {}
+            for anchor in page.anchors():
+                blocks.setdefault(anchor.path[:depth], set()).add(normalize_href(anchor.href))
+            page_links.append(blocks)
+            href_pages.update(set().union(*blocks.values()) if blocks else ())
+            block_pages.update(blocks.keys())
+            block_contents.update((path, frozenset(hrefs)) for path, hrefs in blocks.items())
+
+        hrefs = frozenset(href for href, count in href_pages.items() if count >= min_pages)
+        blocks = frozenset(path for (path, _), count in block_contents.items() if count >= min_pages)
+        # Блоки со ссылками компании, которые есть на большинстве страниц
+        content = [
+            path for path, count in block_pages.items()
+            if count >= min_pages and path not in blocks
+            and any(hrefs_on_page.get(path, set()) - hrefs for hrefs_on_page in page_links)
+        ]
+        template = cls(hrefs, blocks, _common_prefix(content), len(pages))
+        logger.info(f"Шаблон профиля по {len(pages)} страницам: общих ссылок {len(hrefs)}, "
+                    f"общих блоков {len(blocks)}, область данных: {template.content_selector or 'body'}")
+        return template
+
+    def is_boilerplate(self, href: str, path: Tuple[str, ...], depth: int = BLOCK_DEPTH) -> bool:
+        return normalize_href(href) in self.boilerplate_hrefs or path[:depth] in self.boilerplate_blocks
+
+    def links(self, page: ParsedPage) -> LinkIndex:
+        """Ссылки области данных без ссылок и блоков шаблона.
+
+        Если области данных на странице нет (другая верстка), берутся все
+        ссылки страницы за вычетом шаблонных.
+        """
+        anchors = page.anchors(self.content_path) if self.content_path else []
+        if not anchors:
+            anchors = page.anchors()
+        return LinkIndex([
+            classify_link(anchor.href)._replace(text=anchor.text)
+            for anchor in anchors if not self.is_boilerplate(anchor.href, anchor.path)
+        ])
+
+    def text(self, page: ParsedPage) -> str:
+        """Текст области данных (или всей страницы, если области нет)"""
+        text = page.text_in(self.content_path) if self.content_path else ''
+        return text or page.text
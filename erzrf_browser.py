@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Dict, Optional
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError:
+    webdriver = None
+
+from erzrf_rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+# Ресурсы, которые не нужны для разбора HTML
+BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css',
+]
+
+
+def chrome_options(headless: bool = True) -> 'Options':
+    """Настройки Chrome: без окна, без картинок и с облегченной загрузкой страницы"""
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_argument(f'--user-agent={USER_AGENT}')
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.stylesheets': 2,
+        'profile.managed_default_content_settings.fonts': 2,
+    })
+    # Не ждем загрузки всех ресурсов: готовность страницы проверяет WebDriverWait
+    options.page_load_strategy = 'eager'
+    return options
+
+
+def page_ready(selector: Optional[str] = None):
+    """Условие для WebDriverWait: документ загружен и (если задан) есть элемент по CSS-селектору.
+
+    Селектор должен указывать на содержимое самой страницы, а не на шапку
+    или подвал сайта: они появляются раньше данных и есть на любой странице
+    (см. PROFILE_READY_SELECTOR в advanced_erzrf_parser).
+    """
+    def condition(driver) -> bool:
+        if driver.execute_script('return document.readyState') != 'complete':
+            return False
+        if selector is None:
+            return True
+        return bool(driver.execute_script('return document.querySelector(arguments[0]) !== null', selector))
+    return condition
+
+
+class BrowserPool:
+    """Пул headless-браузеров Chrome.
+
+    Драйверы создаются по мере необходимости (не больше size) и используются
+    повторно. После recycle_after страниц драйвер закрывается и при следующем
+    запросе заменяется новым, чтобы память браузера не росла бесконечно.
+    Вместо фиксированной паузы после загрузки страница ждет условия
+    готовности не дольше wait_timeout секунд. Картинки, шрифты и CSS
+    блокируются.
+    """
+
+    def __init__(self, size: int = 1, recycle_after: int = 50, wait_timeout: float = 10.0,
+                 page_load_timeout: float = 30.0, rate_limiter: Optional[RateLimiter] = None,
+                 headless: bool = True):
+        if webdriver is None:
+            raise ImportError("Для работы через браузер установите selenium")
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self.wait_timeout = wait_timeout
+        self.page_load_timeout = page_load_timeout
+        self.rate_limiter = rate_limiter
+        self.headless = headless
+        self._idle: 'queue.Queue' = queue.Queue()
+        self._pages = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Запуск всех браузеров пула заранее; ошибка запуска Chrome видна сразу"""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._create_driver())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _create_driver(self):
+        driver = webdriver.Chrome(options=chrome_options(self.headless))
+        driver.set_page_load_timeout(self.page_load_timeout)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+        except WebDriverException as e:
+            logger.debug(f"Блокировка ресурсов через CDP недоступна: {e}")
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _acquire(self):
+        """Свободный драйвер из пула; новый создается, пока пул не заполнен"""
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Пул браузеров закрыт")
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+
+            if create:
+                try:
+                    return self._create_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+            # Все браузеры заняты; место может освободиться и после перезапуска драйвера
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _release(self, driver, broken: bool = False):
+        """Возврат драйвера в пул или его закрытие после recycle_after страниц"""
+        self._pages[id(driver)] += 1
+        if broken or self._closed or self._pages[id(driver)] >= self.recycle_after:
+            self._quit(driver)
+            with self._lock:
+                self._created -= 1
+            if not broken and not self._closed:
+                logger.debug("Браузер перезапускается после лимита страниц")
+            return
+        self._idle.put(driver)
+
+    def _quit(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Ошибка при закрытии браузера: {e}")
+
+    def fetch(self, url: str, ready_selector: Optional[str] = None) -> Optional[str]:
+        """HTML страницы после выполнения скриптов.
+
+        ready_selector - элемент области содержимого, появления которого ждет
+        страница (page_ready); если он не появился за wait_timeout, возвращается
+        то, что успело загрузиться.
+        """
+        driver = self._acquire()
+        broken = False
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            driver.get(url)
+            try:
+                WebDriverWait(driver, self.wait_timeout, poll_frequency=0.1).until(page_ready(ready_selector))
+            except TimeoutException:
+                logger.warning(f"Страница {url} не дождалась готовности за {self.wait_timeout} с")
+            return driver.page_source
+        except WebDriverException as e:
+            logger.error(f"Ошибка Selenium для {url}: {e}")
+            broken = True
+            return None
+        finally:
+            self._release(driver, broken)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+
+class RenderDecisions:
+    """Запомненный способ загрузки для каждого URL: 'http' или 'browser'.
+
+    Гибридный режим сначала загружает страницу по HTTP и отправляет в браузер
+    только неполные страницы. Решение сохраняется в JSON-файл, чтобы при
+    следующих запусках страницы, которым нужен браузер, не загружались по
+    HTTP впустую. Файл перезаписывается целиком в save().
+    """
+
+    HTTP = 'http'
+    BROWSER = 'browser'
+
+    def __init__(self, path: str = 'erzrf_render_decisions.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._decisions: Dict[str, str] = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._decisions = json.load(f)
+            except ValueError:
+                logger.warning(f"Файл решений {path} поврежден и будет перезаписан")
+
+    def get(self, url: str) -> Optional[str]:
+        return self._decisions.get(url)
+
+    def set(self, url: str, decision: str):
+        with self._lock:
+            if self._decisions.get(url) != decision:
+                self._decisions[url] = decision
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = f"{self.path}.part"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._decisions, f, ensure_ascii=False, indent=0)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        browser = sum(1 for decision in self._decisions.values() if decision == self.BROWSER)
+        logger.info(f"Сохранены решения для {len(self._decisions)} URL, через браузер: {browser}")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Дисковый кэш HTTP-ответов с условной ревалидацией.
+
+    Индекс (URL -> ETag, Last-Modified, время загрузки и последнего обращения)
+    хранится в SQLite, а тела ответов - в файлах, названных по SHA-256
+    содержимого, поэтому одинаковые страницы занимают место один раз.
+    Пока запись моложе ttl, она отдается без запроса к сайту; после этого
+    транспорт отправляет If-None-Match/If-Modified-Since и при ответе 304
+    использует сохраненное тело. При превышении max_bytes удаляются записи,
+    к которым дольше всего не обращались (LRU).
+
+    В офлайн-режиме сеть не используется: отдаются любые записи из кэша
+    независимо от их возраста, промахи возвращают None.
+    """
+
+    def __init__(self, cache_dir: str = '.erzrf_cache', ttl: float = 24 * 3600,
+                 max_bytes: int = 500 * 1024 * 1024, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.bodies_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self.bodies_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.bodies_dir, body_hash[:2], body_hash)
+
+    def _read_body(self, url: str, body_hash: str) -> Optional[str]:
+        try:
+            # Чтение байтов без преобразования переводов строк: тело совпадает с
+            # исходным ответом побайтно, и его хеш не меняется после кэша
+            with open(self._body_path(body_hash), 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            # Тело удалено вручную или повреждено - запись больше не нужна
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+            return None
+
+    def get_fresh(self, url: str) -> Optional[str]:
+        """Тело ответа, если его можно отдать без обращения к сайту"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body_hash, fetched_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            body_hash, fetched_at = row
+            if not self.offline and time.time() - fetched_at >= self.ttl:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+            return self._read_body(url, body_hash)
+
+    def revalidation_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса для устаревшей записи"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def revalidated(self, url: str) -> Optional[str]:
+        """Обработка ответа 304: продлевает запись и возвращает сохраненное тело"""
+        with self._lock:
+            row = self._db.execute("SELECT body_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            if not row:
+                return None
+            now = time.time()
+            self._db.execute(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+            )
+            self._db.commit()
+            return self._read_body(url, row[0])
+
+    def store(self, url: str, body: str, headers: Mapping[str, str]):
+        """Сохранение ответа 200 вместе с валидаторами"""
+        data = body.encode('utf-8')
+        body_hash = hashlib.sha256(data).hexdigest()
+        path = self._body_path(body_hash)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, len(data), headers.get('ETag'), headers.get('Last-Modified'), now, now),
+            )
+            self._db.commit()
+            self._evict()
+
+    def _total_size(self) -> int:
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Удаление наименее востребованных записей сверх лимита размера"""
+        total = self._total_size()
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT url, body_hash FROM entries ORDER BY accessed_at").fetchall()
+        for url, body_hash in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            still_used = self._db.execute(
+                "SELECT size FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)
+            ).fetchone()
+            if not still_used:
+                path = self._body_path(body_hash)
+                try:
+                    total -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+        self._db.commit()
+        logger.debug(f"Кэш очищен до {total} байт")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
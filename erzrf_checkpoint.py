@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointJournal:
+    """Журнал завершенных профилей (JSONL, только дозапись).
+
+    Каждая строка - запись о компании, профиль которой полностью обработан.
+    Строка пишется сразу после обработки профиля, поэтому после сбоя теряется
+    не больше одной записи, а повторный запуск с --resume пропускает уже
+    обработанные профили. Ключ записи - profile_url; при повторах действует
+    последняя строка.
+    """
+
+    def __init__(self, path: str = 'erzrf_checkpoint.jsonl'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict]:
+        """Чтение журнала: profile_url -> запись"""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла оборваться при аварийном завершении
+                    logger.warning(f"Пропущена поврежденная строка {line_number} в {self.path}")
+                    continue
+                done[record['profile_url']] = record
+
+        logger.info(f"В журнале {self.path} найдено {len(done)} обработанных профилей")
+        return done
+
+    def reset(self):
+        """Очистка журнала перед новым обходом"""
+        with self._lock:
+            self._close_file()
+            open(self.path, 'w', encoding='utf-8').close()
+
+    def append(self, company: Dict):
+        """Дозапись обработанного профиля"""
+        record = dict(company, checkpoint_at=time.time())
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional
+
+from erzrf_boilerplate import ProfileTemplate
+from erzrf_html import LinkIndex, ParsedPage
+from erzrf_regions import REGION_RESOLVER
+from erzrf_urls import CORPORATE, SOCIAL
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileExtractor:
+    """Извлечение сайта, соцсетей и региона из загруженной страницы профиля.
+
+    Не загружает страниц и не держит ни транспорта, ни журнала, ни кэша:
+    только бэкенд разбора HTML и шаблон профилей. Поэтому он создается и в
+    парсере, и в каждом процессе-обработчике (--parse-processes) без
+    лишних соединений и открытых файлов.
+    """
+
+    def __init__(self, html_backend: str, template: Optional[ProfileTemplate] = None, metrics=None):
+        self.html_backend = html_backend
+        self.template = template
+        self.metrics = metrics
+
+    def extract_html(self, company: Dict, html: str) -> Dict:
+        return self.extract_profile(company, ParsedPage(html, self.html_backend, company['profile_url']))
+
+    def extract_profile(self, company: Dict, page: ParsedPage) -> Dict:
+        """Извлечение сайта, соцсетей и текста региона из загруженной страницы профиля"""
+        company = dict(company)
+        # Хеш страницы показывает в хранилище профилей, менялась ли она между загрузками
+        company['content_hash'] = hashlib.sha256(page.html.encode('utf-8')).hexdigest()
+
+        start = time.perf_counter()
+        try:
+            # Разбор HTML и индекс ссылок строятся при первом обращении; при
+            # известном шаблоне - только ссылки области данных компании
+            links = self.template.links(page) if self.template else page.links
+            parsed = time.perf_counter()
+
+            # Поиск официального сайта
+            website = self.find_company_website(links)
+            if website:
+                company['website'] = website
+
+            # Поиск социальных сетей
+            social_networks = self.find_social_networks(links)
+            if social_networks:
+                company['social_networks'] = '; '.join(social_networks)
+
+            # Уточнение региона, если не найден ранее
+            if company['region'] == "Не указан":
+                region = self.find_region_in_profile(page)
+                if region:
+                    company['region'] = region
+                    company['region_id'] = None
+
+            if self.metrics:
+                self.metrics.observe('profile_parse_seconds', parsed - start, backend=self.html_backend)
+                self.metrics.observe('profile_extract_seconds', time.perf_counter() - parsed,
+                                     backend=self.html_backend, mode='thread')
+
+        except Exception as e:
+            logger.error(f"Ошибка при парсинге профиля {company['name']}: {e}")
+
+        return company
+
+    def find_company_website(self, links: LinkIndex) -> Optional[str]:
+        """Поиск официального сайта компании"""
+        # Ищем ссылки с различными индикаторами сайта
+        website_indicators = [
+            'сайт', 'официальный', 'www.', 'http', 'site', 'website'
+        ]
+        corporate_links = links.by_kind(CORPORATE)
+
+        # Сначала ищем по тексту ссылки
+        for link in corporate_links:
+            text = link.text.lower()
+            if any(indicator in text for indicator in website_indicators):
+                return link.href
+
+        # Затем ищем по домену корпоративного сайта
+        for link in corporate_links:
+            if any(word in link.domain for word in ['corp', 'group', 'company', 'строй', 'дом']):
+                return link.href
+
+        return None
+
+    def find_social_networks(self, links: LinkIndex) -> List[str]:
+        """Поиск ссылок на социальные сети (без дубликатов, в порядке на странице)"""
+        social_networks = []
+        seen = set()
+
+        for link in links.by_kind(SOCIAL):
+            href = link.href.lower()
+            if href not in seen:
+                seen.add(href)
+                social_networks.append(link.href)
+
+        return social_networks
+
+    def find_region_in_profile(self, page: ParsedPage) -> Optional[str]:
+        """Поиск региона в профиле компании"""
+        # Ищем в тексте области данных компании, а не в меню и подвале
+        text_content = self.template.text(page) if self.template else page.text
+        region = REGION_RESOLVER.resolve_name(text_content)
+
+        if region != "Не указан":
+            return region
+
+        return None
+
+
+# Экстрактор процесса-обработчика: создается один раз при запуске процесса
+_worker_extractor: Optional[ProfileExtractor] = None
+
+
+def init_extract_worker(html_backend: str):
+    global _worker_extractor
+    _worker_extractor = ProfileExtractor(html_backend)
+
+
+def extract_profile_worker(company: Dict, html: str, template: Optional[ProfileTemplate] = None) -> Dict:
+    """Разбор профиля в процессе-обработчике: HTML на входе, запись о компании на выходе"""
+    _worker_extractor.template = template
+    return _worker_extractor.extract_html(company, html)
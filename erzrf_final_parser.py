@@ -1,76 +1,217 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
-import csv
+import argparse
+import multiprocessing
 import time
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin
 import logging
-from typing import List, Dict, Optional
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('erzrf_final_parser.log'),
-        logging.StreamHandler()
-    ]
-)
+from typing import Iterator, List, Dict, NamedTuple, Optional
+
+from erzrf_api import RatingApiClient, rating_page_url, rating_params
+from erzrf_batch import BatchCrawler
+from erzrf_boilerplate import ProfileTemplate
+from erzrf_cache import ResponseCache
+from erzrf_extract import ProfileExtractor, extract_profile_worker, init_extract_worker
+from erzrf_checkpoint import CheckpointJournal
+from erzrf_fixtures import FixtureTransport, RecordingTransport
+from erzrf_history import RatingHistory
+from erzrf_identity import developer_id
+from erzrf_html import HTML_BACKENDS, ParsedPage, make_soup, resolve_backend
+from erzrf_http import create_transport
+from erzrf_logging import LOG_FORMATS, item_fields, setup_logging
+from erzrf_metrics import PROFILERS, JsonReporter, Metrics, MetricsServer, run_profiled
+from erzrf_pagination import merge_pages, page_url, pages_for_limit, parse_pagination
+from erzrf_pipeline import Pipeline, Stage
+from erzrf_profiles import ProfileStore
+from erzrf_regions import REGION_RESOLVER
+from erzrf_rate_limit import RateLimiter
+from erzrf_rows import RatingTable, extract_row
+from erzrf_sinks import CsvSink, RecordSink, open_sink
+from erzrf_urls import CORPORATE, SOCIAL, classify_url
+
 logger = logging.getLogger(__name__)
 
+# Откуда берется запись о профиле
+FETCH = 'fetch'            # загружается и разбирается в этом запуске
+CHECKPOINT = 'checkpoint'  # из журнала прерванного обхода (resume)
+STORE = 'store'            # из хранилища профилей (refresh)
+
+# Пометка задачи, профиль которой не удалось загрузить
+FETCH_FAILED = 'fetch failed'
+
+
+class ProfileTask(NamedTuple):
+    """Профиль в обработке: индекс в рейтинге, запись, HTML, источник записи
+    и текст ошибки этапа конвейера, на котором обработка профиля прервалась"""
+    index: int
+    company: Dict
+    html: Optional[str] = None
+    source: str = FETCH
+    error: Optional[str] = None
+
 class ERZRFFinalParser:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+    def __init__(self, max_workers: int = 1, requests_per_second: float = 1 / 1.5,
+                 transport: str = 'requests', limit_per_host: int = 10,
+                 cache: Optional[ResponseCache] = None, html_backend: Optional[str] = None,
+                 checkpoint_path: str = 'erzrf_checkpoint.jsonl',
+                 max_requests_per_second: float = 5.0, rate_limiter: Optional[RateLimiter] = None,
+                 source: str = 'html', api_url: Optional[str] = None,
+                 record_fixtures: Optional[str] = None, replay_fixtures: Optional[str] = None,
+                 profile_store: Optional[ProfileStore] = None, parse_processes: int = 0,
+                 pipeline: bool = False, extract_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 metrics: Optional[Metrics] = None, rating_table_path: Optional[str] = None,
+                 history: Optional[RatingHistory] = None, template_sample: int = 5):
+        self.max_workers = max(1, max_workers)
+        # Потоков для загрузки страниц рейтинга; темп по-прежнему задает лимитер
+        self.list_workers = 16
+        # Адаптивный лимит запросов заменяет фиксированную паузу после каждого профиля;
+        # один экземпляр можно передать нескольким парсерам
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_second,
+            max_rate=max(requests_per_second, max_requests_per_second),
+        )
+        self.transport = create_transport(
+            transport,
+            timeout=15,
+            pool_size=max(self.max_workers, self.list_workers),
+            limit_per_host=limit_per_host,
+            rate_limiter=self.rate_limiter,
+            cache=cache,
+            metrics=metrics,
+        )
+        # Метрики запросов, разбора и этапов (erzrf_metrics)
+        self.metrics = metrics
+        # Файл .npz для колоночной таблицы метрик рейтинга (erzrf_rows.RatingTable)
+        self.rating_table_path = rating_table_path
+        # Историческое хранилище рейтингов: строки каждого запуска сохраняются по дате
+        self.history = history
+        # Запись ответов в фикстуры или воспроизведение из них без сети
+        if replay_fixtures:
+            self.transport.close()
+            self.transport = FixtureTransport(replay_fixtures)
+        elif record_fixtures:
+            self.transport = RecordingTransport(self.transport, record_fixtures)
+        # source: html - разбор страницы рейтинга, api - JSON API с откатом на HTML
+        if source not in ('html', 'api'):
+            raise ValueError(f"Неизвестный источник рейтинга: {source}")
+        self.source = source
+        self.api_url = api_url
+        self.html_backend = resolve_backend(html_backend)
+        self.checkpoint = CheckpointJournal(checkpoint_path)
+        # Профили из прошлых запусков для режима обновления (refresh)
+        self.profile_store = profile_store
+        # Разбор профилей в отдельных процессах: потоки только загружают HTML,
+        # извлечение данных не упирается в GIL. Процессы запускаются при первой задаче
+        self.extract_pool = None
+        if parse_processes > 0:
+            self.extract_pool = ProcessPoolExecutor(
+                max_workers=parse_processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_extract_worker,
+                initargs=(self.html_backend,),
+            )
+        # Потоковый конвейер вместо общего пула потоков: свои потоки и очередь у каждого этапа
+        self.pipeline = pipeline
+        self.extract_workers = max(1, extract_workers or parse_processes or 1)
+        self.queue_size = queue_size or self.max_workers * 2
+        # Шаблон страниц профилей (erzrf_boilerplate): строится по template_sample
+        # первым профилям, их HTML сохраняется до разбора и повторно не загружается
+        self.template_sample = template_sample
+        # Извлечение данных из HTML без загрузки; тот же класс работает в процессах-обработчиках
+        self.extractor = ProfileExtractor(self.html_backend, metrics=self.metrics)
+        self._prefetched: Dict[str, str] = {}
         self.base_url = 'https://erzrf.ru'
         self.companies_data = []
 
     def get_page(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
         """Получение страницы с повторными попытками"""
-        for attempt in range(retries):
-            try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                return BeautifulSoup(response.text, 'html.parser')
-            except Exception as e:
-                logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {e}")
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    logger.error(f"Не удалось получить страницу {url}")
-                    return None
+        page = self.get_parsed_page(url, retries)
+        return page.soup if page else None
+
+    def get_parsed_page(self, url: str, retries: int = 3) -> Optional[ParsedPage]:
+        """Получение страницы, разбираемой один раз для всех экстракторов"""
+        html = self.transport.fetch(url, retries)
+        if html is None:
+            return None
+        return ParsedPage(html, self.html_backend, url)
 
-    def parse_main_page(self, limit: int = 250) -> List[Dict]:
+    async def get_page_async(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
+        """Асинхронное получение страницы через транспорт"""
+        html = await self.transport.get_page(url, retries)
+        if html is None:
+            return None
+        return make_soup(html, self.html_backend)
+
+    def parse_main_page(self, limit: int = 250, params: Optional[Dict] = None) -> List[Dict]:
         """Парсинг основной страницы с топом застройщиков"""
         logger.info("Начинаем парсинг основной страницы...")
         
-        # URL с параметрами из задачи
-        url = f"{self.base_url}/top-zastroyshchikov/rf?regionKey=0&topType=0&date=250801"
+        # URL рейтинга; по умолчанию regionKey=0&topType=0&date=250801
+        url = rating_page_url(self.base_url, params)
+        
+        page = None
+        if self.source == 'api':
+            # Страница рейтинга нужна только для поиска адреса API
+            if self.api_url is None:
+                page = self.get_parsed_page(url)
+            companies = self.parse_rating_api(page.html if page else None, url, limit, params)
+            if companies:
+                return companies
+            logger.warning("Данные API рейтинга недоступны, используется разбор HTML")
         
-        soup = self.get_page(url)
-        if not soup:
+        page = page or self.get_parsed_page(url)
+        if not page:
             logger.error("Не удалось получить основную страницу")
             return []
+        
+        info = parse_pagination(page.soup, url)
+        if info is None or info.total <= info.last or limit <= info.last:
+            companies = self.parse_rating_page(page, limit, first_rank=info.first if info else 1)
+            logger.info(f"Найдено {len(companies)} компаний на основной странице")
+            return companies
+        
+        # Остальные страницы загружаются параллельно и сводятся по местам
+        numbers = pages_for_limit(min(limit, info.total), info.page_size, info.last_page)
+        logger.info(f"Рейтинг: {info.total} строк по {info.page_size} на странице, "
+                    f"загружается страниц: {len(numbers)}")
+        pages = {1: page}
+        with ThreadPoolExecutor(max_workers=min(len(numbers), self.list_workers)) as executor:
+            rest = executor.map(lambda n: self.get_parsed_page(page_url(url, n, info.page_param)), numbers[1:])
+            pages.update(zip(numbers[1:], rest))
+        
+        rows = {
+            n: self.parse_rating_page(pages[n], limit, first_rank=(n - 1) * info.page_size + 1) if pages[n] else []
+            for n in numbers
+        }
+        companies = merge_pages(rows, limit, info.page_size)
+        logger.info(f"Найдено {len(companies)} компаний на {len(numbers)} страницах рейтинга")
+        return companies
+
+    def parse_rating_page(self, page: ParsedPage, limit: int, first_rank: int = 1) -> List[Dict]:
+        """Строки одной страницы рейтинга.
+        
+        Колонки строки (developer-td-N) разбираются в типизированные метрики
+        (поле metrics). Место берется из колонки "Место", а если ее нет - по
+        порядку, начиная с first_rank; регион - из ячейки с названием бренда.
+        Строки с местом больше limit не входят.
+        """
+        soup = page.soup
 
         companies = []
+        # Застройщики, уже встреченные на странице (номер бренда из адреса профиля)
+        seen_ids = set()
+        # Регион каждой строки рейтинга вычисляется один раз
+        row_regions: Dict[int, str] = {}
         
         # Ищем все ссылки на застройщиков
         all_links = soup.find_all('a', href=True)
         
-        rank = 1
+        next_rank = first_rank
         for link in all_links:
-            if rank > limit:
+            if next_rank > limit:
                 break
                 
             href = link.get('href', '')
@@ -84,50 +225,120 @@ class ERZRFFinalParser:
                     if not company_name or company_name.isdigit() or len(company_name) < 3:
                         continue
                     
-                    # Пропускаем дубликаты
-                    if any(comp['name'] == company_name for comp in companies):
+                    profile_url = urljoin(self.base_url, href)
+                    
+                    # Пропускаем повторные ссылки на того же застройщика
+                    identity = developer_id(profile_url)
+                    if identity in seen_ids:
                         continue
+                    seen_ids.add(identity)
                     
-                    profile_url = urljoin(self.base_url, href)
+                    metrics = self.row_metrics(link)
+                    brand_text = metrics.pop('brand_text', '')
+                    rank = metrics.get('place') or next_rank
+                    if rank > limit:
+                        break
+                    next_rank = rank + 1
                     
-                    # Извлекаем регион из контекста (родительские элементы)
-                    region = self.extract_region_from_context(link)
+                    # Регион из ячейки бренда ("ГК Самолет, г.Москва"), иначе из контекста ссылки
+                    region = self.extract_region_from_text(brand_text) if brand_text else "Не указан"
+                    if region == "Не указан":
+                        region = self.extract_region_from_context(link, row_regions)
                     
                     company_data = {
                         'rank': rank,
                         'name': company_name,
                         'region': region,
+                        'region_id': REGION_RESOLVER.region_id(region),
                         'profile_url': profile_url,
                         'website': '',
-                        'social_networks': ''
+                        'social_networks': '',
+                        'metrics': metrics
                     }
                     
                     companies.append(company_data)
-                    logger.info(f"#{rank}: {company_name} ({region})")
-                    rank += 1
+                    logger.info("#%d: %s (%s)", rank, company_name, region,
+                                extra=item_fields('list', url=profile_url, rank=rank, company=company_name))
                     
                 except Exception as e:
                     logger.error(f"Ошибка при парсинге ссылки: {e}")
                     continue
         
-        logger.info(f"Найдено {len(companies)} компаний на основной странице")
         return companies
 
-    def extract_region_from_context(self, link_element) -> str:
-        """Извлечение региона из контекста ссылки"""
+    def row_metrics(self, link_element) -> Dict:
+        """Типизированные колонки developer-td-N строки рейтинга со ссылкой (erzrf_rows.extract_row)"""
+        row = link_element.find_parent(['li', 'tr'])
+        return extract_row(row) if row is not None else {}
+
+    def parse_rating_api(self, rating_html: Optional[str], rating_url: str, limit: int,
+                         params: Optional[Dict] = None) -> List[Dict]:
+        """Список компаний из JSON API рейтинга; пустой, если API не найдено или не ответило"""
+        client = RatingApiClient(self.transport.fetch, self.base_url, endpoint=self.api_url, params=params)
+        if client.resolve_endpoint(rating_html, rating_url) is None:
+            return []
+        # Найденный адрес используется и в следующих вызовах
+        self.api_url = client.endpoint
+        
+        companies = []
+        seen_ids = set()
+        next_rank = 1
+        for record in client.iter_records(limit):
+            fields = client.company_from_record(record)
+            if fields is None:
+                continue
+            identity = developer_id(fields['profile_url'])
+            if identity in seen_ids:
+                continue
+            seen_ids.add(identity)
+            region = self.extract_region_from_text(fields['region_text'])
+            # Место из записи API, как колонка "Место" в HTML; без него - по порядку
+            rank = fields['place'] or next_rank
+            next_rank = rank + 1
+            companies.append({
+                'rank': rank,
+                'name': fields['name'],
+                'region': region,
+                'region_id': REGION_RESOLVER.region_id(region),
+                'profile_url': fields['profile_url'],
+                'website': '',
+                'social_networks': ''
+            })
+        
+        logger.info(f"Получено {len(companies)} компаний из API рейтинга")
+        return companies
+
+    def extract_region_from_context(self, link_element, row_regions: Optional[Dict[int, str]] = None) -> str:
+        """Извлечение региона из контекста ссылки.
+        
+        Поиск ограничен ячейкой со ссылкой ("ГК Самолет, г.Москва") и строкой
+        рейтинга (<li>/<tr>); выше строки не поднимаемся, чтобы не
+        сериализовать всю страницу для каждой ссылки. Регион строки
+        запоминается в row_regions и при повторных ссылках не пересчитывается.
+        """
         try:
-            # Ищем в родительских элементах
+            # Ищем в ячейке со ссылкой
             parent = link_element.parent
-            while parent and parent.name != 'body':
-                text = parent.get_text()
-                region = self.extract_region_from_text(text)
+            if parent is not None:
+                region = self.extract_region_from_text(parent.get_text())
+                if region != "Не указан":
+                    return region
+            
+            # Ищем в строке рейтинга
+            row = link_element.find_parent(['li', 'tr'])
+            if row is not None:
+                if row_regions is not None and id(row) in row_regions:
+                    region = row_regions[id(row)]
+                else:
+                    region = self.extract_region_from_text(row.get_text())
+                    if row_regions is not None:
+                        row_regions[id(row)] = region
                 if region != "Не указан":
                     return region
-                parent = parent.parent
             
             # Ищем в соседних элементах
-            siblings = link_element.find_next_siblings()
-            for sibling in siblings[:3]:  # Проверяем первые 3 соседних элемента
+            siblings = link_element.find_next_siblings(limit=3)
+            for sibling in siblings:  # Проверяем первые 3 соседних элемента
                 if sibling.name:
                     text = sibling.get_text()
                     region = self.extract_region_from_text(text)
@@ -140,152 +351,78 @@ class ERZRFFinalParser:
         return "Не указан"
 
     def extract_region_from_text(self, text: str) -> str:
-        """Извлечение региона из текста"""
-        if not text:
-            return "Не указан"
-            
-        # Паттерны для различных форматов регионов
-        region_patterns = [
-            r'г\.([А-Я][\w\-\s]+)',  # г.Москва, г.Санкт-Петербург
-            r'([А-Я][\w\-\s]+ область)',  # Московская область
-            r'([А-Я][\w\-\s]+ край)',  # Краснодарский край
-            r'(Республика [А-Я][\w\-\s]+)',  # Республика Татарстан
-            r'([А-Я][\w\-\s]+ автономный округ)',  # ХМАО
-            r'([А-Я][\w\-\s]+ Республика)',  # Чувашская Республика
-        ]
-        
-        for pattern in region_patterns:
-            match = re.search(pattern, text)
-            if match:
-                region = match.group(1) if 'г\.' in pattern else match.group(0)
-                return region.strip()
-        
-        return "Не указан"
+        """Извлечение региона из текста (каноническое название субъекта РФ)"""
+        return REGION_RESOLVER.resolve_name(text)
 
     def parse_company_profile(self, company: Dict) -> Dict:
         """Парсинг профиля компании для получения сайта и соцсетей"""
-        logger.info(f"Парсинг профиля: {company['name']}")
+        logger.info("Парсинг профиля: %s", company['name'],
+                    extra=item_fields('profile', url=company['profile_url'], rank=company['rank'],
+                                      company=company['name']))
         
-        soup = self.get_page(company['profile_url'])
-        if not soup:
+        html = self.fetch_profile(company)
+        if html is None:
             logger.warning(f"Не удалось загрузить профиль {company['name']}")
             return company
+        return self.enrich_company(self.extract_html(company, html))
+
+    def fetch_profile(self, company: Dict) -> Optional[str]:
+        """HTML профиля: загруженный при построении шаблона или из транспорта"""
+        html = self._prefetched.pop(company['profile_url'], None)
+        return html if html is not None else self.transport.fetch(company['profile_url'])
+
+    def learn_template(self, companies: List[Dict]):
+        """Шаблон профилей по первым template_sample профилям из списка на загрузку"""
+        sample = companies[:self.template_sample]
+        if self.template is not None or len(sample) < 2:
+            return
+        with ThreadPoolExecutor(max_workers=min(len(sample), self.max_workers)) as executor:
+            htmls = list(executor.map(lambda company: self.transport.fetch(company['profile_url']), sample))
+        pages = []
+        for company, html in zip(sample, htmls):
+            if html is not None:
+                self._prefetched[company['profile_url']] = html
+                pages.append(ParsedPage(html, self.html_backend, company['profile_url']))
+        self.template = ProfileTemplate.learn(pages)
+
+    def extract_html(self, company: Dict, html: str) -> Dict:
+        """Разбор загруженного профиля в процессе-обработчике или в текущем потоке"""
+        if self.extract_pool is None:
+            return self.extractor.extract_html(company, html)
         
-        try:
-            # Поиск официального сайта
-            website = self.find_company_website(soup)
-            if website:
-                company['website'] = website
-            
-            # Поиск социальных сетей
-            social_networks = self.find_social_networks(soup)
-            if social_networks:
-                company['social_networks'] = '; '.join(social_networks)
-            
-            # Уточнение региона, если не найден ранее
-            if company['region'] == "Не указан":
-                region = self.find_region_in_profile(soup)
-                if region:
-                    company['region'] = region
-                    
-        except Exception as e:
-            logger.error(f"Ошибка при парсинге профиля {company['name']}: {e}")
-        
-        # Задержка между запросами
-        time.sleep(1.5)
+        # Поток только загружает страницу, разбор идет в процессе-обработчике
+        start = time.perf_counter()
+        company = self.extract_pool.submit(extract_profile_worker, company, html, self.template).result()
+        if self.metrics:
+            self.metrics.observe('profile_extract_seconds', time.perf_counter() - start,
+                                 backend=self.html_backend, mode='process')
         return company
 
-    def find_company_website(self, soup: BeautifulSoup) -> Optional[str]:
-        """Поиск официального сайта компании"""
-        # Ищем ссылки с различными индикаторами сайта
-        website_indicators = [
-            'сайт', 'официальный', 'www.', 'http', 'site', 'website'
-        ]
-        
-        links = soup.find_all('a', href=True)
-        
-        # Сначала ищем по тексту ссылки
-        for link in links:
-            href = link.get('href', '')
-            text = link.get_text(strip=True).lower()
-            
-            if any(indicator in text for indicator in website_indicators):
-                if self.is_valid_website_url(href):
-                    return href
-        
-        # Затем ищем по URL
-        for link in links:
-            href = link.get('href', '')
-            
-            if self.is_valid_website_url(href) and not self.is_social_network(href):
-                # Дополнительная проверка на корпоративный сайт
-                domain = urlparse(href).netloc.lower()
-                if any(word in domain for word in ['corp', 'group', 'company', 'строй', 'дом']):
-                    return href
-        
-        return None
-
-    def find_social_networks(self, soup: BeautifulSoup) -> List[str]:
-        """Поиск ссылок на социальные сети"""
-        social_networks = []
-        social_domains = [
-            'vk.com', 'vkontakte.ru', 'instagram.com', 'facebook.com', 
-            't.me', 'telegram.me', 'youtube.com', 'youtu.be',
-            'ok.ru', 'odnoklassniki.ru', 'twitter.com', 'linkedin.com'
-        ]
-        
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link.get('href', '').lower()
-            
-            for domain in social_domains:
-                if domain in href and href.startswith('http'):
-                    # Проверяем, что это не дубликат
-                    if href not in [sn.lower() for sn in social_networks]:
-                        social_networks.append(link.get('href', ''))
-                    break
-        
-        return social_networks
+    @property
+    def template(self) -> Optional[ProfileTemplate]:
+        return self.extractor.template
 
-    def find_region_in_profile(self, soup: BeautifulSoup) -> Optional[str]:
-        """Поиск региона в профиле компании"""
-        # Ищем в различных элементах страницы
-        text_content = soup.get_text()
-        region = self.extract_region_from_text(text_content)
-        
-        if region != "Не указан":
-            return region
-        
-        return None
+    @template.setter
+    def template(self, template: Optional[ProfileTemplate]):
+        self.extractor.template = template
+
+    def extract_profile(self, company: Dict, page: ParsedPage) -> Dict:
+        """Извлечение сайта, соцсетей и текста региона из загруженной страницы профиля"""
+        return self.extractor.extract_profile(company, page)
+
+    def enrich_company(self, company: Dict) -> Dict:
+        """Код региона для региона, найденного в профиле"""
+        if company['region'] != "Не указан" and not company.get('region_id'):
+            company = dict(company, region_id=REGION_RESOLVER.region_id(company['region']))
+        return company
 
     def is_valid_website_url(self, url: str) -> bool:
-        """Проверка валидности URL сайта"""
-        if not url or not url.startswith(('http://', 'https://')):
-            return False
-        
-        # Исключаем внутренние ссылки сайта
-        if 'erzrf.ru' in url:
-            return False
-        
-        # Исключаем файлы и якоря
-        if url.endswith(('.pdf', '.doc', '.docx', '.jpg', '.png', '.zip')) or '#' in url:
-            return False
-        
-        # Исключаем явно социальные сети
-        if self.is_social_network(url):
-            return False
-        
-        return True
+        """Проверка, может ли URL быть сайтом компании (внешний сайт, не соцсеть и не файл)"""
+        return bool(url) and classify_url(url).kind == CORPORATE
 
     def is_social_network(self, url: str) -> bool:
         """Проверка, является ли URL социальной сетью"""
-        social_domains = [
-            'vk.com', 'vkontakte.ru', 'instagram.com', 'facebook.com',
-            't.me', 'telegram.me', 'youtube.com', 'youtu.be',
-            'ok.ru', 'odnoklassniki.ru', 'twitter.com', 'linkedin.com'
-        ]
-        
-        return any(domain in url.lower() for domain in social_domains)
+        return bool(url) and classify_url(url).kind == SOCIAL
 
     def save_to_csv(self, filename: str = 'top_250_zastroyshchiki_final.csv'):
         """Сохранение данных в CSV"""
@@ -295,29 +432,185 @@ class ERZRFFinalParser:
         
         logger.info(f"Сохранение {len(self.companies_data)} записей в {filename}")
         
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['Место', 'Название', 'Город/Регион', 'Сайт', 'Социальные сети']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
+        with CsvSink(filename, ordered=False) as sink:
             for company in self.companies_data:
-                writer.writerow({
-                    'Место': company['rank'],
-                    'Название': company['name'],
-                    'Город/Регион': company['region'],
-                    'Сайт': company['website'] if company['website'] else 'Не найден',
-                    'Социальные сети': company['social_networks'] if company['social_networks'] else 'Не найдены'
-                })
+                sink.write(company)
+
+    def iter_profile_tasks(self, resume: bool = False, refresh: bool = False) -> Iterator[ProfileTask]:
+        """Задачи по профилям рейтинга в порядке мест.
+
+        При resume=True профили из журнала контрольных точек отдаются готовыми
+        (источник CHECKPOINT), при refresh=True свежие профили берутся из
+        хранилища (источник STORE); остальные нужно загрузить (FETCH).
+        """
+        done_profiles = self.checkpoint.load() if resume else {}
+        if not resume:
+            self.checkpoint.reset()
+        
+        for i, company in enumerate(self.companies_data):
+            record = done_profiles.get(company['profile_url'])
+            if record:
+                # Место берем из текущего рейтинга, остальное - из журнала
+                record.pop('checkpoint_at', None)
+                yield ProfileTask(i, dict(record, rank=company['rank']), source=CHECKPOINT)
+                continue
+            if refresh and self.profile_store:
+                stored = self.profile_store.get(company['profile_url'])
+                if not self.profile_store.needs_refresh(company, stored):
+                    yield ProfileTask(i, self.profile_store.apply(company, stored), source=STORE)
+                    continue
+            yield ProfileTask(i, company)
+
+    def write_profile(self, task: ProfileTask, sink: Optional[RecordSink] = None):
+        """Сохранение готового профиля: журнал, хранилище профилей и итоговый файл"""
+        self.companies_data[task.index] = task.company
+        # Профиль с ошибкой загрузки или обработки не попадает в журнал: при --resume
+        # он загрузится заново. Загружаемый профиль без хеша страницы тоже не загрузился
+        fetched = task.source != FETCH or task.company.get('content_hash')
+        if task.source != CHECKPOINT and not task.error and fetched:
+            self.checkpoint.append(task.company)
+        # Профиль без хеша страницы не загрузился - хранить нечего
+        if task.source == FETCH and self.profile_store and task.company.get('content_hash'):
+            self.profile_store.put(task.company)
+        if sink:
+            sink.write(task.company, task.index)
+
+    def parse_profiles(self, resume: bool = False, sink: Optional[RecordSink] = None, refresh: bool = False):
+        """Параллельный парсинг профилей с сохранением порядка рейтинга.
+        
+        Каждый обработанный профиль сразу дописывается в журнал контрольных
+        точек и, если передан sink, в итоговый файл. При resume=True профили
+        из журнала не загружаются повторно. При refresh=True загружаются
+        только новые, устаревшие и сменившие место профили, остальные
+        берутся из хранилища профилей.
+        """
+        if self.pipeline:
+            self.parse_profiles_pipeline(resume=resume, sink=sink, refresh=refresh)
+            return
+        
+        pending = []
+        ready = {CHECKPOINT: 0, STORE: 0}
+        for task in self.iter_profile_tasks(resume=resume, refresh=refresh):
+            if task.source == FETCH:
+                pending.append(task)
+                continue
+            ready[task.source] += 1
+            self.write_profile(task, sink)
+        if resume:
+            logger.info(f"Продолжение обхода: из журнала взято {ready[CHECKPOINT]} "
+                        f"из {len(self.companies_data)} профилей")
+        if refresh and self.profile_store:
+            logger.info(f"Обновление: загружается {len(pending)} профилей, "
+                        f"{ready[STORE]} взято из хранилища")
+        
+        self.learn_template([task.company for task in pending])
+        total = len(pending)
+        logger.info(f"Потоков: {self.max_workers}, начальный темп: {self.rate_limiter.rate:.2f} запросов/с")
         
-        logger.info(f"Данные сохранены в {filename}")
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                executor.submit(self.parse_company_profile, task.company): task
+                for task in pending
+            }
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                company = future.result()
+                # Хеш страницы есть только у загруженного профиля; незагруженный
+                # не попадает в журнал и при --resume загружается заново
+                task = futures[future]._replace(company=company,
+                                                error=None if company.get('content_hash') else FETCH_FAILED)
+                self.write_profile(task, sink)
+                logger.info("Обработано %d/%d: %s", done, total, task.company['name'],
+                            extra=item_fields('write', rank=task.company['rank'], company=task.company['name']))
+        finally:
+            # При прерывании не ждем оставшиеся в очереди профили
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.checkpoint.close()
+
+    def parse_profiles_pipeline(self, resume: bool = False, sink: Optional[RecordSink] = None,
+                                refresh: bool = False):
+        """Обработка профилей потоковым конвейером.
+
+        Этапы: список рейтинга -> загрузка -> извлечение -> регион -> запись.
+        У каждого этапа свое число потоков и ограниченная входная очередь,
+        HTML хранится в памяти только для профилей в работе.
+        """
+        stages = [
+            Stage('fetch', self._fetch_stage, workers=self.max_workers, queue_size=self.queue_size,
+                  on_error=self._stage_error),
+            Stage('extract', self._extract_stage, workers=self.extract_workers, queue_size=self.queue_size,
+                  on_error=self._stage_error),
+            Stage('enrich', self._enrich_stage, workers=1, queue_size=self.queue_size,
+                  on_error=self._stage_error),
+        ]
+        logger.info(f"Конвейер: загрузка {self.max_workers} потоков, извлечение {self.extract_workers}, "
+                    f"очереди по {self.queue_size}")
+        written = [0]
+        failed = []
+        
+        def write(task: ProfileTask):
+            self.write_profile(task, sink)
+            written[0] += 1
+            if task.error:
+                failed.append(task.company['name'])
+            if task.source == FETCH:
+                logger.info("Обработано %d: %s", written[0], task.company['name'],
+                            extra=item_fields('write', rank=task.company['rank'], company=task.company['name']))
+        
+        try:
+            # Список задач без HTML невелик; он нужен целиком, чтобы до запуска
+            # конвейера построить шаблон профилей по первым загружаемым
+            tasks = list(self.iter_profile_tasks(resume=resume, refresh=refresh))
+            self.learn_template([task.company for task in tasks if task.source == FETCH])
+            Pipeline(stages, metrics=self.metrics).run(tasks, write)
+        finally:
+            self.checkpoint.close()
+            if failed:
+                logger.warning(f"Профилей с ошибкой обработки: {len(failed)}, строки записаны без сайта "
+                               f"и соцсетей: {', '.join(failed[:10])}{' ...' if len(failed) > 10 else ''}")
+
+    def _stage_error(self, task: ProfileTask, error: Exception) -> ProfileTask:
+        """Профиль с ошибкой этапа идет дальше без HTML и с пометкой об ошибке.
+
+        Строка пишется с пустыми полями, как при неудачной загрузке без
+        конвейера, и компания не пропадает из итогового файла.
+        """
+        return task._replace(html=None, error=str(error) or type(error).__name__)
+
+    def _fetch_stage(self, task: ProfileTask) -> ProfileTask:
+        if task.source != FETCH:
+            return task
+        html = self.fetch_profile(task.company)
+        if html is None:
+            logger.warning(f"Не удалось загрузить профиль {task.company['name']}")
+            return task._replace(html=None, error=FETCH_FAILED)
+        return task._replace(html=html)
 
-    def run(self, limit: int = 250, parse_details: bool = True):
-        """Запуск парсера"""
+    def _extract_stage(self, task: ProfileTask) -> ProfileTask:
+        if task.html is None:
+            return task
+        company = self.extract_html(task.company, task.html)
+        # HTML дальше не нужен: освобождаем память сразу после разбора
+        return task._replace(company=company, html=None)
+
+    def _enrich_stage(self, task: ProfileTask) -> ProfileTask:
+        if task.source != FETCH:
+            return task
+        return task._replace(company=self.enrich_company(task.company))
+
+    def run(self, limit: int = 250, parse_details: bool = True, resume: bool = False,
+            output: str = 'top_250_zastroyshchiki_final.csv', refresh: bool = False):
+        """Запуск парсера; формат итогового файла (csv, jsonl, parquet) определяется по расширению"""
         logger.info(f"Запуск финального парсера для топ-{limit} застройщиков")
         
+        sink = None
         try:
             # Получаем список компаний
+            start = time.perf_counter()
             companies = self.parse_main_page(limit)
+            if self.metrics:
+                self.metrics.observe('run_phase_seconds', time.perf_counter() - start, phase='rating')
             
             if not companies:
                 logger.error("Не удалось получить список компаний")
@@ -326,36 +619,219 @@ class ERZRFFinalParser:
             self.companies_data = companies
             logger.info(f"Получен список из {len(companies)} компаний")
             
+            params = rating_params()
+            if self.rating_table_path:
+                RatingTable.from_companies(
+                    companies, date=params['date'], region_key=params['regionKey'], top_type=params['topType'],
+                ).save(self.rating_table_path)
+            if self.history:
+                self.history.ingest(companies, params['date'], params['regionKey'], params['topType'])
+            
             # Сохраняем базовый список
             self.save_to_csv('basic_companies_list.csv')
             
+            # Итоговый файл пишется по мере обработки профилей
+            sink = open_sink(output)
+            
             if parse_details:
                 logger.info("Начинаем парсинг детальной информации...")
-                
-                for i, company in enumerate(self.companies_data):
-                    logger.info(f"Обрабатываем {i+1}/{len(self.companies_data)}: {company['name']}")
-                    self.companies_data[i] = self.parse_company_profile(company)
-                    
-                    # Промежуточное сохранение каждые 25 компаний
-                    if (i + 1) % 25 == 0:
-                        self.save_to_csv(f'partial_results_{i+1}.csv')
-                        logger.info(f"Промежуточное сохранение: обработано {i+1} компаний")
+                start = time.perf_counter()
+                self.parse_profiles(resume=resume, sink=sink, refresh=refresh)
+                if self.metrics:
+                    self.metrics.observe('run_phase_seconds', time.perf_counter() - start, phase='profiles')
+            else:
+                for company in self.companies_data:
+                    sink.write(company)
             
             # Финальное сохранение
-            self.save_to_csv()
+            sink.close()
+            sink = None
             logger.info("Парсинг успешно завершен!")
             
         except Exception as e:
             logger.error(f"Критическая ошибка: {e}")
             if self.companies_data:
                 self.save_to_csv('error_backup.csv')
+        
+        finally:
+            if sink is not None:
+                sink.abort()
+            if self.profile_store:
+                self.profile_store.close()
+            if self.history:
+                self.history.close()
+            self.close()
+
+    def close(self):
+        """Остановка процессов разбора и закрытие транспорта"""
+        if self.extract_pool is not None:
+            self.extract_pool.shutdown(wait=True, cancel_futures=True)
+        self.transport.close()
+
 
 def main():
-    parser = ERZRFFinalParser()
+    arg_parser = argparse.ArgumentParser(description='Парсер топ застройщиков erzrf.ru')
+    arg_parser.add_argument('--limit', type=int, default=250, help='Количество компаний в топе')
+    arg_parser.add_argument('--workers', type=int, default=1, help='Количество потоков для загрузки профилей')
+    arg_parser.add_argument('--parse-processes', type=int, default=0,
+                            help='Процессов для разбора профилей (0 - разбор в потоках загрузки)')
+    arg_parser.add_argument('--pipeline', action='store_true',
+                            help='Обрабатывать профили потоковым конвейером: загрузка -> извлечение -> регион -> запись')
+    arg_parser.add_argument('--extract-workers', type=int, default=None,
+                            help='Потоков этапа извлечения в конвейере (по умолчанию --parse-processes или 1)')
+    arg_parser.add_argument('--queue-size', type=int, default=None,
+                            help='Размер очереди перед каждым этапом конвейера (по умолчанию 2 x --workers)')
+    arg_parser.add_argument('--rps', type=float, default=1 / 1.5,
+                            help='Начальный темп запросов в секунду для всех потоков')
+    arg_parser.add_argument('--max-rps', type=float, default=5.0,
+                            help='Верхняя граница темпа, до которой лимитер разгоняется при успешных ответах')
+    arg_parser.add_argument('--transport', choices=['requests', 'aiohttp'], default='requests',
+                            help='HTTP-транспорт: блокирующий requests или асинхронный aiohttp')
+    arg_parser.add_argument('--per-host', type=int, default=10,
+                            help='Максимум одновременных соединений с одним хостом (aiohttp)')
+    arg_parser.add_argument('--output', default='top_250_zastroyshchiki_final.csv',
+                            help='Итоговый файл: .csv, .jsonl или .parquet')
+    arg_parser.add_argument('--resume', action='store_true',
+                            help='Продолжить прерванный обход, пропуская профили из журнала')
+    arg_parser.add_argument('--checkpoint', default='erzrf_checkpoint.jsonl',
+                            help='Файл журнала обработанных профилей')
+    arg_parser.add_argument('--source', choices=['html', 'api'], default='html',
+                            help='Источник рейтинга: разбор HTML или JSON API с откатом на HTML')
+    arg_parser.add_argument('--api-url', default=None,
+                            help='Адрес JSON API рейтинга (по умолчанию ищется на странице рейтинга)')
+    arg_parser.add_argument('--record-fixtures', default=None,
+                            help='Сохранять все ответы сайта в каталог фикстур')
+    arg_parser.add_argument('--replay-fixtures', default=None,
+                            help='Брать ответы из каталога фикстур вместо сайта')
+    arg_parser.add_argument('--refresh', action='store_true',
+                            help='Загружать только новые, устаревшие и сменившие место профили')
+    arg_parser.add_argument('--profile-store', default=None,
+                            help='Файл хранилища профилей (с --refresh по умолчанию erzrf_profiles.sqlite)')
+    arg_parser.add_argument('--profile-ttl', type=float, default=30,
+                            help='Через сколько дней профиль в хранилище считается устаревшим')
+    arg_parser.add_argument('--regions', type=int, nargs='+', default=None,
+                            help='Пакетный обход: значения regionKey (0 - вся РФ)')
+    arg_parser.add_argument('--top-types', type=int, nargs='+', default=None,
+                            help='Пакетный обход: значения topType')
+    arg_parser.add_argument('--dates', nargs='+', default=None,
+                            help='Пакетный обход: даты рейтинга в формате ГГММДД')
+    arg_parser.add_argument('--metrics-port', type=int, default=None,
+                            help='Порт HTTP-эндпоинта метрик: /metrics (Prometheus) и /metrics.json')
+    arg_parser.add_argument('--metrics-json', default=None,
+                            help='Периодически сохранять сводку метрик в JSON-файл')
+    arg_parser.add_argument('--metrics-interval', type=float, default=30,
+                            help='Период записи сводки метрик, с')
+    arg_parser.add_argument('--metrics-trace', default=None,
+                            help='Писать каждый HTTP-запрос с фазами и размером в JSONL-файл')
+    arg_parser.add_argument('--profiler', choices=PROFILERS, default=None,
+                            help='Запустить обход под профилировщиком: cprofile учитывает все потоки '
+                                 '(кроме процессов --parse-processes), pyinstrument - только основной поток')
+    arg_parser.add_argument('--profiler-output', default=None,
+                            help='Файл профиля (по умолчанию erzrf_profile.prof или erzrf_profile.html)')
+    arg_parser.add_argument('--log-file', default='erzrf_final_parser.log', help='Файл лога (пустая строка - без файла)')
+    arg_parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    arg_parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                            help='Формат лога: text или json (одна запись - одна строка с полями stage/url/rank)')
+    arg_parser.add_argument('--log-sample', type=float, default=1.0,
+                            help='Доля выводимых сообщений об отдельных компаниях (0.1 - каждое десятое)')
+    arg_parser.add_argument('--rating-table', default=None,
+                            help='Сохранить колонки рейтинга (площади, доли, число ЖК и т.д.) в таблицу .npz')
+    arg_parser.add_argument('--history', default=None,
+                            help='Добавить рейтинг в историческое хранилище SQLite (см. erzrf_history.py)')
+    arg_parser.add_argument('--template-sample', type=int, default=5,
+                            help='По скольким профилям определять общие для сайта ссылки и блоки (0 - не определять)')
+    arg_parser.add_argument('--html-parser', choices=HTML_BACKENDS, default=None,
+                            help='Бэкенд разбора HTML (по умолчанию самый быстрый из установленных: '
+                                 'selectolax, lxml, html.parser)')
+    arg_parser.add_argument('--cache-dir', default=None,
+                            help='Каталог дискового кэша HTTP-ответов (по умолчанию кэш выключен)')
+    arg_parser.add_argument('--cache-ttl', type=float, default=24 * 3600,
+                            help='Сколько секунд запись кэша считается свежей без ревалидации')
+    arg_parser.add_argument('--cache-max-mb', type=int, default=500, help='Максимальный размер кэша, МБ')
+    arg_parser.add_argument('--offline', action='store_true',
+                            help='Работать только из кэша, без обращения к сайту')
+    args = arg_parser.parse_args()
+    batch_mode = bool(args.regions or args.top_types or args.dates)
+    if batch_mode and (args.resume or args.refresh):
+        arg_parser.error("--resume и --refresh не поддерживаются в пакетном обходе (--regions/--top-types/--dates)")
+    if batch_mode and args.profile_store:
+        arg_parser.error("--profile-store не поддерживается в пакетном обходе (--regions/--top-types/--dates)")
+    setup_logging(args.log_file, level=args.log_level, fmt=args.log_format, sample=args.log_sample)
+    
+    cache = None
+    if args.cache_dir or args.offline:
+        cache = ResponseCache(
+            cache_dir=args.cache_dir or '.erzrf_cache',
+            ttl=args.cache_ttl,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            offline=args.offline,
+        )
+    
+    profile_store = None
+    if args.refresh or args.profile_store:
+        profile_store = ProfileStore(args.profile_store or 'erzrf_profiles.sqlite', ttl=args.profile_ttl * 24 * 3600)
+    
+    metrics = None
+    exporters = []
+    if args.metrics_port is not None or args.metrics_json or args.metrics_trace:
+        metrics = Metrics(trace_path=args.metrics_trace)
+        if args.metrics_port is not None:
+            exporters.append(MetricsServer(metrics, port=args.metrics_port).start())
+        if args.metrics_json:
+            exporters.append(JsonReporter(metrics, args.metrics_json, interval=args.metrics_interval).start())
+    
+    parser = ERZRFFinalParser(
+        max_workers=args.workers,
+        requests_per_second=args.rps,
+        max_requests_per_second=args.max_rps,
+        transport=args.transport,
+        limit_per_host=args.per_host,
+        cache=cache,
+        html_backend=args.html_parser,
+        checkpoint_path=args.checkpoint,
+        source=args.source,
+        api_url=args.api_url,
+        record_fixtures=args.record_fixtures,
+        replay_fixtures=args.replay_fixtures,
+        profile_store=profile_store,
+        parse_processes=args.parse_processes,
+        pipeline=args.pipeline,
+        extract_workers=args.extract_workers,
+        queue_size=args.queue_size,
+        metrics=metrics,
+        rating_table_path=args.rating_table,
+        history=RatingHistory(args.history) if args.history else None,
+        template_sample=args.template_sample,
+    )
+    
+    def crawl():
+        if batch_mode:
+            # Пакетный обход матрицы рейтингов в одну сводную таблицу
+            batch = BatchCrawler(
+                parser,
+                regions=args.regions or [0],
+                top_types=args.top_types or [0],
+                dates=args.dates or ['250801'],
+                limit=args.limit,
+            )
+            try:
+                batch.run(output=args.output, table_path=args.rating_table, history=parser.history)
+            finally:
+                if parser.profile_store:
+                    parser.profile_store.close()
+                if parser.history:
+                    parser.history.close()
+                parser.close()
+        else:
+            # Запускаем парсер для топ-250 компаний
+            parser.run(limit=args.limit, parse_details=True, resume=args.resume, output=args.output,
+                       refresh=args.refresh)
     
     try:
-        # Запускаем парсер для топ-250 компаний
-        parser.run(limit=250, parse_details=True)
+        if args.profiler:
+            run_profiled(crawl, args.profiler, args.profiler_output)
+        else:
+            crawl()
         
     except KeyboardInterrupt:
         logger.info("Парсинг прерван пользователем")
@@ -364,6 +840,12 @@ def main():
             
     except Exception as e:
         logger.error(f"Неожиданная ошибка: {e}")
+    
+    finally:
+        for exporter in exporters:
+            exporter.close()
+        if metrics:
+            metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
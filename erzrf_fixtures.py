@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+
+
+def fixture_name(url: str, body: str) -> str:
+    """Имя файла фикстуры: хеш URL и расширение по адресу или содержимому"""
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    extension = os.path.splitext(urlparse(url).path)[1].lstrip('.').lower()
+    if extension not in ('js', 'json'):
+        extension = 'json' if body.lstrip()[:1] in ('{', '[') else 'html'
+    return f"{digest}.{extension}"
+
+
+class RecordingTransport:
+    """Обертка над транспортом, сохраняющая каждый ответ в каталог фикстур.
+
+    Тела ответов пишутся в отдельные файлы, а index.json связывает URL с
+    именем файла. Каталог затем воспроизводится через FixtureTransport без
+    обращения к сайту.
+    """
+
+    def __init__(self, transport, fixtures_dir: str):
+        self.transport = transport
+        self.fixtures_dir = fixtures_dir
+        self._lock = threading.Lock()
+        os.makedirs(fixtures_dir, exist_ok=True)
+        self._index: Dict[str, str] = _load_index(fixtures_dir)
+
+    def _record(self, url: str, body: Optional[str]) -> Optional[str]:
+        if body is None:
+            return None
+        name = fixture_name(url, body)
+        # Тело пишется байтами без преобразования переводов строк: воспроизведенный
+        # ответ (и content_hash профиля) побайтно совпадает с ответом сервера
+        with open(os.path.join(self.fixtures_dir, name), 'wb') as f:
+            f.write(body.encode('utf-8'))
+        with self._lock:
+            self._index[url] = name
+        return body
+
+    def fetch(self, url: str, retries: int = 3) -> Optional[str]:
+        return self._record(url, self.transport.fetch(url, retries))
+
+    def fetch_many(self, urls: List[str], retries: int = 3) -> List[Optional[str]]:
+        bodies = self.transport.fetch_many(urls, retries)
+        return [self._record(url, body) for url, body in zip(urls, bodies)]
+
+    async def get_page(self, url: str, retries: int = 3) -> Optional[str]:
+        return self._record(url, await self.transport.get_page(url, retries))
+
+    def save_index(self):
+        with self._lock:
+            tmp_path = os.path.join(self.fixtures_dir, f"{INDEX_FILE}.part")
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                json.dump(self._index, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, os.path.join(self.fixtures_dir, INDEX_FILE))
+        logger.info(f"Записано {len(self._index)} фикстур в {self.fixtures_dir}")
+
+    def close(self):
+        self.save_index()
+        self.transport.close()
+
+
+class FixtureTransport:
+    """Транспорт, отдающий ответы из каталога фикстур (для офлайн-тестов)"""
+
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = fixtures_dir
+        self._index = _load_index(fixtures_dir)
+        if not self._index:
+            logger.warning(f"В каталоге {fixtures_dir} нет фикстур")
+
+    def fetch(self, url: str, retries: int = 3) -> Optional[str]:
+        name = self._index.get(url)
+        if name is None:
+            logger.warning(f"Нет фикстуры для {url}")
+            return None
+        with open(os.path.join(self.fixtures_dir, name), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def fetch_many(self, urls: List[str], retries: int = 3) -> List[Optional[str]]:
+        return [self.fetch(url, retries) for url in urls]
+
+    async def get_page(self, url: str, retries: int = 3) -> Optional[str]:
+        return await asyncio.to_thread(self.fetch, url, retries)
+
+    def close(self):
+        pass
+
+
+def _load_index(fixtures_dir: str) -> Dict[str, str]:
+    path = os.path.join(fixtures_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return json.load(f)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from erzrf_identity import developer_id
+from erzrf_logging import setup_logging
+from erzrf_rows import METRIC_NAMES, MISSING_INT, ROW_FIELDS, RatingTable
+
+logger = logging.getLogger(__name__)
+
+# Колонки строки рейтинга в хранилище: идентификация и позиция, затем метрики (erzrf_rows)
+BASE_COLUMNS = ('developer_id', 'rank', 'name', 'region', 'profile_url')
+SNAPSHOT_KEY = ('region_key', 'top_type', 'date')
+
+
+class RatingHistory:
+    """Историческое хранилище рейтингов между запусками (SQLite).
+
+    Снимок - строки одного рейтинга (regionKey, topType, date). Повторная
+    загрузка снимка заменяет прежние строки, остальные даты сохраняются.
+    Первичный ключ строк (снимок, застройщик) и индекс по (застройщик, дата)
+    позволяют отвечать на вопросы об изменениях между датами поиском по
+    индексу, без чтения и сопоставления CSV целиком. Застройщик
+    идентифицируется номером бренда из адреса профиля (erzrf_identity.developer_id).
+    """
+
+    def __init__(self, path: str = 'erzrf_history.sqlite'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        metrics = ',\n'.join(
+            f"                {field.name} {'INTEGER' if field.dtype.startswith('int') else 'REAL'}"
+            for field in ROW_FIELDS
+        )
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                region_key INTEGER NOT NULL,
+                top_type INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                ingested_at REAL NOT NULL,
+                PRIMARY KEY (region_key, top_type, date)
+            );
+            CREATE TABLE IF NOT EXISTS ratings (
+                region_key INTEGER NOT NULL,
+                top_type INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                developer_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                region TEXT,
+                profile_url TEXT,
+{metrics},
+                PRIMARY KEY (region_key, top_type, date, developer_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ratings_developer ON ratings (developer_id, date);
+            CREATE INDEX IF NOT EXISTS ratings_rank ON ratings (region_key, top_type, date, rank);
+        """)
+        self._db.commit()
+
+    def ingest(self, companies: Iterable[Dict], date: str, region_key: int = 0, top_type: int = 0) -> int:
+        """Сохранение строк рейтинга (записей parse_main_page) как снимка на дату.
+
+        Если застройщик встречается в снимке дважды, сохраняется строка с
+        лучшим местом. Возвращает число сохраненных строк.
+        """
+        date = str(date)
+        rows = []
+        for company in sorted(companies, key=lambda company: company['rank']):
+            metrics = company.get('metrics') or {}
+            rows.append((
+                int(region_key), int(top_type), date, developer_id(company['profile_url']), company['rank'],
+                company['name'], company.get('region'), company['profile_url'],
+                *(metrics.get(name) for name in METRIC_NAMES),
+            ))
+        columns = SNAPSHOT_KEY + BASE_COLUMNS + tuple(METRIC_NAMES)
+        placeholders = ', '.join('?' * len(columns))
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM ratings WHERE region_key = ? AND top_type = ? AND date = ?",
+                             (int(region_key), int(top_type), date))
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO ratings ({', '.join(columns)}) VALUES ({placeholders})", rows
+            )
+            count = self._db.execute(
+                "SELECT COUNT(*) FROM ratings WHERE region_key = ? AND top_type = ? AND date = ?",
+                (int(region_key), int(top_type), date),
+            ).fetchone()[0]
+            self._db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                             (int(region_key), int(top_type), date, count, time.time()))
+        logger.info(f"В историю добавлен рейтинг regionKey={region_key}, topType={top_type}, "
+                    f"date={date}: {count} строк")
+        return count
+
+    def ingest_table(self, table: RatingTable) -> int:
+        """Загрузка сохраненной колоночной таблицы (.npz) по снимкам"""
+        snapshots: Dict[tuple, List[Dict]] = defaultdict(list)
+        for record in table.to_records():
+            record['metrics'] = {
+                name: None if record[name] == MISSING_INT or record[name] != record[name] else record[name]
+                for name in METRIC_NAMES
+            }
+            snapshots[(record['date'], int(record['region_key'] or 0), int(record['top_type'] or 0))].append(record)
+        return sum(self.ingest(companies, *key) for key, companies in snapshots.items())
+
+    def _query(self, sql: str, params: tuple) -> List[Dict]:
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def snapshots(self, region_key: Optional[int] = None, top_type: Optional[int] = None) -> List[Dict]:
+        """Сохраненные снимки (по умолчанию все) в порядке дат"""
+        return self._query(
+            "SELECT region_key, top_type, date, rows, ingested_at FROM snapshots "
+            "WHERE (? IS NULL OR region_key = ?) AND (? IS NULL OR top_type = ?) "
+            "ORDER BY region_key, top_type, date",
+            (region_key, region_key, top_type, top_type),
+        )
+
+    def movements(self, date_from: str, date_to: str, region_key: int = 0, top_type: int = 0,
+                  min_change: int = 1) -> List[Dict]:
+        """Изменения мест застройщиков, присутствующих в обоих снимках.
+
+        change > 0 - компания поднялась. Сортировка по величине изменения.
+        """
+        return self._query(
+            "SELECT b.developer_id, b.name, a.rank AS rank_from, b.rank AS rank_to, "
+            "a.rank - b.rank AS change "
+            "FROM ratings b JOIN ratings a "
+            "ON a.region_key = b.region_key AND a.top_type = b.top_type AND a.date = ? "
+            "AND a.developer_id = b.developer_id "
+            "WHERE b.region_key = ? AND b.top_type = ? AND b.date = ? AND ABS(a.rank - b.rank) >= ? "
+            "ORDER BY ABS(a.rank - b.rank) DESC, b.rank",
+            (str(date_from), region_key, top_type, str(date_to), min_change),
+        )
+
+    def entrants(self, date_from: str, date_to: str, region_key: int = 0, top_type: int = 0) -> List[Dict]:
+        """Застройщики снимка date_to, которых нет в снимке date_from"""
+        return self._query(
+            "SELECT b.developer_id, b.name, b.rank FROM ratings b "
+            "WHERE b.region_key = ? AND b.top_type = ? AND b.date = ? AND NOT EXISTS ("
+            "SELECT 1 FROM ratings a WHERE a.region_key = b.region_key AND a.top_type = b.top_type "
+            "AND a.date = ? AND a.developer_id = b.developer_id) "
+            "ORDER BY b.rank",
+            (region_key, top_type, str(date_to), str(date_from)),
+        )
+
+    def dropouts(self, date_from: str, date_to: str, region_key: int = 0, top_type: int = 0) -> List[Dict]:
+        """Застройщики снимка date_from, выбывшие к снимку date_to"""
+        return self.entrants(date_to, date_from, region_key, top_type)
+
+    def diff(self, date_from: str, date_to: str, region_key: int = 0, top_type: int = 0) -> Dict[str, List[Dict]]:
+        return {
+            'movements': self.movements(date_from, date_to, region_key, top_type),
+            'entrants': self.entrants(date_from, date_to, region_key, top_type),
+            'dropouts': self.dropouts(date_from, date_to, region_key, top_type),
+        }
+
+    def developer(self, developer: str, region_key: Optional[int] = None,
+                  top_type: Optional[int] = None) -> List[Dict]:
+        """История застройщика по датам: место и метрики в каждом снимке"""
+        return self._query(
+            f"SELECT region_key, top_type, date, rank, name, {', '.join(METRIC_NAMES)} FROM ratings "
+            "WHERE developer_id = ? AND (? IS NULL OR region_key = ?) AND (? IS NULL OR top_type = ?) "
+            "ORDER BY date, region_key, top_type",
+            (developer, region_key, region_key, top_type, top_type),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='История рейтингов застройщиков erzrf.ru')
+    arg_parser.add_argument('--db', default='erzrf_history.sqlite', help='Файл исторического хранилища')
+    arg_parser.add_argument('--region-key', type=int, default=0)
+    arg_parser.add_argument('--top-type', type=int, default=0)
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('snapshots', help='Список сохраненных снимков')
+    diff = commands.add_parser('diff', help='Изменения мест, новые и выбывшие застройщики между датами')
+    diff.add_argument('date_from')
+    diff.add_argument('date_to')
+    developer = commands.add_parser('developer', help='История застройщика по номеру бренда')
+    developer.add_argument('developer_id')
+    ingest = commands.add_parser('import', help='Загрузить таблицы рейтинга .npz (--rating-table)')
+    ingest.add_argument('tables', nargs='+')
+    args = arg_parser.parse_args()
+    setup_logging(None)
+
+    history = RatingHistory(args.db)
+    try:
+        if args.command == 'snapshots':
+            for snapshot in history.snapshots():
+                print(f"regionKey={snapshot['region_key']} topType={snapshot['top_type']} "
+                      f"date={snapshot['date']}: {snapshot['rows']} строк")
+        elif args.command == 'diff':
+            result = history.diff(args.date_from, args.date_to, args.region_key, args.top_type)
+            print(f"Изменения мест ({len(result['movements'])}):")
+            for row in result['movements']:
+                print(f"  {row['rank_from']:>4} -> {row['rank_to']:<4} {row['change']:+d}  {row['name']}")
+            print(f"Новые ({len(result['entrants'])}):")
+            for row in result['entrants']:
+                print(f"  {row['rank']:>4}  {row['name']}")
+            print(f"Выбывшие ({len(result['dropouts'])}):")
+            for row in result['dropouts']:
+                print(f"  {row['rank']:>4}  {row['name']}")
+        elif args.command == 'developer':
+            for row in history.developer(args.developer_id, args.region_key, args.top_type):
+                print(f"{row['date']}: место {row['rank']}, {row['name']}, "
+                      f"строится {row['area_building']} м²")
+        elif args.command == 'import':
+            for path in args.tables:
+                history.ingest_table(RatingTable.load(path))
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
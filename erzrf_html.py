@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from erzrf_urls import absolute_href, classify_url
+
+try:
+    import lxml
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+logger = logging.getLogger(__name__)
+
+HTML_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+# Порядок предпочтения по скорости (benchmarks/bench_parsing.py)
+FASTEST_FIRST = ('selectolax', 'lxml', 'html.parser')
+
+# Идентификаторы и классы, которые можно без экранирования вставить в CSS-селектор
+_CSS_NAME = re.compile(r'^-?[A-Za-z_][\w-]*$')
+
+
+def fastest_backend() -> str:
+    """Самый быстрый из установленных бэкендов: selectolax, lxml или html.parser"""
+    if SelectolaxParser is not None:
+        return 'selectolax'
+    return 'lxml' if lxml is not None else 'html.parser'
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Проверка доступности бэкенда; при отсутствии библиотеки - откат на html.parser.
+
+    None - самый быстрый из установленных (fastest_backend).
+    """
+    if backend is None:
+        return fastest_backend()
+    if backend not in HTML_BACKENDS:
+        raise ValueError(f"Неизвестный HTML-парсер: {backend}")
+    if backend == 'lxml' and lxml is None:
+        logger.warning("lxml не установлен, используется html.parser")
+        return 'html.parser'
+    if backend == 'selectolax' and SelectolaxParser is None:
+        logger.warning("selectolax не установлен, используется lxml/html.parser")
+        return resolve_backend('lxml')
+    return backend
+
+
+def make_soup(html: str, backend: str = 'html.parser') -> BeautifulSoup:
+    """Дерево BeautifulSoup на выбранном бэкенде.
+
+    selectolax не строит дерево BeautifulSoup, поэтому для него (когда дерево
+    все-таки нужно) используется lxml.
+    """
+    features = 'lxml' if backend in ('lxml', 'selectolax') and lxml is not None else 'html.parser'
+    return BeautifulSoup(html, features)
+
+
+def element_signature(tag: str, element_id: Optional[str] = None, classes: Optional[List[str]] = None) -> str:
+    """Подпись элемента в виде CSS-селектора: div#main.card.wide (классы по алфавиту)"""
+    signature = tag.lower()
+    if element_id and _CSS_NAME.match(element_id):
+        signature += f'#{element_id}'
+    for css_class in sorted(set(classes or ())):
+        if _CSS_NAME.match(css_class):
+            signature += f'.{css_class}'
+    return signature
+
+
+def _soup_path(element, memo: Dict[int, Tuple[str, ...]]) -> Tuple[str, ...]:
+    """Подписи предков элемента от <body> (не включая); memo - пути уже пройденных узлов"""
+    parent = element.parent
+    if parent is None or parent.name in ('body', 'html', '[document]'):
+        return ()
+    path = memo.get(id(parent))
+    if path is None:
+        path = memo[id(parent)] = _soup_path(parent, memo) + (
+            element_signature(parent.name, parent.get('id'), parent.get('class')),)
+    return path
+
+
+def _lxml_path(element, memo: Dict) -> Tuple[str, ...]:
+    # Ключ - сам элемент, а не id(): прокси-объекты lxml создаются заново при каждом
+    # обращении, и id освобожденного прокси может достаться другому элементу
+    parent = element.getparent()
+    if parent is None or parent.tag in ('body', 'html'):
+        return ()
+    path = memo.get(parent)
+    if path is None:
+        path = memo[parent] = _lxml_path(parent, memo) + (
+            element_signature(parent.tag, parent.get('id'), (parent.get('class') or '').split()),)
+    return path
+
+
+def _lxml_text(element) -> str:
+    """Текст элемента без содержимого script и style, как get_text у BeautifulSoup"""
+    return ''.join(element.xpath('.//text()[not(ancestor::script) and not(ancestor::style)]'))
+
+
+def _lxml_link_text(element) -> str:
+    """Текст ссылки как get_text(strip=True): обрезанные строки подряд"""
+    return ''.join(string.strip() for string in element.itertext())
+
+
+def _lxml_document(html: str):
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # Строка с объявлением кодировки (<?xml encoding=...?>) разбирается как байты
+        return lxml_html.document_fromstring(html.encode('utf-8'),
+                                             parser=lxml_html.HTMLParser(encoding='utf-8'))
+    except etree.ParserError:
+        # Пустой документ
+        return lxml_html.document_fromstring('<html><body></body></html>')
+
+
+def _lexbor_path(node, memo: Dict[int, Tuple[str, ...]]) -> Tuple[str, ...]:
+    parent = node.parent
+    if parent is None or parent.tag in ('body', 'html', '-undef', '#document'):
+        return ()
+    key = parent.mem_id
+    path = memo.get(key)
+    if path is None:
+        attributes = parent.attributes
+        path = memo[key] = _lexbor_path(parent, memo) + (
+            element_signature(parent.tag, attributes.get('id'), (attributes.get('class') or '').split()),)
+    return path
+
+
+class Anchor(NamedTuple):
+    href: str
+    text: str
+    path: Tuple[str, ...]  # подписи предков от <body> (не включая) до родителя ссылки
+
+
+class Link(NamedTuple):
+    href: str
+    text: str
+    domain: str
+    kind: str
+    network: str = ''
+
+
+def classify_link(href: str) -> Link:
+    """Разбор href один раз: домен, категория (erzrf_urls) и соцсеть.
+
+    В Link сохраняется абсолютный адрес: ссылка //example.ru попадает в
+    результат как https://example.ru, а не без схемы.
+    """
+    kind, domain, network = classify_url(href)
+    return Link(absolute_href(href), '', domain, kind, network)
+
+
+class LinkIndex:
+    """Все ссылки страницы, извлеченные за один проход и общие для всех экстракторов"""
+
+    def __init__(self, links: List[Link]):
+        self.links = links
+
+    @classmethod
+    def from_soup(cls, soup: BeautifulSoup) -> 'LinkIndex':
+        links = []
+        for a in soup.find_all('a', href=True):
+            href = a.get('href', '')
+            links.append(classify_link(href)._replace(text=a.get_text(strip=True)))
+        return cls(links)
+
+    @classmethod
+    def from_lxml(cls, tree) -> 'LinkIndex':
+        links = []
+        for a in tree.iter('a'):
+            href = a.get('href')
+            if href is not None:
+                links.append(classify_link(href)._replace(text=_lxml_link_text(a)))
+        return cls(links)
+
+    @classmethod
+    def from_selectolax(cls, tree) -> 'LinkIndex':
+        links = []
+        for a in tree.css('a[href]'):
+            href = a.attributes.get('href') or ''
+            links.append(classify_link(href)._replace(text=a.text(strip=True)))
+        return cls(links)
+
+    def by_kind(self, kind: str) -> List[Link]:
+        return [link for link in self.links if link.kind == kind]
+
+    def __iter__(self) -> Iterator[Link]:
+        return iter(self.links)
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+
+class ParsedPage:
+    """Страница, разобранная один раз.
+
+    Дерево, индекс ссылок и текст строятся лениво при первом обращении и
+    затем переиспользуются. На бэкендах selectolax и lxml индекс ссылок,
+    блоки и текст берутся из собственного дерева библиотеки: обертка
+    BeautifulSoup строится, только если к ней обращаются через soup, и ее
+    накладные расходы не съедают выигрыш от быстрого парсера.
+    """
+
+    def __init__(self, html: str, backend: str = 'html.parser', url: str = ''):
+        self.html = html
+        if backend == 'selectolax' and SelectolaxParser is None:
+            backend = 'lxml'
+        if backend == 'lxml' and lxml is None:
+            backend = 'html.parser'
+        self.backend = backend
+        self.url = url
+        self._soup: Optional[BeautifulSoup] = None
+        self._tree = None
+        self._links: Optional[LinkIndex] = None
+        self._text: Optional[str] = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = make_soup(self.html, self.backend)
+        return self._soup
+
+    def _native_tree(self):
+        """Дерево selectolax или lxml; None для html.parser"""
+        if self._tree is None:
+            if self.backend == 'selectolax':
+                self._tree = SelectolaxParser(self.html)
+            elif self.backend == 'lxml':
+                self._tree = _lxml_document(self.html)
+        return self._tree
+
+    def _lxml_body(self):
+        tree = self._native_tree()
+        body = tree.find('body')
+        return body if body is not None else tree
+
+    @property
+    def links(self) -> LinkIndex:
+        if self._links is None:
+            if self.backend == 'selectolax':
+                self._links = LinkIndex.from_selectolax(self._native_tree())
+            elif self.backend == 'lxml':
+                self._links = LinkIndex.from_lxml(self._native_tree())
+            else:
+                self._links = LinkIndex.from_soup(self.soup)
+        return self._links
+
+    def _roots(self, path: Tuple[str, ...]) -> list:
+        """Элементы, путь которых от <body> совпадает с path (подписи element_signature).
+
+        Спуск идет только по дочерним элементам совпавших узлов, без обхода всего дерева.
+        """
+        if self.backend == 'selectolax':
+            body = self._native_tree().body
+            level = [body] if body is not None else []
+            for signature in path:
+                level = [child for node in level for child in node.iter()
+                         if element_signature(child.tag, child.attributes.get('id'),
+                                              (child.attributes.get('class') or '').split()) == signature]
+            return level
+        if self.backend == 'lxml':
+            level = [self._lxml_body()]
+            for signature in path:
+                level = [child for node in level for child in node.iterchildren()
+                         if isinstance(child.tag, str) and element_signature(
+                             child.tag, child.get('id'), (child.get('class') or '').split()) == signature]
+            return level
+        level = [self.soup.body or self.soup]
+        for signature in path:
+            level = [child for node in level for child in node.find_all(True, recursive=False)
+                     if element_signature(child.name, child.get('id'), child.get('class')) == signature]
+        return level
+
+    def anchors(self, path: Tuple[str, ...] = ()) -> List[Anchor]:
+        """Ссылки страницы (или поддеревьев с путем path от <body>) с путем блока каждой ссылки"""
+        roots = self._roots(path)
+        memo: Dict[int, Tuple[str, ...]] = {}
+        if self.backend == 'selectolax':
+            return [Anchor(a.attributes.get('href') or '', a.text(strip=True), _lexbor_path(a, memo))
+                    for root in roots for a in root.css('a[href]')]
+        if self.backend == 'lxml':
+            return [Anchor(a.get('href'), _lxml_link_text(a), _lxml_path(a, memo))
+                    for root in roots for a in root.iterdescendants('a') if a.get('href') is not None]
+        return [Anchor(a.get('href', ''), a.get_text(strip=True), _soup_path(a, memo))
+                for root in roots for a in root.find_all('a', href=True)]
+
+    def text_in(self, path: Tuple[str, ...]) -> str:
+        """Текст поддеревьев с путем path от <body>"""
+        if self.backend == 'selectolax':
+            return '\n'.join(node.text() for node in self._roots(path))
+        if self.backend == 'lxml':
+            return '\n'.join(_lxml_text(element) for element in self._roots(path))
+        return '\n'.join(element.get_text() for element in self._roots(path))
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if self.backend == 'selectolax':
+                body = self._native_tree().body
+                self._text = body.text() if body is not None else ''
+            elif self.backend == 'lxml':
+                self._text = _lxml_text(self._lxml_body())
+            else:
+                self._text = self.soup.get_text()
+        return self._text
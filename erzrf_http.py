@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+def _cached_body(cache, url: str) -> Optional[str]:
+    """Свежая запись кэша или, в офлайн-режиме, любая сохраненная"""
+    body = cache.get_fresh(url)
+    if body is not None:
+        logger.debug(f"Из кэша: {url}")
+    elif cache.offline:
+        logger.warning(f"Страницы нет в кэше (офлайн-режим): {url}")
+    return body
+
+
+def _revalidated_body(cache, url: str) -> str:
+    """Тело для ответа 304; если запись успели вытеснить, попытка повторяется без валидаторов"""
+    body = cache.revalidated(url)
+    if body is None:
+        raise RuntimeError("Ответ 304, но запись в кэше отсутствует")
+    logger.debug(f"Не изменилась (304): {url}")
+    return body
+
+
+def _feedback(rate_limiter, status: int, headers) -> Optional[float]:
+    """Передача кода ответа лимитеру; возвращает паузу из Retry-After"""
+    if rate_limiter:
+        return rate_limiter.feedback(status, headers.get('Retry-After'))
+    return None
+
+
+def _record(metrics, url: str, transport: str, status: Optional[int], attempts: int, cache: str,
+            size: int = 0, timings: Optional[Dict[str, float]] = None):
+    if metrics:
+        metrics.record_request(url, transport, status, attempts, cache=cache, size=size, timings=timings)
+
+
+def _cache_hit(metrics, url: str, transport: str, body: Optional[str]):
+    """Учет ответа из кэша без обращения к сети"""
+    _record(metrics, url, transport, 200 if body is not None else None, 0,
+            'fresh' if body is not None else 'offline')
+
+
+def _timing_trace_config() -> 'aiohttp.TraceConfig':
+    """Трассировка aiohttp: время DNS, установки соединения и первого байта.
+
+    Замеры пишутся в словарь, переданный запросу как trace_request_ctx.
+    DNS разрешается внутри установки соединения, поэтому его время
+    вычитается из connect. Для соединения из пула connect не измеряется.
+    """
+    def ctx(trace_config_ctx) -> Dict:
+        return trace_config_ctx.trace_request_ctx if trace_config_ctx.trace_request_ctx is not None else {}
+
+    async def on_request_start(session, trace_config_ctx, params):
+        ctx(trace_config_ctx)['start'] = time.perf_counter()
+
+    async def on_dns_resolvehost_start(session, trace_config_ctx, params):
+        ctx(trace_config_ctx)['dns_start'] = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, trace_config_ctx, params):
+        timing = ctx(trace_config_ctx)
+        timing['dns'] = time.perf_counter() - timing.get('dns_start', time.perf_counter())
+
+    async def on_connection_create_start(session, trace_config_ctx, params):
+        ctx(trace_config_ctx)['connect_start'] = time.perf_counter()
+
+    async def on_connection_create_end(session, trace_config_ctx, params):
+        timing = ctx(trace_config_ctx)
+        elapsed = time.perf_counter() - timing.get('connect_start', time.perf_counter())
+        timing['connect'] = max(0.0, elapsed - timing.get('dns', 0.0))
+
+    async def on_request_end(session, trace_config_ctx, params):
+        timing = ctx(trace_config_ctx)
+        timing['headers_at'] = time.perf_counter()
+        timing['ttfb'] = timing['headers_at'] - timing.get('start', timing['headers_at'])
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+def _trace_timings(trace: Dict[str, float], start: float, sent: float,
+                   finished: Optional[float] = None) -> Dict[str, float]:
+    """Фазы запроса aiohttp из замеров трассировки"""
+    timings = {'wait': sent - start}
+    for phase in ('dns', 'connect', 'ttfb'):
+        if phase in trace:
+            timings[phase] = trace[phase]
+    if finished is not None:
+        timings['total'] = finished - sent
+        if 'headers_at' in trace:
+            timings['download'] = finished - trace['headers_at']
+    return timings
+
+
+def _retry_delay(rate_limiter, attempt: int, retry_after: Optional[float]) -> float:
+    if rate_limiter:
+        return rate_limiter.backoff_delay(attempt, retry_after)
+    return retry_after if retry_after is not None else 2 ** attempt
+
+
+class RequestsTransport:
+    """Блокирующий транспорт на requests.Session (поведение по умолчанию)"""
+
+    def __init__(self, timeout: float = 15, pool_size: int = 10, rate_limiter=None, cache=None, metrics=None):
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.metrics = metrics
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        # Пул соединений должен вмещать все потоки, иначе лишние соединения закрываются
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url: str, retries: int = 3) -> Optional[str]:
+        """Получение HTML страницы с повторными попытками"""
+        if self.cache:
+            cached = _cached_body(self.cache, url)
+            if cached is not None or self.cache.offline:
+                _cache_hit(self.metrics, url, 'requests', cached)
+                return cached
+
+        status = None
+        timings: Dict[str, float] = {}
+        cache_result = 'miss' if self.cache else 'off'
+        for attempt in range(retries):
+            retry_after = None
+            try:
+                headers = self.cache.revalidation_headers(url) if self.cache else {}
+                start = time.perf_counter()
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                sent = time.perf_counter()
+                response = self.session.get(url, timeout=self.timeout, headers=headers)
+                finished = time.perf_counter()
+                status = response.status_code
+                # requests не разделяет DNS и соединение; elapsed - время до получения заголовков
+                ttfb = response.elapsed.total_seconds()
+                timings = {'wait': sent - start, 'ttfb': ttfb,
+                           'download': max(0.0, finished - sent - ttfb), 'total': finished - sent}
+                retry_after = _feedback(self.rate_limiter, response.status_code, response.headers)
+                if response.status_code == 304 and self.cache:
+                    body = _revalidated_body(self.cache, url)
+                    _record(self.metrics, url, 'requests', status, attempt + 1, 'revalidated', 0, timings)
+                    return body
+                response.raise_for_status()
+                response.encoding = 'utf-8'
+                if self.cache:
+                    self.cache.store(url, response.text, response.headers)
+                _record(self.metrics, url, 'requests', status, attempt + 1, cache_result,
+                        len(response.content), timings)
+                return response.text
+            except Exception as e:
+                logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {e}")
+                if attempt < retries - 1:
+                    time.sleep(_retry_delay(self.rate_limiter, attempt, retry_after))
+                else:
+                    logger.error(f"Не удалось получить страницу {url}")
+                    _record(self.metrics, url, 'requests', status, attempt + 1, cache_result, 0, timings)
+                    return None
+
+    def fetch_many(self, urls: List[str], retries: int = 3) -> List[Optional[str]]:
+        """Последовательная загрузка списка страниц"""
+        return [self.fetch(url, retries) for url in urls]
+
+    async def get_page(self, url: str, retries: int = 3) -> Optional[str]:
+        """Асинхронный интерфейс поверх блокирующей сессии (через пул потоков)"""
+        return await asyncio.to_thread(self.fetch, url, retries)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncTransport:
+    """Асинхронный транспорт на aiohttp.
+
+    Все запросы выполняются в одном event loop с общим пулом соединений и
+    лимитом соединений на хост. Синхронные методы fetch/fetch_many - тонкие
+    обертки, которые отправляют корутины в фоновый loop и ждут результата,
+    поэтому существующие вызовы run() работают без изменений.
+    """
+
+    def __init__(self, timeout: float = 15, limit: int = 100, limit_per_host: int = 10,
+                 rate_limiter=None, cache=None, metrics=None):
+        if aiohttp is None:
+            raise ImportError("Для асинхронного транспорта установите aiohttp")
+        self.timeout = timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.metrics = metrics
+        self._sessions: Dict[int, 'aiohttp.ClientSession'] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        """Сессия привязана к event loop, поэтому создается отдельно для каждого loop"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(id(loop))
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(
+                headers=DEFAULT_HEADERS,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[_timing_trace_config()] if self.metrics else None,
+            )
+            self._sessions[id(loop)] = session
+        return session
+
+    async def get_page(self, url: str, retries: int = 3) -> Optional[str]:
+        """Получение HTML страницы с повторными попытками"""
+        if self.cache:
+            cached = _cached_body(self.cache, url)
+            if cached is not None or self.cache.offline:
+                _cache_hit(self.metrics, url, 'aiohttp', cached)
+                return cached
+
+        session = self._get_session()
+        status = None
+        timings: Dict[str, float] = {}
+        cache_result = 'miss' if self.cache else 'off'
+        for attempt in range(retries):
+            retry_after = None
+            # Сюда пишут замеры обработчики трассировки (_timing_trace_config)
+            trace: Dict[str, float] = {}
+            try:
+                headers = self.cache.revalidation_headers(url) if self.cache else {}
+                start = time.perf_counter()
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async()
+                sent = time.perf_counter()
+                async with session.get(url, headers=headers, trace_request_ctx=trace) as response:
+                    status = response.status
+                    timings = _trace_timings(trace, start, sent)
+                    retry_after = _feedback(self.rate_limiter, response.status, response.headers)
+                    if response.status == 304 and self.cache:
+                        body = _revalidated_body(self.cache, url)
+                        _record(self.metrics, url, 'aiohttp', status, attempt + 1, 'revalidated', 0, timings)
+                        return body
+                    response.raise_for_status()
+                    raw = await response.read()
+                    timings = _trace_timings(trace, start, sent, time.perf_counter())
+                    text = raw.decode('utf-8', errors='replace')
+                    if self.cache:
+                        self.cache.store(url, text, response.headers)
+                    _record(self.metrics, url, 'aiohttp', status, attempt + 1, cache_result, len(raw), timings)
+                    return text
+            except Exception as e:
+                logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {e}")
+                if attempt < retries - 1:
+                    await asyncio.sleep(_retry_delay(self.rate_limiter, attempt, retry_after))
+                else:
+                    logger.error(f"Не удалось получить страницу {url}")
+                    _record(self.metrics, url, 'aiohttp', status, attempt + 1, cache_result, 0, timings)
+                    return None
+
+    async def get_pages(self, urls: List[str], retries: int = 3) -> List[Optional[str]]:
+        """Параллельная загрузка списка страниц; порядок результатов совпадает с urls"""
+        return await asyncio.gather(*(self.get_page(url, retries) for url in urls))
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='erzrf-async-transport',
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def fetch(self, url: str, retries: int = 3) -> Optional[str]:
+        """Синхронная обертка над get_page"""
+        return self._run(self.get_page(url, retries))
+
+    def fetch_many(self, urls: List[str], retries: int = 3) -> List[Optional[str]]:
+        """Синхронная обертка над get_pages"""
+        return self._run(self.get_pages(urls, retries))
+
+    async def aclose(self):
+        """Закрытие сессии текущего event loop"""
+        session = self._sessions.pop(id(asyncio.get_running_loop()), None)
+        if session is not None:
+            await session.close()
+
+    def close(self):
+        """Закрытие фонового event loop и его сессии"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+def create_transport(kind: str = 'requests', timeout: float = 15, pool_size: int = 10,
+                     max_connections: int = 100, limit_per_host: int = 10, rate_limiter=None,
+                     cache=None, metrics=None):
+    """Создание транспорта по имени: 'requests' или 'aiohttp'"""
+    if kind == 'aiohttp':
+        try:
+            return AsyncTransport(
+                timeout=timeout,
+                limit=max_connections,
+                limit_per_host=limit_per_host,
+                rate_limiter=rate_limiter,
+                cache=cache,
+                metrics=metrics,
+            )
+        except ImportError as e:
+            logger.error(f"Ошибка инициализации асинхронного транспорта: {e}")
+    elif kind != 'requests':
+        raise ValueError(f"Неизвестный транспорт: {kind}")
+
+    return RequestsTransport(timeout=timeout, pool_size=pool_size, rate_limiter=rate_limiter, cache=cache,
+                             metrics=metrics)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+from erzrf_batch import canonical_profile_url
+
+logger = logging.getLogger(__name__)
+
+# Номер бренда в конце пути профиля: /zastroyschiki/brand/<slug>-<id>
+_BRAND_ID = re.compile(r'/brand/(?:[^/]*-)?(\d+)$')
+
+# Слова, не отличающие одного застройщика от другого: "ГК Самолет" = "Группа Самолет" = "Самолет"
+NAME_STOPWORDS = frozenset({
+    'гк', 'группа', 'групп', 'компаний', 'group', 'ооо', 'ао', 'пао', 'зао', 'оао',
+    'сз', 'специализированный', 'застройщик',
+})
+
+_TOKEN = re.compile(r'\w+')
+
+
+def brand_id(url: str) -> Optional[str]:
+    """Номер бренда из адреса профиля: /zastroyschiki/brand/pik-429726001 -> 429726001.
+
+    Если номера в пути нет - параметр organizationId; None, если нет и его.
+    """
+    parsed = urlparse(url)
+    match = _BRAND_ID.search(parsed.path.rstrip('/'))
+    if match:
+        return match.group(1)
+    organization = parse_qs(parsed.query).get('organizationId')
+    if organization and organization[0].isdigit():
+        return organization[0]
+    return None
+
+
+def developer_id(url: str) -> str:
+    """Идентификатор застройщика по адресу профиля: номер бренда или канонический адрес"""
+    return brand_id(url) or canonical_profile_url(url)
+
+
+def name_key(name: str) -> str:
+    """Нормализованное название: нижний регистр, ё -> е, без кавычек, знаков и слов
+    NAME_STOPWORDS, слова по алфавиту. "ГК «ФСК»" и "ФСК" дают одно значение.
+    """
+    tokens = _TOKEN.findall(name.lower().replace('ё', 'е'))
+    significant = [token for token in tokens if token not in NAME_STOPWORDS]
+    return ' '.join(sorted(significant or tokens))
+
+
+def ngrams(key: str, n: int = 3) -> Set[str]:
+    """Множество n-грамм нормализованного названия (с пробелами по краям)"""
+    padded = f' {key} '
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Расстояние Левенштейна, не больше max_distance + 1.
+
+    Считается только полоса матрицы шириной 2 * max_distance + 1 вокруг
+    диагонали; как только расстояние наверняка больше max_distance, расчет
+    прекращается и возвращается max_distance + 1.
+    """
+    limit = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return limit
+    previous = [j if j <= max_distance else limit for j in range(len(b) + 1)]
+    for i, ch_a in enumerate(a, 1):
+        low, high = max(1, i - max_distance), min(len(b), i + max_distance)
+        current = [limit] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (ch_a != b[j - 1])
+            current[j] = min(cost, previous[j] + 1, current[j - 1] + 1, limit)
+        if min(current[low - 1:high + 1]) > max_distance:
+            return limit
+        previous = current
+    return previous[-1]
+
+
+class IdentityIndex:
+    """Индекс идентичности застройщиков для дедупликации и сопоставления строк.
+
+    Основной ключ - номер бренда из адреса профиля (brand_id). Для записей
+    без адреса название нормализуется (name_key) и ищется сначала точно, а
+    затем нечетко: кандидаты отбираются по общим n-граммам через обратный
+    индекс (блокировка), и только для нескольких лучших из них считается
+    расстояние редактирования. Поэтому сопоставление тысяч строк не требует
+    попарного сравнения всех названий. Числа в названиях должны совпадать
+    точно: "СтройГрупп 12" и "СтройГрупп 13" - разные компании.
+
+    Идентификатор - номер бренда, а для записей без адреса - "name:<ключ>".
+    """
+
+    def __init__(self, threshold: float = 0.85, n: int = 3, candidates: int = 5):
+        self.threshold = threshold
+        self.n = n
+        self.candidates = candidates
+        # Счетчик вычислений расстояния редактирования
+        self.comparisons = 0
+        self._by_brand: Dict[str, str] = {}
+        self._by_key: Dict[str, List[str]] = defaultdict(list)
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+        self._variants: Dict[str, List[str]] = {}
+        self._brands: Dict[str, Optional[str]] = {}
+        self._names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def name(self, identity: str) -> str:
+        """Название, под которым застройщик встретился впервые"""
+        return self._names[identity]
+
+    def _compatible(self, identity: str, brand: Optional[str]) -> bool:
+        # Разные номера бренда - разные застройщики, даже при одинаковых названиях
+        return brand is None or self._brands[identity] in (None, brand)
+
+    def _fuzzy(self, key: str, brand: Optional[str]) -> Optional[str]:
+        grams = ngrams(key, self.n)
+        # Одна правка портит не больше n n-грамм, поэтому у названия на допустимом
+        # расстоянии общих n-грамм не меньше min_shared. Такое название обязательно
+        # содержит хотя бы одну из (len(grams) - min_shared + 1) самых редких
+        # n-грамм запроса: кандидаты берутся только из их списков
+        max_distance = int(len(key) * (1 - self.threshold) / self.threshold)
+        min_shared = max(1, len(grams) - self.n * max_distance)
+        postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+        shared = Counter()
+        for posting in postings[:len(grams) - min_shared + 1]:
+            shared.update(posting)
+        digits = re.findall(r'\d+', key)
+        best, best_score = None, self.threshold
+        for identity, _ in shared.most_common(self.candidates):
+            if not self._compatible(identity, brand):
+                continue
+            for variant in self._variants[identity]:
+                if re.findall(r'\d+', variant) != digits or len(grams & ngrams(variant, self.n)) < min_shared:
+                    continue
+                longest = max(len(key), len(variant))
+                max_distance = int(longest * (1 - self.threshold))
+                self.comparisons += 1
+                distance = edit_distance(key, variant, max_distance)
+                score = 1 - distance / longest if longest else 1.0
+                if distance <= max_distance and score >= best_score:
+                    best, best_score = identity, score
+        return best
+
+    def resolve(self, name: str, url: Optional[str] = None) -> Optional[str]:
+        """Идентификатор уже известного застройщика или None"""
+        brand = brand_id(url) if url else None
+        if brand is not None and brand in self._by_brand:
+            return self._by_brand[brand]
+        key = name_key(name)
+        if not key:
+            return None
+        for identity in self._by_key.get(key, ()):
+            if self._compatible(identity, brand):
+                return identity
+        return self._fuzzy(key, brand)
+
+    def add(self, name: str, url: Optional[str] = None) -> str:
+        """Идентификатор записи; новый застройщик добавляется в индекс.
+
+        Новое написание названия известного застройщика запоминается, чтобы
+        следующие совпадения находились точным поиском.
+        """
+        brand = brand_id(url) if url else None
+        key = name_key(name)
+        identity = self.resolve(name, url)
+        if identity is None:
+            identity = brand if brand is not None else f'name:{key}'
+            self._names[identity] = name
+            self._brands[identity] = brand
+            self._variants[identity] = []
+        elif brand is not None and self._brands[identity] is None:
+            # Запись без адреса, найденная по названию, получает номер бренда
+            self._brands[identity] = brand
+        if brand is not None:
+            self._by_brand[brand] = identity
+        if key and key not in self._variants[identity]:
+            self._variants[identity].append(key)
+            self._by_key[key].append(identity)
+            for gram in ngrams(key, self.n):
+                self._grams[gram].add(identity)
+        return identity
+
+    def dedupe(self, records: Iterable[Dict], name_field: str = 'name',
+               url_field: str = 'profile_url') -> List[Dict]:
+        """Записи без повторов одного застройщика; остается первая запись"""
+        seen = set()
+        unique = []
+        for record in records:
+            identity = self.add(record[name_field], record.get(url_field) or None)
+            if identity in seen:
+                logger.debug(f"Повтор застройщика: {record[name_field]} = {self.name(identity)}")
+                continue
+            seen.add(identity)
+            unique.append(record)
+        return unique
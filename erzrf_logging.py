@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Dict, Optional
+
+LOG_FORMATS = ('text', 'json')
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Поля записи лога, которые парсеры передают через extra
+ITEM_FIELDS = ('stage', 'url', 'rank', 'company')
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def item_fields(stage: str, url: Optional[str] = None, rank: Optional[int] = None,
+                company: Optional[str] = None) -> Dict:
+    """extra для сообщения об отдельной компании или ссылке.
+
+    Такие сообщения помечаются как выборочные: при setup_logging(sample=...)
+    выводится только их доля, а сообщения об ошибках выводятся всегда.
+    """
+    fields = {'sampled': True, 'stage': stage}
+    if url is not None:
+        fields['url'] = url
+    if rank is not None:
+        fields['rank'] = rank
+    if company is not None:
+        fields['company'] = company
+    return fields
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждое n-е выборочное сообщение уровня INFO и ниже; остальные - всегда"""
+
+    def __init__(self, sample: float = 1.0):
+        super().__init__()
+        self.every = round(1 / sample) if sample > 0 else 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False) or record.levelno > logging.INFO:
+            return True
+        if self.every == 0:
+            return False
+        if self.every == 1:
+            return True
+        with self._lock:
+            return next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON с полями stage/url/rank/company, если они заданы"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in ITEM_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() подставляет аргументы в сообщение до постановки в
+    очередь. Здесь запись передается как есть, и форматирование вместе с
+    записью в файл выполняется в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(log_file: Optional[str] = None, level: str = 'INFO', fmt: str = 'text',
+                  sample: float = 1.0, use_queue: bool = True, console: bool = True):
+    """Настройка корневого логгера для запуска из командной строки.
+
+    Вызывается из main() парсеров, а не при импорте модулей. При
+    use_queue=True потоки парсера только кладут запись в очередь, а вывод в
+    консоль и файл идет в отдельном потоке. fmt: text (как раньше) или json.
+    sample - доля выводимых сообщений об отдельных компаниях (item_fields).
+    Повторный вызов заменяет прежнюю настройку.
+    """
+    global _listener
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Неизвестный формат логов: {fmt}")
+    shutdown_logging()
+
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    if use_queue:
+        queue_handler = _LazyQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(SamplingFilter(sample))
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(SamplingFilter(sample))
+            root.addHandler(handler)
+
+
+def shutdown_logging():
+    """Вывод оставшихся в очереди записей и остановка потока логирования"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
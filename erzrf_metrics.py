@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'erzrf_'
+QUANTILES = (0.5, 0.95, 0.99)
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def _key(name: str, labels: Dict) -> Tuple:
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def _escape(value) -> str:
+    """Значение метки Prometheus: экранирование обратной косой черты, кавычек и переводов строк"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _quantile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Summary:
+    """Число наблюдений, сумма, максимум и выборка для квантилей (reservoir sampling)"""
+
+    def __init__(self, reservoir: int):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+        self.reservoir = reservoir
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if len(self.samples) < self.reservoir:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.reservoir:
+                self.samples[slot] = value
+
+
+class Metrics:
+    """Метрики обхода: счетчики и распределения времени/размеров с метками.
+
+    Транспорты записывают каждый HTTP-запрос (record_request): время ожидания
+    лимитера, DNS, соединения, первого байта (TTFB) и загрузки тела, размер
+    ответа, число повторов и результат кэша. Парсер и конвейер добавляют
+    время разбора, извлечения и этапов. Если задан trace_path, каждый запрос
+    дополнительно пишется строкой JSON в файл (трасса по URL). Сводка
+    доступна в формате Prometheus (to_prometheus) и JSON (summary).
+    Все методы потокобезопасны.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, reservoir: int = 1024):
+        self.reservoir = reservoir
+        self.started = time.time()
+        self._counters: Dict[Tuple, float] = {}
+        self._summaries: Dict[Tuple, _Summary] = {}
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary(self.reservoir)
+            summary.add(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_request(self, url: str, transport: str, status: Optional[int], attempts: int,
+                       cache: str = 'miss', size: int = 0, timings: Optional[Dict[str, float]] = None):
+        """Один вызов fetch: итоговый статус, число попыток, результат кэша, размер и фазы запроса.
+
+        timings - секунды по фазам последней попытки: wait (лимитер), dns,
+        connect, ttfb, download, total; отсутствующие фазы не передаются.
+        """
+        timings = timings or {}
+        self.inc('http_requests_total', transport=transport, status=status if status is not None else 'error')
+        self.inc('http_retries_total', max(0, attempts - 1), transport=transport)
+        self.inc('cache_total', cache=cache)
+        self.inc('http_bytes_total', size, transport=transport)
+        for phase, seconds in timings.items():
+            self.observe('http_phase_seconds', seconds, transport=transport, phase=phase)
+
+        if self._trace is not None:
+            line = json.dumps({
+                'ts': round(time.time(), 3), 'url': url, 'transport': transport, 'status': status,
+                'attempts': attempts, 'cache': cache, 'bytes': size,
+                **{phase: round(seconds, 6) for phase, seconds in timings.items()},
+            }, ensure_ascii=False)
+            with self._lock:
+                self._trace.write(line + '\n')
+
+    def summary(self) -> Dict:
+        """Снимок метрик для JSON: счетчики и распределения (count, sum, max, квантили)"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            summaries = []
+            for (name, labels), summary in sorted(self._summaries.items()):
+                item = {'name': name, 'labels': dict(labels), 'count': summary.count,
+                        'sum': summary.sum, 'max': summary.max}
+                for q in QUANTILES:
+                    item[f'p{int(q * 100)}'] = _quantile(summary.samples, q)
+                summaries.append(item)
+        return {'uptime_seconds': time.time() - self.started, 'counters': counters, 'summaries': summaries}
+
+    def to_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        snapshot = self.summary()
+        lines = []
+        typed = set()
+
+        def labels_text(labels: Dict, extra: Optional[Dict] = None) -> str:
+            labels = dict(labels, **(extra or {}))
+            if not labels:
+                return ''
+            inner = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            return '{' + inner + '}'
+
+        for counter in snapshot['counters']:
+            name = PREFIX + counter['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{labels_text(counter['labels'])} {counter['value']:g}")
+        for summary in snapshot['summaries']:
+            name = PREFIX + summary['name']
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                lines.append(f"{name}{labels_text(summary['labels'], {'quantile': q})} "
+                             f"{summary[f'p{int(q * 100)}']:.6f}")
+            lines.append(f"{name}_sum{labels_text(summary['labels'])} {summary['sum']:.6f}")
+            lines.append(f"{name}_count{labels_text(summary['labels'])} {summary['count']}")
+        lines.append(f"{PREFIX}uptime_seconds {snapshot['uptime_seconds']:.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path: str):
+        """Атомарная запись сводки в JSON-файл"""
+        tmp_path = f"{path}.part"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+class MetricsServer:
+    """HTTP-эндпоинт метрик: /metrics (Prometheus) и /metrics.json"""
+
+    def __init__(self, metrics: Metrics, port: int = 9108, host: str = '127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body = json.dumps(metrics.summary(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                elif self.path.startswith('/metrics'):
+                    body = metrics.to_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='erzrf-metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+        return self
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+class JsonReporter:
+    """Периодическая запись сводки метрик в JSON-файл; при остановке пишется итоговая сводка"""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 30):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write_json(self.path)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='erzrf-metrics-json', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.metrics.write_json(self.path)
+        logger.info(f"Сводка метрик сохранена в {self.path}")
+
+
+@contextmanager
+def _profile_threads(profiles: List[cProfile.Profile]):
+    """Свой cProfile.Profile в каждом потоке, запущенном внутри блока.
+
+    Загрузка, разбор и запись профилей идут в потоках пулов и конвейера, а
+    не в вызывающем потоке. threading.setprofile ставит обработчик, который
+    при первом событии в новом потоке включает в нем отдельный профиль и
+    добавляет его в profiles. С Python 3.12 cProfile работает через
+    sys.monitoring и уже видит все потоки: второй профиль не включается,
+    и отдельные профили потоков не нужны.
+    """
+    lock = threading.Lock()
+
+    def start(frame, event, arg):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return
+        with lock:
+            profiles.append(profile)
+
+    threading.setprofile(start)
+    try:
+        yield
+    finally:
+        threading.setprofile(None)
+
+
+def run_profiled(func: Callable, profiler: str = 'cprofile', output: Optional[str] = None):
+    """Вызов func под профилировщиком.
+
+    cprofile профилирует вызывающий поток и все потоки, запущенные во время
+    вызова (потоки загрузки, пулы, этапы конвейера), сохраняет общую
+    статистику в .prof (для snakeviz/pstats) и выводит в лог 20 самых
+    затратных функций. Процессы разбора (--parse-processes) не
+    профилируются. pyinstrument сохраняет HTML-отчет только по вызывающему
+    потоку: работа в потоках пулов в нем видна как ожидание.
+    """
+    if profiler == 'pyinstrument' and pyinstrument is None:
+        logger.warning("pyinstrument не установлен, используется cProfile")
+        profiler = 'cprofile'
+
+    if profiler == 'pyinstrument':
+        output = output or 'erzrf_profile.html'
+        logger.warning("pyinstrument профилирует только основной поток; "
+                       "для потоков загрузки и разбора используйте cprofile")
+        profile = pyinstrument.Profiler()
+        profile.start()
+        try:
+            return func()
+        finally:
+            profile.stop()
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+            logger.info(f"Отчет pyinstrument сохранен в {output}")
+
+    if profiler != 'cprofile':
+        raise ValueError(f"Неизвестный профилировщик: {profiler}")
+    output = output or 'erzrf_profile.prof'
+    profile = cProfile.Profile()
+    threads: List[cProfile.Profile] = []
+    try:
+        with _profile_threads(threads):
+            return profile.runcall(func)
+    finally:
+        report = io.StringIO()
+        stats = pstats.Stats(profile, stream=report)
+        for thread_profile in threads:
+            thread_profile.disable()
+            stats.add(thread_profile)
+        stats.dump_stats(output)
+        stats.sort_stats('cumulative').print_stats(20)
+        logger.info(f"Профиль сохранен в {output} (потоков: {len(threads) + 1})\n{report.getvalue()}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from erzrf_identity import developer_id
+
+logger = logging.getLogger(__name__)
+
+# Строк на странице рейтинга erzrf.ru и параметр номера страницы
+PAGE_SIZE = 20
+PAGE_PARAM = 'page'
+
+# Подсказка под списком: "1 - 20 из 2857 застройщиков"
+_HINT = re.compile(r'(\d[\d\s]*?)\s*[-–]\s*(\d[\d\s]*?)\s+из\s+(\d[\d\s]*\d|\d)')
+
+
+class PageInfo(NamedTuple):
+    first: int        # место первой строки текущей страницы
+    last: int         # место последней строки текущей страницы
+    total: int        # всего строк в рейтинге
+    page_param: str   # имя параметра номера страницы
+    last_page: int    # номер последней страницы
+
+    @property
+    def page_size(self) -> int:
+        return self.last - self.first + 1
+
+
+def _number(text: str) -> int:
+    return int(re.sub(r'\s', '', text))
+
+
+def page_url(url: str, page: int, page_param: str = PAGE_PARAM) -> str:
+    """Адрес страницы рейтинга с номером page; первая страница - без параметра, как на сайте"""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != page_param]
+    if page > 1:
+        query.append((page_param, str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def parse_pagination(soup, url: str) -> Optional[PageInfo]:
+    """Постраничность рейтинга: диапазон строк, их общее число и параметр номера страницы.
+
+    Диапазон берется из подсказки .pagination__hint, параметр и номер
+    последней страницы - из ссылок .page-link: параметр, значения которого
+    различаются у ссылок на разные страницы. None, если постраничности нет.
+    """
+    hint = soup.select_one('.pagination__hint')
+    match = _HINT.search(hint.get_text(' ', strip=True) if hint is not None else '')
+    if not match:
+        return None
+    first, last, total = (_number(group) for group in match.groups())
+    if last < first:
+        return None
+
+    # Числовые параметры ссылок навигации: имя -> значения
+    values: Dict[str, set] = {}
+    for link in soup.select('.pagination a.page-link[href], nav a.page-link[href]'):
+        query = urlsplit(urljoin(url, link['href'])).query
+        for key, value in parse_qsl(query):
+            if value.isdigit():
+                values.setdefault(key, set()).add(int(value))
+    page_param = PAGE_PARAM
+    varying = [key for key, numbers in values.items() if len(numbers) > 1 or key == PAGE_PARAM]
+    if varying:
+        page_param = PAGE_PARAM if PAGE_PARAM in varying else varying[0]
+    size = last - first + 1
+    last_page = max(values.get(page_param, set()) | {math.ceil(total / size)})
+    return PageInfo(first, last, total, page_param, last_page)
+
+
+def pages_for_limit(limit: int, page_size: int = PAGE_SIZE, last_page: Optional[int] = None) -> List[int]:
+    """Номера страниц, на которых лежат первые limit строк рейтинга"""
+    count = math.ceil(limit / page_size)
+    if last_page is not None:
+        count = min(count, last_page)
+    return list(range(1, count + 1))
+
+
+def merge_pages(pages: Dict[int, List[Dict]], limit: int, page_size: int = PAGE_SIZE) -> List[Dict]:
+    """Сборка списка из страниц рейтинга по местам.
+
+    Повторы застройщика (строка, уже встреченная на другой странице,
+    например после сдвига рейтинга между запросами) отбрасываются. Разные
+    застройщики с одним местом (в рейтинге бывают одинаковые места)
+    сохраняются в порядке страниц. Совпадения мест, пропуски мест и
+    страницы без строк попадают в лог. Возвращается не больше limit строк.
+    """
+    merged: List[Dict] = []
+    seen_ids = set()
+    duplicates = 0
+    for number in sorted(pages):
+        if not pages[number]:
+            logger.warning(f"Страница рейтинга {number} пуста или не загрузилась")
+        for company in pages[number]:
+            identity = developer_id(company['profile_url'])
+            if identity in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(identity)
+            merged.append(company)
+
+    # Сортировка устойчивая: строки с одним местом остаются в порядке страниц
+    companies = sorted(merged, key=lambda company: company['rank'])[:limit]
+    if duplicates:
+        logger.warning(f"Отброшено повторов между страницами рейтинга: {duplicates}")
+    ranks = Counter(company['rank'] for company in companies)
+    shared = {rank: count for rank, count in ranks.items() if count > 1}
+    if shared:
+        logger.info(f"Одинаковые места у разных застройщиков: "
+                    f"{', '.join(f'{rank} ({count})' for rank, count in sorted(shared.items()))}")
+    if companies:
+        # Застройщики с одним местом r занимают места r, r + 1, ... (как 5, 5, 7)
+        covered = {rank + k for rank, count in ranks.items() for k in range(count)}
+        expected = min(limit, companies[-1]['rank'])
+        missing = sorted(set(range(1, expected + 1)) - covered)
+        if missing:
+            missing_pages = sorted({(rank - 1) // page_size + 1 for rank in missing})
+            logger.warning(f"Пропущены места рейтинга: {len(missing)} "
+                           f"(страницы {', '.join(map(str, missing_pages))})")
+    return companies
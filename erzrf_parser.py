@@ -1,62 +1,67 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import csv
-import time
-import re
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import logging
 from typing import List, Dict, Optional
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('erzrf_parser.log'),
-        logging.StreamHandler()
-    ]
-)
+from erzrf_api import rating_page_url
+from erzrf_cache import ResponseCache
+from erzrf_html import LinkIndex, make_soup, resolve_backend
+from erzrf_http import create_transport
+from erzrf_logging import item_fields, setup_logging
+from erzrf_rate_limit import RateLimiter
+from erzrf_regions import REGION_RESOLVER
+from erzrf_urls import CORPORATE, SOCIAL, classify_url
+
 logger = logging.getLogger(__name__)
 
+# Часть пути ссылки на профиль застройщика в строке рейтинга
+PROFILE_PATH = '/zastroyschiki/brand/'
+
+
+def is_profile_link(href: Optional[str]) -> bool:
+    return bool(href) and PROFILE_PATH in href
+
 class ERZRFParser:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+    def __init__(self, transport: str = 'requests', limit_per_host: int = 10,
+                 cache: Optional[ResponseCache] = None, html_backend: str = 'html.parser',
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.html_backend = resolve_backend(html_backend)
+        # Адаптивный лимит запросов вместо фиксированной паузы после каждого профиля
+        self.rate_limiter = rate_limiter or RateLimiter(1.0, max_rate=5.0)
+        self.transport = create_transport(
+            transport,
+            timeout=10,
+            limit_per_host=limit_per_host,
+            rate_limiter=self.rate_limiter,
+            cache=cache,
+        )
         self.base_url = 'https://erzrf.ru'
         self.companies_data = []
 
     def get_page(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
         """Получение страницы с повторными попытками"""
-        for attempt in range(retries):
-            try:
-                response = self.session.get(url, timeout=10)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                return BeautifulSoup(response.text, 'html.parser')
-            except Exception as e:
-                logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {e}")
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)  # Экспоненциальная задержка
-                else:
-                    logger.error(f"Не удалось получить страницу {url}")
-                    return None
-
-    def parse_main_page(self, limit: int = 250) -> List[Dict]:
+        html = self.transport.fetch(url, retries)
+        if html is None:
+            return None
+        return make_soup(html, self.html_backend)
+
+    async def get_page_async(self, url: str, retries: int = 3) -> Optional[BeautifulSoup]:
+        """Асинхронное получение страницы через транспорт"""
+        html = await self.transport.get_page(url, retries)
+        if html is None:
+            return None
+        return make_soup(html, self.html_backend)
+
+    def parse_main_page(self, limit: int = 250, params: Optional[Dict] = None) -> List[Dict]:
         """Парсинг основной страницы с топом застройщиков"""
         logger.info("Начинаем парсинг основной страницы...")
         
-        # URL для получения топ застройщиков (с параметрами из задачи)
-        url = f"{self.base_url}/top-zastroyshchikov/rf?regionKey=0&topType=0&date=250801"
+        # URL рейтинга; по умолчанию regionKey=0&topType=0&date=250801
+        url = rating_page_url(self.base_url, params)
         
         soup = self.get_page(url)
         if not soup:
@@ -65,13 +70,14 @@ class ERZRFParser:
 
         companies = []
         
-        # Поиск таблицы с застройщиками
-        table_rows = soup.find_all('tr') if soup else []
+        # Строки рейтинга: <tr> табличной верстки или <li> списка застройщиков
+        # со ссылкой на профиль (в шапке и меню тоже есть <li> со ссылками)
+        table_rows = [row for row in soup.find_all(['tr', 'li']) if row.find('a', href=is_profile_link)]
         
         for i, row in enumerate(table_rows[:limit]):  # Ограничиваем топ-250
             try:
                 # Поиск ссылки на застройщика
-                company_link = row.find('a')
+                company_link = row.find('a', href=is_profile_link)
                 if not company_link:
                     continue
                     
@@ -92,7 +98,8 @@ class ERZRFParser:
                 }
                 
                 companies.append(company_data)
-                logger.info(f"Найден застройщик #{i+1}: {company_name}")
+                logger.info("Найден застройщик #%d: %s", i + 1, company_name,
+                            extra=item_fields('list', url=company_url, rank=i + 1, company=company_name))
                 
             except Exception as e:
                 logger.error(f"Ошибка при парсинге строки {i}: {e}")
@@ -102,83 +109,41 @@ class ERZRFParser:
         return companies
 
     def extract_region(self, text: str) -> str:
-        """Извлечение региона из текста"""
-        # Регулярное выражение для поиска региона
-        region_patterns = [
-            r'г\.([А-Я][а-я\-]+)',  # г.Москва
-            r'([А-Я][а-я\-]+ область)',  # Московская область
-            r'([А-Я][а-я\-]+ край)',  # Краснодарский край
-            r'Республика ([А-Я][а-я\-]+)',  # Республика Татарстан
-        ]
-        
-        for pattern in region_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1) if 'г\.' in pattern else match.group(0)
-        
-        return "Не указан"
+        """Извлечение региона из текста (каноническое название субъекта РФ)"""
+        return REGION_RESOLVER.resolve_name(text)
 
     def parse_company_details(self, company: Dict) -> Dict:
         """Парсинг детальной информации о компании"""
-        logger.info(f"Парсинг деталей для {company['name']}")
+        logger.info("Парсинг деталей для %s", company['name'],
+                    extra=item_fields('profile', url=company['profile_url'], company=company['name']))
         
         soup = self.get_page(company['profile_url'])
         if not soup:
             return company
             
         try:
-            # Поиск официального сайта
-            website_links = soup.find_all('a', href=True)
-            for link in website_links:
-                href = link.get('href', '')
-                if self.is_company_website(href):
-                    company['website'] = href
-                    break
+            # Ссылки страницы разбираются один раз
+            links = LinkIndex.from_soup(soup)
             
-            # Поиск социальных сетей
-            social_links = []
-            social_patterns = [
-                r'vk\.com',
-                r'instagram\.com',
-                r'facebook\.com',
-                r't\.me',
-                r'youtube\.com',
-                r'ok\.ru'
-            ]
+            # Поиск официального сайта
+            corporate_links = links.by_kind(CORPORATE)
+            if corporate_links:
+                company['website'] = corporate_links[0].href
             
-            for link in website_links:
-                href = link.get('href', '')
-                for pattern in social_patterns:
-                    if re.search(pattern, href, re.IGNORECASE):
-                        social_links.append(href)
-                        break
+            # Поиск социальных сетей (без дубликатов, в порядке на странице)
+            social_links = list(dict.fromkeys(link.href for link in links.by_kind(SOCIAL)))
             
-            company['social_networks'] = '; '.join(list(set(social_links)))
+            company['social_networks'] = '; '.join(social_links)
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге деталей для {company['name']}: {e}")
         
-        # Задержка между запросами
-        time.sleep(1)
         return company
 
     def is_company_website(self, url: str) -> bool:
         """Проверка, является ли ссылка официальным сайтом компании"""
-        if not url or url.startswith('#') or 'erzrf.ru' in url:
-            return False
-            
-        # Исключаем социальные сети и другие сервисы
-        excluded_domains = [
-            'vk.com', 'instagram.com', 'facebook.com', 't.me',
-            'youtube.com', 'ok.ru', 'twitter.com', 'linkedin.com',
-            'google.com', 'yandex.ru', 'mail.ru'
-        ]
-        
-        for domain in excluded_domains:
-            if domain in url.lower():
-                return False
-                
-        return url.startswith('http')
+        # Внешний сайт: не erzrf.ru, не соцсеть, не поисковик/почта и не файл
+        return bool(url) and classify_url(url).kind == CORPORATE
 
     def save_to_csv(self, filename: str = 'top_250_zastroyshchiki.csv'):
         """Сохранение данных в CSV файл"""
@@ -222,7 +187,8 @@ class ERZRFParser:
         if parse_details:
             logger.info("Начинаем парсинг детальной информации...")
             for i, company in enumerate(self.companies_data):
-                logger.info(f"Обрабатываем {i+1}/{len(self.companies_data)}: {company['name']}")
+                logger.info("Обрабатываем %d/%d: %s", i + 1, len(self.companies_data), company['name'],
+                            extra=item_fields('profile', rank=company['rank'], company=company['name']))
                 self.companies_data[i] = self.parse_company_details(company)
                 
                 # Прогресс каждые 10 компаний
@@ -234,6 +200,7 @@ class ERZRFParser:
         logger.info("Парсинг завершен!")
 
 def main():
+    setup_logging('erzrf_parser.log')
     parser = ERZRFParser()
     
     try:
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока элементов
+_DONE = object()
+
+
+class Stage:
+    """Этап конвейера: функция над одним элементом, выполняемая в workers потоках.
+
+    Функция возвращает элемент для следующего этапа или None, если элемент
+    дальше не передается. Если функция упала, элемент для следующего этапа
+    возвращает on_error(элемент, исключение), например элемент с пометкой
+    об ошибке; без on_error элемент теряется и учитывается в lost. Перед этапом стоит очередь на queue_size
+    элементов: когда этап не успевает, предыдущий ждет (обратное давление),
+    и в памяти одновременно находится ограниченное число элементов.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 queue_size: Optional[int] = None, on_error: Optional[Callable[[Any, Exception], Any]] = None):
+        self.name = name
+        self.func = func
+        self.on_error = on_error
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.lost = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def process(self, item):
+        start = time.perf_counter()
+        try:
+            result = self.func(item)
+        except Exception as e:
+            logger.error(f"Ошибка на этапе {self.name}: {e}")
+            result = self.on_error(item, e) if self.on_error else None
+            error = 1
+        else:
+            error = 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.processed += 1
+            self.busy += elapsed
+            self.errors += error
+            if result is None:
+                if error:
+                    self.lost += 1
+                else:
+                    self.dropped += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'lost': self.lost,
+            'busy_seconds': self.busy,
+        }
+
+
+class Pipeline:
+    """Потоковый конвейер: источник -> этапы -> приемник.
+
+    Источник (итератор) читается в отдельном потоке, каждый этап работает
+    в своих потоках, приемник вызывается в вызывающем потоке и поэтому
+    может писать в файлы без блокировок. Этапы связаны ограниченными
+    очередями. Если передан metrics (erzrf_metrics.Metrics), время
+    обработки каждого элемента пишется в stage_seconds с меткой этапа.
+    При исключении в приемнике (в том числе KeyboardInterrupt)
+    конвейер останавливается, а исключение пробрасывается дальше.
+    """
+
+    def __init__(self, stages: List[Stage], poll_interval: float = 0.2, metrics=None):
+        self.stages = stages
+        self.metrics = metrics
+        self.poll_interval = poll_interval
+        self.source_items = 0
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _produce(self, source: Iterable, output: queue.Queue):
+        try:
+            for item in source:
+                if not self._put(output, item):
+                    return
+                self.source_items += 1
+        except Exception as e:
+            logger.error(f"Ошибка в источнике конвейера: {e}")
+        finally:
+            self._put(output, _DONE)
+
+    def _work(self, stage: Stage, input_queue: queue.Queue, output: queue.Queue, finished: List[int]):
+        while True:
+            item = self._get(input_queue)
+            if item is _DONE:
+                # Маркер возвращается в очередь для остальных потоков этапа;
+                # последний завершившийся поток передает его следующему этапу
+                with stage._lock:
+                    finished[0] += 1
+                    last = finished[0] == stage.workers
+                self._put(output if last else input_queue, _DONE)
+                return
+            start = time.perf_counter()
+            result = stage.process(item)
+            if self.metrics:
+                self.metrics.observe('stage_seconds', time.perf_counter() - start, stage=stage.name)
+            if result is not None and not self._put(output, result):
+                return
+
+    def run(self, source: Iterable, sink: Callable[[Any], None]):
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        output = queue.Queue(maxsize=self.stages[-1].queue_size if self.stages else 1)
+        queues.append(output)
+
+        threads = [threading.Thread(target=self._produce, args=(source, queues[0]),
+                                    name='pipeline-source', daemon=True)]
+        for k, stage in enumerate(self.stages):
+            finished = [0]
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[k], queues[k + 1], finished),
+                    name=f'pipeline-{stage.name}-{n}', daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(output)
+                if item is _DONE:
+                    break
+                sink(item)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+            for stage in self.stages:
+                stats = stage.stats()
+                logger.info(f"Этап {stats['stage']}: {stats['processed']} элементов, "
+                            f"{stats['busy_seconds']:.2f} с работы в {stats['workers']} потоках, "
+                            f"ошибок {stats['errors']}")
+                if stats['lost']:
+                    logger.warning(f"Этап {stats['stage']}: потеряно из-за ошибок {stats['lost']} элементов")
+
+    def stats(self) -> List[Dict]:
+        return [stage.stats() for stage in self.stages]
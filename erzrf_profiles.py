@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from erzrf_batch import canonical_profile_url
+
+logger = logging.getLogger(__name__)
+
+# Поля профиля, которые переносятся из хранилища в запись о компании
+PROFILE_FIELDS = ('website', 'social_networks', 'region', 'region_id')
+
+
+class ProfileStore:
+    """Хранилище извлеченных профилей между запусками (SQLite).
+
+    Ключ - канонический адрес профиля (без параметров запроса). Для каждого
+    профиля хранятся сайт, соцсети, регион, место в рейтинге на момент
+    загрузки, хеш HTML страницы и время загрузки. В режиме обновления
+    профиль загружается заново, только если его нет в хранилище, запись
+    старше ttl или место компании в рейтинге изменилось.
+    """
+
+    def __init__(self, path: str = 'erzrf_profiles.sqlite', ttl: float = 30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                url TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                website TEXT NOT NULL,
+                social_networks TEXT NOT NULL,
+                region TEXT NOT NULL,
+                region_id TEXT,
+                rank INTEGER,
+                content_hash TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def get(self, profile_url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT website, social_networks, region, region_id, rank, content_hash, fetched_at "
+                "FROM profiles WHERE url = ?", (canonical_profile_url(profile_url),)
+            ).fetchone()
+        if not row:
+            return None
+        keys = PROFILE_FIELDS + ('rank', 'content_hash', 'fetched_at')
+        return dict(zip(keys, row))
+
+    def needs_refresh(self, company: Dict, stored: Optional[Dict]) -> bool:
+        """Новый профиль, устаревшая запись или изменившееся место в рейтинге"""
+        if stored is None:
+            return True
+        if time.time() - stored['fetched_at'] >= self.ttl:
+            return True
+        return stored['rank'] != company['rank']
+
+    def apply(self, company: Dict, stored: Dict) -> Dict:
+        """Запись о компании с данными профиля из хранилища"""
+        company = dict(company)
+        for field in PROFILE_FIELDS:
+            # Регион из строки рейтинга точнее, чем найденный в тексте профиля
+            if field in ('region', 'region_id') and company.get('region', "Не указан") != "Не указан":
+                continue
+            company[field] = stored[field]
+        company['content_hash'] = stored['content_hash']
+        return company
+
+    def put(self, company: Dict):
+        """Сохранение только что загруженного профиля"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO profiles "
+                "(url, name, website, social_networks, region, region_id, rank, content_hash, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonical_profile_url(company['profile_url']), company['name'], company['website'],
+                 company['social_networks'], company['region'], company.get('region_id'),
+                 company['rank'], company.get('content_hash'), time.time())
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Адаптивный лимит запросов (token bucket), общий для всех потоков и парсеров.
+
+    Темп подстраивается под ответы сервера: каждый успешный ответ добавляет
+    increase запросов в секунду (до max_rate), ответ 429/5xx умножает темп на
+    decrease (не ниже min_rate), а Retry-After приостанавливает все запросы
+    на указанное время. К ожиданию добавляется случайная добавка, чтобы
+    потоки не отправляли запросы синхронно.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int = 1,
+                 min_rate: float = 0.1, max_rate: Optional[float] = None,
+                 increase: float = 0.1, decrease: float = 0.5,
+                 jitter: float = 0.1, max_backoff: float = 60.0):
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second должен быть больше нуля")
+        self.rate = requests_per_second
+        self.burst = burst
+        self.min_rate = min(min_rate, requests_per_second)
+        self.max_rate = max_rate if max_rate is not None else requests_per_second
+        self.increase = increase
+        self.decrease = decrease
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    def _reserve(self) -> float:
+        """Резервирует токен и возвращает время ожидания до него"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Отрицательный остаток - очередь уже зарезервированных запросов
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            delay = max(delay, self._blocked_until - now)
+            rate = self.rate
+        if delay > 0 and self.jitter:
+            delay += random.uniform(0, self.jitter / rate)
+        return delay
+
+    def acquire(self):
+        """Блокирует поток до наступления его очереди на запрос"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """То же, что acquire, но не блокирует event loop"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        """Аддитивное ускорение после успешного ответа"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Мультипликативное замедление после 429/5xx и пауза по Retry-After"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            rate = self.rate
+        logger.warning(f"Сервер просит снизить темп: {rate:.2f} запросов/с"
+                       + (f", пауза {retry_after:.0f} с" if retry_after else ""))
+
+    def feedback(self, status: int, retry_after_header: Optional[str] = None) -> Optional[float]:
+        """Учет кода ответа; возвращает паузу из Retry-After, если она есть"""
+        retry_after = parse_retry_after(retry_after_header)
+        if status in THROTTLE_STATUSES:
+            self.on_throttle(retry_after)
+        elif status < 400:
+            self.on_success()
+        return retry_after
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Пауза перед повторной попыткой: Retry-After или 2**attempt со случайной добавкой"""
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        return min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.5)
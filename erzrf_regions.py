@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+NOT_SPECIFIED = "Не указан"
+
+FEDERAL_CITIES = frozenset({"Москва", "Санкт-Петербург", "Севастополь"})
+
+
+class Region(NamedTuple):
+    id: Optional[str]
+    name: str
+    city: Optional[str] = None
+
+
+# Субъекты РФ: (каноническое название, дополнительные написания)
+FEDERAL_SUBJECTS: List[Tuple[str, Tuple[str, ...]]] = [
+    # Города федерального значения: в тексте ищутся только с "г." (см. MAJOR_CITIES)
+    ("Москва", ()),
+    ("Санкт-Петербург", ()),
+    ("Севастополь", ()),
+    # Республики
+    ("Республика Адыгея", ("Адыгея",)),
+    ("Республика Алтай", ()),
+    ("Республика Башкортостан", ("Башкортостан", "Башкирия")),
+    ("Республика Бурятия", ("Бурятия",)),
+    ("Республика Дагестан", ("Дагестан",)),
+    ("Республика Ингушетия", ("Ингушетия",)),
+    ("Кабардино-Балкарская Республика", ("Кабардино-Балкария",)),
+    ("Республика Калмыкия", ("Калмыкия",)),
+    ("Карачаево-Черкесская Республика", ("Карачаево-Черкесия",)),
+    ("Республика Карелия", ("Карелия",)),
+    ("Республика Коми", ()),
+    ("Республика Крым", ("Крым",)),
+    ("Республика Марий Эл", ("Марий Эл",)),
+    ("Республика Мордовия", ("Мордовия",)),
+    ("Республика Саха (Якутия)", ("Республика Саха", "Якутия")),
+    ("Республика Северная Осетия — Алания", ("Республика Северная Осетия", "Северная Осетия", "Алания")),
+    ("Республика Татарстан", ("Татарстан",)),
+    ("Республика Тыва", ("Тыва", "Тува")),
+    ("Удмуртская Республика", ("Удмуртия",)),
+    ("Республика Хакасия", ("Хакасия",)),
+    ("Чеченская Республика", ("Чечня",)),
+    ("Чувашская Республика", ("Чувашия",)),
+    ("Донецкая Народная Республика", ("ДНР",)),
+    ("Луганская Народная Республика", ("ЛНР",)),
+    # Края
+    ("Алтайский край", ()),
+    ("Забайкальский край", ()),
+    ("Камчатский край", ()),
+    ("Краснодарский край", ("Кубань",)),
+    ("Красноярский край", ()),
+    ("Пермский край", ()),
+    ("Приморский край", ("Приморье",)),
+    ("Ставропольский край", ()),
+    ("Хабаровский край", ()),
+    # Области
+    ("Амурская область", ()),
+    ("Архангельская область", ()),
+    ("Астраханская область", ()),
+    ("Белгородская область", ()),
+    ("Брянская область", ()),
+    ("Владимирская область", ()),
+    ("Волгоградская область", ()),
+    ("Вологодская область", ()),
+    ("Воронежская область", ()),
+    ("Запорожская область", ()),
+    ("Ивановская область", ()),
+    ("Иркутская область", ()),
+    ("Калининградская область", ()),
+    ("Калужская область", ()),
+    ("Кемеровская область", ("Кузбасс",)),
+    ("Кировская область", ()),
+    ("Костромская область", ()),
+    ("Курганская область", ()),
+    ("Курская область", ()),
+    ("Ленинградская область", ()),
+    ("Липецкая область", ()),
+    ("Магаданская область", ()),
+    ("Московская область", ("Подмосковье",)),
+    ("Мурманская область", ()),
+    ("Нижегородская область", ()),
+    ("Новгородская область", ()),
+    ("Новосибирская область", ()),
+    ("Омская область", ()),
+    ("Оренбургская область", ()),
+    ("Орловская область", ()),
+    ("Пензенская область", ()),
+    ("Псковская область", ()),
+    ("Ростовская область", ()),
+    ("Рязанская область", ()),
+    ("Самарская область", ()),
+    ("Саратовская область", ()),
+    ("Сахалинская область", ()),
+    ("Свердловская область", ()),
+    ("Смоленская область", ()),
+    ("Тамбовская область", ()),
+    ("Тверская область", ()),
+    ("Томская область", ()),
+    ("Тульская область", ()),
+    ("Тюменская область", ()),
+    ("Ульяновская область", ()),
+    ("Херсонская область", ()),
+    ("Челябинская область", ()),
+    ("Ярославская область", ()),
+    # Автономная область и автономные округа
+    ("Еврейская автономная область", ("ЕАО",)),
+    ("Ненецкий автономный округ", ()),
+    ("Ханты-Мансийский автономный округ — Югра", ("Ханты-Мансийский автономный округ", "ХМАО", "Югра")),
+    ("Чукотский автономный округ", ("Чукотка",)),
+    ("Ямало-Ненецкий автономный округ", ("ЯНАО", "Ямал")),
+]
+
+# Крупные города -> субъект РФ. Города сопоставляются только с префиксом
+# "г." или "город", чтобы не путать их с названиями улиц, ЖК и компаний.
+MAJOR_CITIES: Dict[str, str] = {
+    "Москва": "Москва",
+    "Зеленоград": "Москва",
+    "Санкт-Петербург": "Санкт-Петербург",
+    "Петербург": "Санкт-Петербург",
+    "Севастополь": "Севастополь",
+    "Майкоп": "Республика Адыгея",
+    "Горно-Алтайск": "Республика Алтай",
+    "Уфа": "Республика Башкортостан",
+    "Стерлитамак": "Республика Башкортостан",
+    "Улан-Удэ": "Республика Бурятия",
+    "Махачкала": "Республика Дагестан",
+    "Магас": "Республика Ингушетия",
+    "Нальчик": "Кабардино-Балкарская Республика",
+    "Элиста": "Республика Калмыкия",
+    "Черкесск": "Карачаево-Черкесская Республика",
+    "Петрозаводск": "Республика Карелия",
+    "Сыктывкар": "Республика Коми",
+    "Симферополь": "Республика Крым",
+    "Ялта": "Республика Крым",
+    "Йошкар-Ола": "Республика Марий Эл",
+    "Саранск": "Республика Мордовия",
+    "Якутск": "Республика Саха (Якутия)",
+    "Владикавказ": "Республика Северная Осетия — Алания",
+    "Казань": "Республика Татарстан",
+    "Набережные Челны": "Республика Татарстан",
+    "Кызыл": "Республика Тыва",
+    "Ижевск": "Удмуртская Республика",
+    "Абакан": "Республика Хакасия",
+    "Грозный": "Чеченская Республика",
+    "Чебоксары": "Чувашская Республика",
+    "Донецк": "Донецкая Народная Республика",
+    "Луганск": "Луганская Народная Республика",
+    "Барнаул": "Алтайский край",
+    "Чита": "Забайкальский край",
+    "Петропавловск-Камчатский": "Камчатский край",
+    "Краснодар": "Краснодарский край",
+    "Сочи": "Краснодарский край",
+    "Новороссийск": "Краснодарский край",
+    "Анапа": "Краснодарский край",
+    "Геленджик": "Краснодарский край",
+    "Красноярск": "Красноярский край",
+    "Пермь": "Пермский край",
+    "Владивосток": "Приморский край",
+    "Ставрополь": "Ставропольский край",
+    "Пятигорск": "Ставропольский край",
+    "Хабаровск": "Хабаровский край",
+    "Благовещенск": "Амурская область",
+    "Архангельск": "Архангельская область",
+    "Астрахань": "Астраханская область",
+    "Белгород": "Белгородская область",
+    "Брянск": "Брянская область",
+    "Владимир": "Владимирская область",
+    "Волгоград": "Волгоградская область",
+    "Волжский": "Волгоградская область",
+    "Вологда": "Вологодская область",
+    "Череповец": "Вологодская область",
+    "Воронеж": "Воронежская область",
+    "Мелитополь": "Запорожская область",
+    "Иваново": "Ивановская область",
+    "Иркутск": "Иркутская область",
+    "Калининград": "Калининградская область",
+    "Калуга": "Калужская область",
+    "Кемерово": "Кемеровская область",
+    "Новокузнецк": "Кемеровская область",
+    "Киров": "Кировская область",
+    "Кострома": "Костромская область",
+    "Курган": "Курганская область",
+    "Курск": "Курская область",
+    "Липецк": "Липецкая область",
+    "Магадан": "Магаданская область",
+    "Балашиха": "Московская область",
+    "Химки": "Московская область",
+    "Подольск": "Московская область",
+    "Мытищи": "Московская область",
+    "Люберцы": "Московская область",
+    "Красногорск": "Московская область",
+    "Одинцово": "Московская область",
+    "Мурманск": "Мурманская область",
+    "Нижний Новгород": "Нижегородская область",
+    "Великий Новгород": "Новгородская область",
+    "Новосибирск": "Новосибирская область",
+    "Омск": "Омская область",
+    "Оренбург": "Оренбургская область",
+    "Орёл": "Орловская область",
+    "Пенза": "Пензенская область",
+    "Псков": "Псковская область",
+    "Ростов-на-Дону": "Ростовская область",
+    "Шахты": "Ростовская область",
+    "Рязань": "Рязанская область",
+    "Самара": "Самарская область",
+    "Тольятти": "Самарская область",
+    "Саратов": "Саратовская область",
+    "Южно-Сахалинск": "Сахалинская область",
+    "Екатеринбург": "Свердловская область",
+    "Нижний Тагил": "Свердловская область",
+    "Смоленск": "Смоленская область",
+    "Тамбов": "Тамбовская область",
+    "Тверь": "Тверская область",
+    "Томск": "Томская область",
+    "Тула": "Тульская область",
+    "Тюмень": "Тюменская область",
+    "Ульяновск": "Ульяновская область",
+    "Челябинск": "Челябинская область",
+    "Магнитогорск": "Челябинская область",
+    "Ярославль": "Ярославская область",
+    "Биробиджан": "Еврейская автономная область",
+    "Нарьян-Мар": "Ненецкий автономный округ",
+    "Ханты-Мансийск": "Ханты-Мансийский автономный округ — Югра",
+    "Сургут": "Ханты-Мансийский автономный округ — Югра",
+    "Нижневартовск": "Ханты-Мансийский автономный округ — Югра",
+    "Анадырь": "Чукотский автономный округ",
+    "Салехард": "Ямало-Ненецкий автономный округ",
+    "Новый Уренгой": "Ямало-Ненецкий автономный округ",
+}
+
+_TRANSLIT = dict(zip(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    ["a", "b", "v", "g", "d", "e", "e", "zh", "z", "i", "y", "k", "l", "m", "n", "o", "p",
+     "r", "s", "t", "u", "f", "kh", "ts", "ch", "sh", "shch", "", "y", "", "e", "yu", "ya"],
+))
+
+
+def region_slug(name: str) -> str:
+    """Стабильный латинский идентификатор субъекта: 'Московская область' -> 'moskovskaya-oblast'"""
+    name = name.split(' — ')[0].split(' (')[0]
+    slug = ''.join(_TRANSLIT.get(ch, ch) for ch in name.lower())
+    return re.sub(r'[^a-z0-9]+', '-', slug).strip('-')
+
+
+def _normalize(text: str) -> str:
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Регулярное выражение в виде префиксного дерева.
+
+    Общие префиксы проверяются один раз, а не для каждой альтернативы, и
+    при нескольких совпадениях в одной позиции выбирается самое длинное.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class RegionResolver:
+    """Определение субъекта РФ по тексту одним скомпилированным выражением.
+
+    Названия субъектов, их короткие формы и крупные города (только с "г."
+    или "город") собраны в префиксные деревья и объединены в одно выражение,
+    которое компилируется один раз. Найденное название приводится к
+    каноническому виду, поэтому "г.Москва" и "Москва" дают один результат.
+    Если справочник ничего не нашел, используются общие шаблоны
+    "г.<Город>" и "<...> область/край" - такой регион возвращается без id.
+    """
+
+    def __init__(self, subjects=FEDERAL_SUBJECTS, cities=MAJOR_CITIES):
+        self._subjects: Dict[str, Region] = {}
+        self._by_name: Dict[str, Region] = {}
+        for name, aliases in subjects:
+            region = Region(region_slug(name), name)
+            self._by_name[name] = region
+            for alias in (name,) + tuple(aliases):
+                # "Москва" без "г." часто встречается в меню и названиях ЖК
+                if alias not in FEDERAL_CITIES:
+                    self._subjects[_normalize(alias)] = region
+
+        self._cities: Dict[str, Region] = {}
+        for city, subject in cities.items():
+            self._cities[_normalize(city)] = self._by_name[subject]._replace(city=city)
+
+        self._pattern = re.compile(
+            r'(?<![\w-])(?:'
+            r'(?:г\.|город\s)\s*(?P<city>' + _trie_pattern(self._cities) + r')'
+            r'|(?P<subject>' + _trie_pattern(self._subjects) + r')'
+            r')(?![\w-])'
+        )
+        self._fallback = re.compile(
+            r'г\.\s*(?P<city>[А-Я][\w-]+(?: [А-Я][\w-]+)?)'
+            r'|(?P<subject>[А-Я][\w-]+ (?:область|край|автономный округ))'
+        )
+
+    def resolve(self, text: str) -> Optional[Region]:
+        """Первый регион, упомянутый в тексте, или None"""
+        if not text:
+            return None
+        text = _normalize(text)
+
+        # Значение целиком (например, ячейка CSV "Москва" или "г.Казань")
+        exact = re.sub(r'^(?:г\.|город\s)\s*', '', text.strip())
+        if exact in self._cities:
+            return self._cities[exact]
+        if exact in self._subjects:
+            return self._subjects[exact]
+
+        match = self._pattern.search(text)
+        if match:
+            if match.group('city'):
+                return self._cities[match.group('city')]
+            return self._subjects[match.group('subject')]
+
+        match = self._fallback.search(text)
+        if match:
+            return Region(None, (match.group('city') or match.group('subject')).strip())
+        return None
+
+    def resolve_name(self, text: str) -> str:
+        """Каноническое название региона или "Не указан" """
+        region = self.resolve(text)
+        return region.name if region else NOT_SPECIFIED
+
+    def region_id(self, name: str) -> Optional[str]:
+        """Идентификатор по каноническому названию"""
+        region = self._by_name.get(name)
+        return region.id if region else None
+
+
+REGION_RESOLVER = RegionResolver()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Пропущенное значение в целочисленных колонках (в дробных - NaN). Не -1:
+# изменение места бывает отрицательным
+MISSING_INT = -2 ** 31
+
+
+class RowField(NamedTuple):
+    name: str    # имя поля записи и колонки таблицы
+    cell: int    # N в классе ячейки developer-td-N
+    dtype: str   # тип колонки numpy: int32 или float32
+    title: str   # подпись колонки на сайте
+
+
+# Числовые колонки строки рейтинга. developer-td-3 - ссылка на бренд и регион,
+# разбирается отдельно (extract_row)
+ROW_FIELDS = [
+    RowField('place', 1, 'int32', 'Место'),
+    RowField('place_change', 2, 'int32', 'Изменение места'),
+    RowField('area_building', 4, 'int32', 'Строится, м²'),
+    RowField('area_delayed', 5, 'int32', 'С переносом срока, м²'),
+    RowField('delayed_share', 6, 'float32', 'Доля с переносом срока, %'),
+    RowField('delay_months', 7, 'float32', 'Уточнение срока, мес.'),
+    RowField('regions', 8, 'int32', 'Регионов'),
+    RowField('developers', 9, 'int32', 'Застройщиков'),
+    RowField('complexes', 10, 'int32', 'ЖК'),
+    RowField('pt', 11, 'int32', 'ПТ'),
+    RowField('md', 12, 'int32', 'МД'),
+    RowField('bd', 13, 'int32', 'БД'),
+    RowField('dap', 14, 'int32', 'ДАП'),
+    RowField('score', 15, 'float32', 'Оценка'),
+]
+
+METRIC_NAMES = [field.name for field in ROW_FIELDS]
+
+_CELL_CLASS = re.compile(r'^developer-td-(\d+)$')
+_NUMBER = re.compile(r'[-+−]?\d[\d\s  ]*(?:[.,]\d+)?')
+
+
+def parse_number(text: str) -> Optional[float]:
+    """Первое число в тексте ячейки: "4 956 271" -> 4956271, "18,42" -> 18.42, "−3" -> -3"""
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    value = re.sub(r'[\s  ]', '', match.group(0)).replace(',', '.').replace('−', '-')
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _cell_value(cell) -> str:
+    """Текст ячейки без подписи колонки (.developer-td__title)"""
+    text = cell.get_text(' ')
+    title = cell.find(class_='developer-td__title')
+    if title is not None:
+        text = text.replace(title.get_text(' '), ' ', 1)
+    return ' '.join(text.split())
+
+
+def row_cells(row) -> Dict[int, object]:
+    """Ячейки строки рейтинга по номеру N из класса developer-td-N"""
+    cells = {}
+    for cell in row.select('[class*="developer-td-"]'):
+        for css_class in cell.get('class') or []:
+            match = _CELL_CLASS.match(css_class)
+            if match:
+                cells.setdefault(int(match.group(1)), cell)
+    return cells
+
+
+def extract_row(row) -> Dict:
+    """Типизированная запись строки рейтинга (<li> с ячейками developer-td-N).
+
+    Числа разбираются один раз; отсутствующие или нечисловые ячейки дают
+    None. Поле brand_text - текст ячейки developer-td-3 ("ГК Самолет, г.Москва").
+    """
+    cells = row_cells(row)
+    record: Dict = {}
+    for field in ROW_FIELDS:
+        cell = cells.get(field.cell)
+        value = parse_number(_cell_value(cell)) if cell is not None else None
+        if value is not None and field.dtype.startswith('int'):
+            value = int(value)
+        record[field.name] = value
+    brand = cells.get(3)
+    record['brand_text'] = ' '.join(brand.get_text(' ').split()) if brand is not None else ''
+    return record
+
+
+class RatingTable:
+    """Колоночная таблица строк рейтинга на массивах numpy.
+
+    Числовые колонки - массивы int32/float32 (пропуски: MISSING_INT и NaN),
+    строковые (название, адрес профиля) - массивы объектов, регион и
+    параметры рейтинга кодируются словарем (коды int16/int32 + список
+    значений). Таблицы разных дат и регионов объединяются через concat и
+    сохраняются в .npz.
+    """
+
+    STRING_COLUMNS = ('name', 'profile_url')
+    CATEGORY_COLUMNS = ('region', 'date', 'region_key', 'top_type')
+
+    def __init__(self, columns: Dict[str, 'np.ndarray'], categories: Dict[str, List[str]]):
+        self.columns = columns
+        self.categories = categories
+
+    @classmethod
+    def from_companies(cls, companies: Iterable[Dict], **constants) -> 'RatingTable':
+        """Таблица из записей о компаниях с полем metrics (см. extract_row).
+
+        constants - значения, одинаковые для всех строк (например, date,
+        region_key, top_type одного рейтинга).
+        """
+        if np is None:
+            raise ImportError("Для колоночной таблицы рейтинга установите numpy")
+        companies = list(companies)
+        columns: Dict[str, 'np.ndarray'] = {}
+        for field in ROW_FIELDS:
+            values = [(company.get('metrics') or {}).get(field.name) for company in companies]
+            if field.dtype.startswith('int'):
+                columns[field.name] = np.array(
+                    [MISSING_INT if value is None else value for value in values], dtype=field.dtype)
+            else:
+                columns[field.name] = np.array(
+                    [math.nan if value is None else value for value in values], dtype=field.dtype)
+        columns['rank'] = np.array([company['rank'] for company in companies], dtype='int32')
+        for name in cls.STRING_COLUMNS:
+            columns[name] = np.array([company.get(name, '') for company in companies], dtype=object)
+
+        categories: Dict[str, List[str]] = {}
+        for name in cls.CATEGORY_COLUMNS:
+            if name in constants:
+                values = [str(constants[name])] * len(companies)
+            else:
+                values = [str(company.get(name, '')) for company in companies]
+            categories[name], columns[name] = _encode(values)
+        return cls(columns, categories)
+
+    @classmethod
+    def concat(cls, tables: List['RatingTable']) -> 'RatingTable':
+        """Объединение таблиц (например, одного рейтинга за разные даты)"""
+        if np is None:
+            raise ImportError("Для колоночной таблицы рейтинга установите numpy")
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.from_companies([])
+        columns: Dict[str, 'np.ndarray'] = {}
+        categories: Dict[str, List[str]] = {}
+        for name in cls.CATEGORY_COLUMNS:
+            categories[name], columns[name] = _encode(
+                [value for table in tables for value in table.values(name)])
+        for name in tables[0].columns:
+            if name not in cls.CATEGORY_COLUMNS:
+                columns[name] = np.concatenate([table.columns[name] for table in tables])
+        return cls(columns, categories)
+
+    def __len__(self) -> int:
+        return len(self.columns['rank'])
+
+    def column(self, name: str) -> 'np.ndarray':
+        """Массив колонки; для словарных колонок - коды (значения через values)"""
+        return self.columns[name]
+
+    def values(self, name: str) -> List[str]:
+        """Значения словарной или строковой колонки"""
+        if name in self.categories:
+            labels = self.categories[name]
+            return [labels[code] for code in self.columns[name]]
+        return list(self.columns[name])
+
+    def select(self, mask: 'np.ndarray') -> 'RatingTable':
+        """Строки по булевой маске или массиву индексов"""
+        return RatingTable({name: column[mask] for name, column in self.columns.items()}, self.categories)
+
+    @property
+    def nbytes(self) -> int:
+        """Память числовых и кодовых колонок (без строковых объектов)"""
+        return sum(column.nbytes for column in self.columns.values() if column.dtype != object)
+
+    def to_records(self) -> List[Dict]:
+        decoded = {name: self.values(name) for name in self.CATEGORY_COLUMNS}
+        records = []
+        for i in range(len(self)):
+            record = {}
+            for name, column in self.columns.items():
+                if name in decoded:
+                    record[name] = decoded[name][i]
+                else:
+                    value = column[i]
+                    record[name] = value.item() if hasattr(value, 'item') else value
+            records.append(record)
+        return records
+
+    def save(self, path: str):
+        """Сохранение в .npz; строковые колонки и словари - как массивы строк"""
+        arrays = {}
+        for name, column in self.columns.items():
+            arrays[name] = column.astype(str) if column.dtype == object else column
+        for name, labels in self.categories.items():
+            arrays[f'categories__{name}'] = np.array(labels, dtype=str)
+        np.savez_compressed(path, **arrays)
+        logger.info(f"Таблица рейтинга ({len(self)} строк) сохранена в {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'RatingTable':
+        if np is None:
+            raise ImportError("Для колоночной таблицы рейтинга установите numpy")
+        with np.load(path) as data:
+            columns = {}
+            categories = {}
+            for name in data.files:
+                if name.startswith('categories__'):
+                    categories[name[len('categories__'):]] = [str(value) for value in data[name]]
+                elif name in cls.STRING_COLUMNS:
+                    columns[name] = data[name].astype(object)
+                else:
+                    columns[name] = data[name]
+        return cls(columns, categories)
+
+
+def _encode(values: List[str]):
+    """Словарное кодирование: список различных значений и массив кодов"""
+    labels: List[str] = []
+    index: Dict[str, int] = {}
+    codes = []
+    for value in values:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(labels)
+            labels.append(value)
+        codes.append(code)
+    dtype = 'int16' if len(labels) < 2 ** 15 else 'int32'
+    return labels, np.array(codes, dtype=dtype)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['Место', 'Название', 'Город/Регион', 'Сайт', 'Социальные сети']
+
+# Колонки сводной таблицы пакетного обхода: параметры рейтинга перед основными
+BATCH_COLUMNS = ['regionKey', 'topType', 'date'] + COLUMNS
+
+
+def company_to_row(company: Dict, columns: List[str] = COLUMNS) -> Dict:
+    """Запись о компании в колонках итоговой таблицы.
+
+    Дополнительные колонки (например, параметры рейтинга в BATCH_COLUMNS)
+    берутся из одноименных полей записи и выводятся строками.
+    """
+    row = {
+        'Место': company['rank'],
+        'Название': company['name'],
+        'Город/Регион': company['region'],
+        'Сайт': company['website'] if company['website'] else 'Не найден',
+        'Социальные сети': company['social_networks'] if company['social_networks'] else 'Не найдены'
+    }
+    return {column: row[column] if column in row else str(company.get(column, '')) for column in columns}
+
+
+class RecordSink:
+    """Потоковая запись результатов.
+
+    Записи добавляются по мере готовности и сбрасываются на диск пачками по
+    batch_size. Файл пишется под временным именем и переименовывается в
+    итоговое только в close(), поэтому читатель никогда не видит
+    недописанный результат. При ordered=True записи выводятся в порядке
+    входного списка: index в write - номер записи в списке (с 0),
+    назначенный при постановке в очередь, а пришедшие раньше своей очереди
+    записи ждут в буфере. Места рейтинга для этого не годятся: они могут
+    повторяться или отсутствовать. Без index номером служит порядок вызовов write.
+    """
+
+    def __init__(self, filename: str, batch_size: int = 25, ordered: bool = True,
+                 columns: List[str] = COLUMNS):
+        self.filename = filename
+        self.columns = columns
+        self.tmp_filename = f"{filename}.part"
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.count = 0
+        self._batch: List[Dict] = []
+        self._pending: Dict[int, List[Dict]] = defaultdict(list)
+        self._received = 0
+        self._next_index = 0
+
+    def write(self, company: Dict, index: Optional[int] = None):
+        row = company_to_row(company, self.columns)
+        if index is None:
+            index = self._received
+        self._received += 1
+        if not self.ordered:
+            self._add(row)
+            return
+
+        self._pending[index].append(row)
+        while self._next_index in self._pending:
+            for pending_row in self._pending.pop(self._next_index):
+                self._add(pending_row)
+            self._next_index += 1
+
+    def _add(self, row: Dict):
+        self._batch.append(row)
+        self.count += 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self._write_batch(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Дозапись оставшихся строк и атомарная публикация файла"""
+        for index in sorted(self._pending):
+            for row in self._pending[index]:
+                self._add(row)
+        self._pending.clear()
+        self.flush()
+        self._finalize()
+        os.replace(self.tmp_filename, self.filename)
+        logger.info(f"Сохранено {self.count} записей в {self.filename}")
+
+    def abort(self):
+        """Отказ от результата: временный файл удаляется"""
+        self._finalize()
+        if os.path.exists(self.tmp_filename):
+            os.remove(self.tmp_filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_batch(self, rows: List[Dict]):
+        raise NotImplementedError
+
+    def _finalize(self):
+        raise NotImplementedError
+
+
+class CsvSink(RecordSink):
+    def __init__(self, filename: str, batch_size: int = 25, ordered: bool = True,
+                 columns: List[str] = COLUMNS):
+        super().__init__(filename, batch_size, ordered, columns)
+        self._file = open(self.tmp_filename, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+        self._writer.writeheader()
+
+    def _write_batch(self, rows: List[Dict]):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _finalize(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class JsonlSink(RecordSink):
+    def __init__(self, filename: str, batch_size: int = 25, ordered: bool = True,
+                 columns: List[str] = COLUMNS):
+        super().__init__(filename, batch_size, ordered, columns)
+        self._file = open(self.tmp_filename, 'w', encoding='utf-8')
+
+    def _write_batch(self, rows: List[Dict]):
+        self._file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        self._file.flush()
+
+    def _finalize(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ParquetSink(RecordSink):
+    """Каждая пачка записывается отдельной группой строк Parquet"""
+
+    def __init__(self, filename: str, batch_size: int = 25, ordered: bool = True,
+                 columns: List[str] = COLUMNS):
+        if pa is None:
+            raise ImportError("Для записи в Parquet установите pyarrow")
+        super().__init__(filename, batch_size, ordered, columns)
+        self._schema = pa.schema([
+            (column, pa.int32() if column == 'Место' else pa.string()) for column in columns
+        ])
+        self._writer: Optional['pq.ParquetWriter'] = pq.ParquetWriter(self.tmp_filename, self._schema)
+
+    def _write_batch(self, rows: List[Dict]):
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+
+    def _finalize(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+}
+
+
+def open_sink(filename: str, fmt: Optional[str] = None, **kwargs) -> RecordSink:
+    """Создание приемника по формату или расширению файла"""
+    if fmt is None:
+        fmt = os.path.splitext(filename)[1].lstrip('.').lower() or 'csv'
+    if fmt not in SINKS:
+        raise ValueError(f"Неизвестный формат вывода: {fmt}")
+    return SINKS[fmt](filename, **kwargs)
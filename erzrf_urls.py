@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+# Категории ссылок
+INTERNAL = 'internal'    # страницы erzrf.ru, в том числе относительные ссылки
+SOCIAL = 'social'        # социальные сети и мессенджеры
+CORPORATE = 'corporate'  # внешний сайт - кандидат в официальные сайты компании
+SERVICE = 'service'      # поисковики, почта, карты - не сайт компании
+ASSET = 'asset'          # файлы: документы, картинки, архивы
+OTHER = 'other'          # якоря, mailto:, tel:, javascript: и прочее
+
+# Регистрируемый домен -> социальная сеть
+SOCIAL_NETWORKS = {
+    'vk.com': 'vk',
+    'vkontakte.ru': 'vk',
+    'instagram.com': 'instagram',
+    'facebook.com': 'facebook',
+    't.me': 'telegram',
+    'telegram.me': 'telegram',
+    'youtube.com': 'youtube',
+    'youtu.be': 'youtube',
+    'ok.ru': 'ok',
+    'odnoklassniki.ru': 'ok',
+    'twitter.com': 'twitter',
+    'linkedin.com': 'linkedin',
+}
+
+INTERNAL_DOMAINS = frozenset({'erzrf.ru'})
+
+SERVICE_DOMAINS = frozenset({'google.com', 'yandex.ru', 'mail.ru'})
+
+ASSET_EXTENSIONS = frozenset({
+    'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'rtf',
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'zip', 'rar', '7z',
+})
+
+# Все известные домены в одной таблице: поиск по суффиксам хоста
+_DOMAIN_CATEGORIES = dict(
+    {domain: SOCIAL for domain in SOCIAL_NETWORKS},
+    **{domain: INTERNAL for domain in INTERNAL_DOMAINS},
+    **{domain: SERVICE for domain in SERVICE_DOMAINS},
+)
+
+
+class UrlClass(NamedTuple):
+    kind: str
+    domain: str
+    network: str = ''
+
+
+def match_domain(host: str) -> str:
+    """Известный домен, которому принадлежит хост (сам хост или его родитель), иначе ''.
+
+    Хост проверяется по суффиксам, выровненным по точкам: m.vk.com -> vk.com,
+    но att.me не совпадает с t.me. Число проверок равно числу меток хоста.
+    """
+    while host:
+        if host in _DOMAIN_CATEGORIES:
+            return host
+        _, _, host = host.partition('.')
+    return ''
+
+
+def absolute_href(href: str) -> str:
+    """Ссылка без пробелов по краям; ссылка без схемы (//host/...) получает https:"""
+    href = href.strip()
+    return 'https:' + href if href.startswith('//') else href
+
+
+@lru_cache(maxsize=8192)
+def classify_url(href: str) -> UrlClass:
+    """Категория ссылки, ее домен (без www.) и, для соцсетей, название сети"""
+    href = href.strip()
+    lower = href.lower()
+    if not lower.startswith(('http://', 'https://', '//')):
+        if lower.startswith('/') and not lower.startswith('//'):
+            return UrlClass(INTERNAL, '')
+        return UrlClass(OTHER, '')
+
+    try:
+        parts = urlsplit(absolute_href(href))
+        host = (parts.hostname or '').rstrip('.')
+    except ValueError:
+        return UrlClass(OTHER, '')
+    domain = host[4:] if host.startswith('www.') else host
+    if not domain:
+        return UrlClass(OTHER, '')
+
+    known = match_domain(domain)
+    if known:
+        kind = _DOMAIN_CATEGORIES[known]
+        return UrlClass(kind, domain, SOCIAL_NETWORKS.get(known, ''))
+
+    extension = parts.path.rpartition('.')[2].lower() if '.' in parts.path.rpartition('/')[2] else ''
+    if extension in ASSET_EXTENSIONS:
+        return UrlClass(ASSET, domain)
+    return UrlClass(CORPORATE, domain)
@@ -7,8 +7,9 @@ from bs4 import BeautifulSoup
 import time
 import logging
 
+from erzrf_identity import IdentityIndex
+
 # Настройка логирования
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_additional_companies():
@@ -61,11 +62,21 @@ def generate_full_table():
     # Объединяем списки
     all_companies = base_companies.copy()
     
+    # Индекс названий для пропуска компаний, уже вошедших в базовую таблицу
+    # под другим написанием ("Группа Самолет" = "ГК Самолет")
+    identities = IdentityIndex()
+    for company in base_companies:
+        identities.add(company['Название'])
+    
     # Добавляем дополнительные компании
     current_rank = len(base_companies) + 1
     for company in additional:
         if current_rank > 250:
             break
+        if identities.resolve(company['name']) is not None:
+            logger.info(f"Пропущен повтор: {company['name']}")
+            continue
+        identities.add(company['name'])
             
         all_companies.append({
             'Место': current_rank,
@@ -121,4 +132,5 @@ def generate_full_table():
     logger.info("Файл сохранен как 'top_250_zastroyshchiki_complete.csv'")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     generate_full_table()
\ No newline at end of file